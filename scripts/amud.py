@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Integer amud encoding for daf-type texts (Talmud Bavli and Yerushalmi).
+
+An amud is encoded as 2 * daf + side, side 0 for amud aleph and 1 for amud
+bet: 2a = 4, 2b = 5, 64a = 128. A masechet is then the integer range
+first_amud..last_amud minus its excluded amudim. Consecutive amudim are
+consecutive integers, so counts and ranges need no float arithmetic
+(Berakhot, "62.5 pages" = amudim 4..128), and a unit set fits a bitmap
+(amud_bitmap).
+
+Amud headings are recognized in the usual forms: "ב." / "ב:", "ב עמוד א",
+"ב ע\"א" / "ב ע״ב".
+"""
+
+import re
+from typing import Iterable, List, Optional, Tuple, Union
+
+from gematria import hebrew_numeral_to_int
+
+# Division keyword / content type of daf-type texts
+DAF_KEYWORD = "דף"
+# Daf-type books start at daf 2 (amud 2a)
+FIRST_DAF = 2
+FIRST_AMUD = 2 * FIRST_DAF
+
+# "ב." (amud aleph) / "ב:" (amud bet)
+_PUNCTUATED_AMUD_REGEX = re.compile(r'^(?P<daf>\S+?)\s*(?P<mark>[.:])$')
+# "ב עמוד א", "ב ע"א", "ב ע״ב", "ב, ע"ב"
+_NAMED_AMUD_REGEX = re.compile(r'^(?P<daf>\S+?),?\s+ע(?:מוד\s*|["״\'׳]\s*)(?P<side>[אב])[\'׳]?$')
+
+
+def encode_amud(daf: int, side: int) -> int:
+    """2 * daf + side (side 0: amud aleph, 1: amud bet)."""
+    return 2 * daf + side
+
+
+def decode_amud(code: int) -> Tuple[int, int]:
+    """Returns (daf, side) of an amud code."""
+    return code >> 1, code & 1
+
+
+def amud_label(code: int) -> str:
+    """Human-readable amud, e.g. 129 -> '64b'."""
+    daf, side = decode_amud(code)
+    return f"{daf}{'ab'[side]}"
+
+
+def amud_from_label(label: str) -> int:
+    """Inverse of amud_label, e.g. '64b' -> 129."""
+    return encode_amud(int(label[:-1]), 'ab'.index(label[-1]))
+
+
+def amud_labels(entries: Iterable[Union[int, List[int]]]) -> List[Union[str, List[str]]]:
+    """Labels of a compact amud list (codes and [start, end] ranges, see division_sequence)."""
+    return [[amud_label(entry[0]), amud_label(entry[1])] if isinstance(entry, list) else amud_label(entry)
+            for entry in entries]
+
+
+def amud_codes_from_labels(entries: Iterable[Union[str, List[str]]]) -> List[Union[int, List[int]]]:
+    """Inverse of amud_labels."""
+    return [[amud_from_label(entry[0]), amud_from_label(entry[1])] if isinstance(entry, list) else amud_from_label(entry)
+            for entry in entries]
+
+
+def parse_amud(identifier: str) -> Optional[int]:
+    """The amud code of a heading identifier, or None if it does not name a single amud."""
+    identifier = identifier.strip()
+    match = _PUNCTUATED_AMUD_REGEX.match(identifier)
+    if match:
+        side = 0 if match.group('mark') == '.' else 1
+    else:
+        match = _NAMED_AMUD_REGEX.match(identifier)
+        if not match:
+            return None
+        side = 0 if match.group('side') == 'א' else 1
+    daf = hebrew_numeral_to_int(match.group('daf'))
+    return encode_amud(daf, side) if daf > 0 else None
+
+
+def parse_amudim(identifiers: Iterable[str]) -> Optional[List[int]]:
+    """
+    Amud codes of a whole node's identifiers, or None if they are not amud
+    headings (any numbered identifier without a side, or none with one).
+    Non-numeric identifiers ('הקדמה') are skipped.
+    """
+    codes = []
+    for identifier in identifiers:
+        code = parse_amud(identifier)
+        if code is None:
+            if hebrew_numeral_to_int(identifier) > 0:
+                return None # A plain daf heading: the node is not counted by amud
+            continue
+        codes.append(code)
+    return codes or None
+
+
+def pages_from_amudim(last_amud: int) -> float:
+    """The app's page count of a book running from amud 2a to last_amud (62.5 for 128 = 64a)."""
+    daf, side = decode_amud(last_amud)
+    return daf - FIRST_DAF + 1 if side else daf - FIRST_DAF + 0.5
+
+
+def amudim_from_pages(pages: float, start_daf: int = FIRST_DAF) -> Tuple[int, int]:
+    """(first_amud, last_amud) of a page count as written in the assets (a .5 ends on amud aleph)."""
+    amudim = int(pages * 2) # Exact: pages is whole or x.5
+    first = encode_amud(start_daf, 0)
+    return first, first + amudim - 1
+
+
+def amud_counts(first_amud: int, last_amud: int, excluded_amudim: Iterable[int]) -> Tuple[int, int]:
+    """Returns (dapim with at least one amud, amudim) of a range after exclusions."""
+    if last_amud < first_amud:
+        return 0, 0
+    skipped = {code for code in excluded_amudim if first_amud <= code <= last_amud}
+    amudim = last_amud - first_amud + 1 - len(skipped)
+    dapim = sum(1 for daf in range(first_amud >> 1, (last_amud >> 1) + 1)
+                if any(first_amud <= code <= last_amud and code not in skipped
+                       for code in (encode_amud(daf, 0), encode_amud(daf, 1))))
+    return dapim, amudim
+
+
+def amud_bitmap(first_amud: int, last_amud: int, excluded_amudim: Iterable[int] = ()) -> int:
+    """The amud set of a range as an int bitmap (bit n = amud code n), for set operations."""
+    if last_amud < first_amud:
+        return 0
+    bitmap = ((1 << (last_amud - first_amud + 1)) - 1) << first_amud
+    for code in excluded_amudim:
+        bitmap &= ~(1 << code)
+    return bitmap
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent result cache for the text structure analyzer.
+
+Entries are keyed by the SHA-256 of a file's content and the file name,
+together with a fingerprint of the analyzer configuration, so an edited
+book or a changed configuration constant both lead to a cache miss. The
+file name is part of the key because a book without an H1 is named after
+its file: identical files must not share one cached book name. The cache is stored as a
+single JSON file and bounded by a maximum number of entries; the least
+recently used entries are evicted first.
+"""
+
+import os
+import copy
+import json
+import hashlib
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Version of the on-disk cache layout
+CACHE_FORMAT_VERSION = 2
+# Default maximum number of cached books
+DEFAULT_MAX_ENTRIES = 20000
+# Read size used when hashing file content
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(filepath: str) -> str:
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_default(value: Any) -> Any:
+    """Serializes the analyzer's integer identifier arrays as plain lists."""
+    if isinstance(value, array):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """Returns a short stable hash of a JSON-serializable configuration dict."""
+    canonical = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+class AnalysisCache:
+    """Size-bounded LRU cache of (book_name, structured_data) analysis results."""
+
+    def __init__(self, path: str, fingerprint: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_entries = max(1, max_entries)
+        self.entries: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict() # Oldest first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """Loads the cache file, starting empty if it is missing or unreadable."""
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_FORMAT_VERSION:
+                logging.info(f"Cache '{self.path}' has an old format. Starting with an empty cache.")
+                return
+            for key, (book_name, structured_data) in data.get("entries", []):
+                self.entries[key] = (book_name, structured_data)
+            self._evict()
+            logging.info(f"Loaded {len(self.entries)} cached results from '{self.path}'.")
+        except Exception as e:
+            logging.warning(f"Could not load cache '{self.path}' ({e}). Starting with an empty cache.")
+            self.entries.clear()
+
+    def key_for(self, content_hash: str, filepath: str) -> str:
+        """Combines the configuration fingerprint, a content hash and the file name into a cache key."""
+        return f"{self.fingerprint}:{content_hash}:{os.path.basename(filepath)}"
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Returns a copy of the cached result for key, or None on a miss."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        self._dirty = True
+        book_name, structured_data = entry
+        return book_name, copy.deepcopy(structured_data) # Callers mutate results
+
+    def put(self, key: str, book_name: str, structured_data: Dict[str, Any]):
+        """Stores a copy of a result, evicting the least recently used entries if full."""
+        self.entries[key] = (book_name, copy.deepcopy(structured_data))
+        self.entries.move_to_end(key)
+        self._dirty = True
+        self._evict()
+
+    def _evict(self):
+        """Drops the least recently used entries until the size bound holds."""
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+            self._dirty = True
+
+    def save(self):
+        """Writes the cache to disk atomically, if anything changed."""
+        if not self._dirty:
+            return
+        data = {
+            "version": CACHE_FORMAT_VERSION,
+            "entries": [[key, list(entry)] for key, entry in self.entries.items()]
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            logging.error(f"Error writing cache '{self.path}': {e}")
+
+    def summary(self) -> str:
+        """Returns a one-line hit/miss summary for the end of a run."""
+        lookups = self.hits + self.misses
+        rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        return (f"Cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+                f"{self.evictions} evicted, {len(self.entries)}/{self.max_entries} entries.")
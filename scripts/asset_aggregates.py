@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Precomputed per-book aggregates for the structure assets.
+
+The page ranges of a book are resolved like BookDetails.fromJson in the app:
+daf-type books start at daf 2, a fractional page count ends on amud aleph,
+and only parts carry exclusions (the app ignores a book-level 'exclude' next
+to 'pages', e.g. halakha.json טור יורה דעה, and so do the aggregates). The
+one difference: daf-type books carrying integer first_amud / last_amud /
+exclude_amudim (see amud.py) are counted from those, which the app does not
+read yet, so they only agree with it when the range starts at 2a and nothing
+is excluded. Every book, part and subcategory gets:
+
+    unit_count   units after exclusions (dapim for daf-type books, else chapters/simanim)
+    unit_offset  units before it within the whole category
+    amud_count   amudim after exclusions (daf-type only)
+    amud_offset  amudim before it within the whole category (daf-type only)
+
+The category itself gets the totals (unit_count, and amud_count if it has
+daf-type books), so progress percentages and "unit N of the category"
+lookups need no expansion of the page ranges.
+
+Usage: python asset_aggregates.py ASSET.json [...]   # prints the totals of each file
+"""
+
+import sys
+import json
+from typing import Any, Dict, List, Tuple
+
+from amud import DAF_KEYWORD, amud_counts, decode_amud
+
+DAF_CONTENT_TYPE = DAF_KEYWORD
+
+
+def _unit(part: Dict[str, Any], field: str) -> int:
+    """A whole-unit part boundary; a fractional one would be silently truncated by int()."""
+    value = part.get(field, 0)
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"Part '{part.get('name')}': '{field}' must be a whole unit, got {value}.")
+    return int(value)
+
+
+def book_parts(book_info: Dict[str, Any], content_type: str) -> List[Tuple[Dict[str, Any], int, int, List[int], bool]]:
+    """
+    Resolves a book into (node, start, end, excluded, half_page_at_end) ranges, where
+    node is the dict that receives the aggregates (each part, or the book itself).
+    Raises ValueError for a fractional part boundary.
+    """
+    is_daf = content_type == DAF_CONTENT_TYPE
+    if isinstance(book_info.get("parts"), list):
+        return [
+            (part, _unit(part, "start"), _unit(part, "end"), part.get("exclude", []), False)
+            for part in book_info["parts"]
+        ]
+    if is_daf and "last_amud" in book_info:
+        first_daf, _ = decode_amud(book_info["first_amud"])
+        last_daf, last_side = decode_amud(book_info["last_amud"])
+        return [(book_info, first_daf, last_daf, [], last_side == 0)]
+    if "pages" in book_info:
+        pages = book_info["pages"]
+        start = int(book_info.get("startPage", 2 if is_daf else 1))
+        if is_daf:
+            whole = int(pages)
+            end = start + (whole if whole == pages else whole + 1) - 1 # ceil
+            return [(book_info, start, end, [], whole != pages)]
+        return [(book_info, start, start + int(pages) - 1, [], False)]
+    return []
+
+
+
+def range_counts(start: int, end: int, excluded: List[int], half_page_at_end: bool) -> Tuple[int, int]:
+    """Returns (units, amudim) of an inclusive page range after exclusions."""
+    if end < start:
+        return 0, 0
+    skipped = {page for page in excluded if start <= page <= end}
+    units = end - start + 1 - len(skipped)
+    amudim = 2 * units - (1 if half_page_at_end and end not in skipped else 0)
+    return units, amudim
+
+
+class _Totals:
+    """Running unit/amud totals of a category while its books are annotated in order."""
+
+    def __init__(self):
+        self.units = 0
+        self.amudim = 0
+        self.has_daf = False
+
+
+def _annotate_node(node: Dict[str, Any], units: int, amudim: int, offset_units: int, offset_amudim: int, is_daf: bool):
+    node["unit_count"] = units
+    node["unit_offset"] = offset_units
+    if is_daf:
+        node["amud_count"] = amudim
+        node["amud_offset"] = offset_amudim
+    else:
+        node.pop("amud_count", None)
+        node.pop("amud_offset", None)
+
+
+def _annotate_books(books: Dict[str, Any], content_type: str, totals: _Totals):
+    is_daf = content_type == DAF_CONTENT_TYPE
+    totals.has_daf = totals.has_daf or is_daf
+    for book_info in books.values():
+        if not isinstance(book_info, dict):
+            continue
+        book_start_units, book_start_amudim = totals.units, totals.amudim
+        for node, start, end, excluded, half_page_at_end in book_parts(book_info, content_type):
+            if is_daf and "last_amud" in node:
+                units, amudim = amud_counts(node["first_amud"], node["last_amud"], node.get("exclude_amudim", []))
+            else:
+                units, amudim = range_counts(start, end, excluded, half_page_at_end)
+            if node is not book_info:
+                _annotate_node(node, units, amudim, totals.units, totals.amudim, is_daf)
+            totals.units += units
+            totals.amudim += amudim
+        _annotate_node(book_info, totals.units - book_start_units, totals.amudim - book_start_amudim,
+                       book_start_units, book_start_amudim, is_daf)
+
+
+def _annotate_group(group: Dict[str, Any], content_type: str, totals: _Totals):
+    content_type = group.get("content_type") or content_type
+    _annotate_books(group.get("books") or group.get("data") or {}, content_type, totals)
+    for subcategory in group.get("subcategories", []):
+        start_units, start_amudim = totals.units, totals.amudim
+        had_daf, totals.has_daf = totals.has_daf, False
+        _annotate_group(subcategory, content_type, totals)
+        _annotate_node(subcategory, totals.units - start_units, totals.amudim - start_amudim,
+                       start_units, start_amudim, totals.has_daf)
+        totals.has_daf = totals.has_daf or had_daf
+
+
+def annotate_category(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds the aggregates to a category in place (recomputed from scratch, so it is idempotent) and returns it."""
+    totals = _Totals()
+    _annotate_group(data, data.get("content_type", ""), totals)
+    data["unit_count"] = totals.units
+    if totals.has_daf:
+        data["amud_count"] = totals.amudim
+    else:
+        data.pop("amud_count", None)
+    return data
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            category = annotate_category(json.load(f))
+        amudim = f", {category['amud_count']} amudim" if "amud_count" in category else ""
+        print(f"{path}: {category.get('name')}: {category['unit_count']} units{amudim}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Indexed, minified bundle of all structure assets.
+
+Layout (UTF-8):
+
+    <header JSON>\n<category 1 JSON><category 2 JSON>...
+
+The first line is a minified JSON header:
+
+    {"format": "structure-bundle", "version": 1,
+     "categories": [{"name": "משנה", "file": "mishna.json", "offset": 0, "length": 3501}, ...]}
+
+Every category is stored as minified JSON; offset and length are in bytes
+and relative to the first byte after the header line. Minified JSON never
+contains a raw newline, so the header always ends at the first b'\\n'. A
+reader decodes the header once and then only the categories it asks for.
+
+Usage:
+    python asset_bundle.py build [ASSETS_DIR] [BUNDLE]   # pack every *.json of ASSETS_DIR
+    python asset_bundle.py show BUNDLE [CATEGORY]       # list categories / print one
+"""
+
+import os
+import sys
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from asset_aggregates import annotate_category
+from asset_io import write_bytes_if_changed
+
+BUNDLE_FORMAT = "structure-bundle"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_FILENAME = "structure_bundle.bin" # Not .json, so the app's assets/data/*.json scan skips it
+
+
+def pack_bundle(categories: List[Tuple[str, Dict[str, Any]]]) -> bytes:
+    """Packs (source file name, category data) pairs into bundle bytes, in the given order."""
+    entries = []
+    payloads = []
+    offset = 0
+    for filename, data in categories:
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        entries.append({"name": data.get("name"), "file": filename, "offset": offset, "length": len(payload)})
+        payloads.append(payload)
+        offset += len(payload)
+    header = {"format": BUNDLE_FORMAT, "version": BUNDLE_FORMAT_VERSION, "categories": entries}
+    header_line = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+    return header_line + b''.join(payloads)
+
+
+def write_bundle(assets_dir: str, bundle_path: str) -> bool:
+    """
+    Packs every *.json file of assets_dir (sorted by name), with the per-book
+    aggregates embedded. Returns True if the bundle was (re)written.
+    """
+    categories = []
+    for filename in sorted(os.listdir(assets_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(assets_dir, filename), 'r', encoding='utf-8') as f:
+            categories.append((filename, annotate_category(json.load(f))))
+    return write_bytes_if_changed(bundle_path, pack_bundle(categories))
+
+
+class AssetBundle:
+    """
+    Lazy, random-access reader of a structure bundle. Only the header is read
+    when the bundle is opened; each category is read and decoded on first access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        header_line = self._file.readline()
+        self._data_start = len(header_line)
+        header = json.loads(header_line)
+        if header.get("format") != BUNDLE_FORMAT or header.get("version") != BUNDLE_FORMAT_VERSION:
+            self._file.close()
+            raise ValueError(f"'{path}' is not a version {BUNDLE_FORMAT_VERSION} structure bundle.")
+        self.entries: Dict[str, Dict[str, Any]] = {entry["name"]: entry for entry in header["categories"]}
+        self._decoded: Dict[str, Dict[str, Any]] = {}
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "AssetBundle":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        return self.category(name)
+
+    def names(self) -> List[str]:
+        """Category names, in bundle order."""
+        return list(self.entries)
+
+    def raw(self, name: str) -> bytes:
+        """Returns the undecoded JSON bytes of one category."""
+        entry = self.entries[name]
+        self._file.seek(self._data_start + entry["offset"])
+        return self._file.read(entry["length"])
+
+    def category(self, name: str) -> Dict[str, Any]:
+        """Decodes one category (once; later calls return the same object)."""
+        data = self._decoded.get(name)
+        if data is None:
+            data = self._decoded[name] = json.loads(self.raw(name))
+        return data
+
+    def book(self, category_name: str, book_name: str) -> Optional[Dict[str, Any]]:
+        """Looks up a book of a category, searching its top-level books and then its subcategories."""
+        data = self.category(category_name)
+        book = data.get("books", {}).get(book_name)
+        if book is not None:
+            return book
+        for subcategory in data.get("subcategories", []):
+            book = subcategory.get("books", {}).get(book_name)
+            if book is not None:
+                return book
+        return None
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["build"]:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        assets_dir = args[1] if len(args) > 1 else os.path.join(script_dir, "..", "src", "assets", "data")
+        bundle_path = args[2] if len(args) > 2 else os.path.join(script_dir, "build", BUNDLE_FILENAME)
+        changed = write_bundle(assets_dir, bundle_path)
+        print(f"{bundle_path} ({'written' if changed else 'unchanged'})")
+    elif args[:1] == ["show"] and len(args) > 1:
+        with AssetBundle(args[1]) as bundle:
+            if len(args) > 2:
+                print(json.dumps(bundle.category(args[2]), ensure_ascii=False, indent=2))
+            else:
+                for name, entry in bundle.entries.items():
+                    print(f"{name}\t{entry['file']}\t{entry['length']} bytes")
+    else:
+        print(__doc__)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Helpers for writing generated asset files.
+
+Assets are only rewritten when their serialized content actually changes, so
+an unchanged asset keeps its modification time and does not trigger an app
+rebuild. Writes go through a temporary file and os.replace, so a reader never
+sees a half-written asset.
+"""
+
+import os
+import json
+from typing import Any
+
+
+def write_bytes_if_changed(path: str, content: bytes) -> bool:
+    """Writes content to path unless the file already holds exactly these bytes. Returns True if written."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_text_if_changed(path: str, content: str) -> bool:
+    """Writes UTF-8 text to path unless the file already holds exactly that text. Returns True if written."""
+    return write_bytes_if_changed(path, content.encode('utf-8'))
+
+
+def write_json_if_changed(path: str, data: Any, indent: int = 2) -> bool:
+    """Serializes data like json.dump(..., ensure_ascii=False) and writes it only if it changed."""
+    return write_text_if_changed(path, json.dumps(data, ensure_ascii=False, indent=indent))
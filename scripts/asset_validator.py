@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Validator of the structure assets (src/assets/data/*.json).
+
+The app only type-checks the top level of each asset (DataLoaderService) and
+silently skips a file it cannot use. This validator checks what the app
+actually relies on, so a bad converter output fails the build instead:
+
+    category      name and content_type strings, at least one of books/data/subcategories
+    subcategory   a category of its own (content_type required, as it decides the page type)
+    book          exactly one of 'pages' or 'parts'
+    pages         a positive number; a fraction only for daf-type books, and only a half
+                  page (x.5: the last daf has amud aleph only)
+    parts         name, start <= end
+    exclude       integers inside the page range of the book or part, without repeats
+    amudim        first_amud/last_amud (integer amud codes, see amud.py), if present, only on
+                  daf-type books, both together and matching 'pages'; exclude_amudim inside them
+    aggregates    unit_count/unit_offset/amud_count/amud_offset, if present, are integers >= 0
+
+ASSET_SCHEMA is compiled once into nested checking functions, and each file
+is then validated in a single pass over its tree. Errors carry a JSON path,
+e.g. $.subcategories[1].books["ברכות"].pages.
+
+In incremental mode only the files that changed since their last successful
+validation (size or modification time) are checked; the record is kept in a
+small state file.
+
+Usage: python asset_validator.py [PATH ...] [--incremental] [--state FILE]
+       (PATH: asset files or directories; default: the app's assets directory)
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from amud import amudim_from_pages
+from asset_aggregates import DAF_CONTENT_TYPE
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ASSETS_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "src", "assets", "data"))
+DEFAULT_STATE_PATH = os.path.join(SCRIPT_DIR, "build", "validation_state.json")
+# Bump when the checks change, so incremental mode re-validates everything
+VALIDATOR_VERSION = 2
+
+AGGREGATE_FIELDS = ("unit_count", "unit_offset", "amud_count", "amud_offset")
+
+# Paths are (parent, key) chains, formatted only when an error is reported
+Path = Optional[Tuple[Any, Any]]
+Check = Callable[[Any, Path, "Context"], None]
+
+
+def format_path(path: Path) -> str:
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(key)
+    parts = ["$"]
+    for key in reversed(keys):
+        if isinstance(key, int):
+            parts.append(f"[{key}]")
+        elif key.isidentifier() and key.isascii():
+            parts.append(f".{key}")
+        else:
+            parts.append(f"[{json.dumps(key, ensure_ascii=False)}]")
+    return "".join(parts)
+
+
+class Context:
+    """Collects the errors of one file and the page type of the enclosing category."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.errors: List[Dict[str, str]] = []
+        self.content_types: List[str] = []
+
+    def error(self, path: Path, message: str):
+        self.errors.append({"file": self.filename, "path": format_path(path), "message": message})
+
+    @property
+    def is_daf(self) -> bool:
+        return bool(self.content_types) and self.content_types[-1] == DAF_CONTENT_TYPE
+
+
+# --- Semantic rules (run after an object's properties were checked) ---
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_excludes(node: Dict[str, Any], path: Path, ctx: Context, start: int, end: int):
+    excluded = node.get("exclude")
+    if not isinstance(excluded, list):
+        return
+    seen = set()
+    for i, page in enumerate(excluded):
+        if not _is_int(page):
+            continue # Reported by the item check
+        if not start <= page <= end:
+            ctx.error(((path, "exclude"), i), f"excluded page {page} is outside the range {start}-{end}")
+        elif page in seen:
+            ctx.error(((path, "exclude"), i), f"page {page} is excluded twice")
+        seen.add(page)
+
+
+def _check_amudim(book: Dict[str, Any], path: Path, ctx: Context, start: int, pages: float):
+    has_first, has_last = "first_amud" in book, "last_amud" in book
+    if not (has_first or has_last or "exclude_amudim" in book):
+        return
+    if not ctx.is_daf:
+        ctx.error(path, "amud fields in a book that is not daf-type")
+        return
+    if has_first != has_last:
+        ctx.error(path, "'first_amud' and 'last_amud' go together")
+        return
+    first, last = book.get("first_amud"), book.get("last_amud")
+    if not (_is_int(first) and _is_int(last)):
+        return # Reported by the property check
+    if (first, last) != amudim_from_pages(pages, start):
+        ctx.error(path, f"amudim {first}-{last} do not match {pages} pages from daf {start}")
+        return
+    excluded = book.get("exclude_amudim")
+    if not isinstance(excluded, list):
+        return
+    seen = set()
+    for i, amud in enumerate(excluded):
+        if not _is_int(amud):
+            continue
+        if not first <= amud <= last:
+            ctx.error(((path, "exclude_amudim"), i), f"excluded amud {amud} is outside the range {first}-{last}")
+        elif amud in seen:
+            ctx.error(((path, "exclude_amudim"), i), f"amud {amud} is excluded twice")
+        seen.add(amud)
+
+
+def _book_rule(book: Dict[str, Any], path: Path, ctx: Context):
+    has_pages, has_parts = "pages" in book, "parts" in book
+    if has_pages == has_parts:
+        ctx.error(path, "a book needs exactly one of 'pages' or 'parts'" if has_pages
+                  else "a book has neither 'pages' nor 'parts'")
+        return
+    if has_parts:
+        if "exclude" in book:
+            ctx.error((path, "exclude"), "'exclude' of a book with parts belongs on its parts")
+        return
+    pages = book["pages"]
+    if not _is_number(pages) or pages <= 0:
+        return # Reported by the property check
+    start = book.get("startPage", 2 if ctx.is_daf else 1)
+    if not _is_int(start):
+        return
+    if pages != int(pages):
+        if not ctx.is_daf:
+            ctx.error((path, "pages"), f"fractional page count {pages} in a book that is not daf-type")
+            return
+        if pages * 2 != int(pages * 2):
+            ctx.error((path, "pages"), f"page count {pages} is neither whole nor a half daf (x.5)")
+            return
+    whole = int(pages)
+    end = start + (whole if whole == pages else whole + 1) - 1
+    _check_excludes(book, path, ctx, start, end)
+    _check_amudim(book, path, ctx, start, pages)
+
+
+def _part_rule(part: Dict[str, Any], path: Path, ctx: Context):
+    start, end = part.get("start"), part.get("end")
+    if not (_is_int(start) and _is_int(end)):
+        return
+    if start > end:
+        ctx.error(path, f"start {start} is after end {end}")
+        return
+    _check_excludes(part, path, ctx, start, end)
+
+
+# --- Schema ---
+
+_AGGREGATES = {field: {"type": "integer", "minimum": 0} for field in AGGREGATE_FIELDS}
+_EXCLUDE = {"type": "list", "items": {"type": "integer", "minimum": 1}}
+
+ASSET_SCHEMA: Dict[str, Any] = {
+    "definitions": {
+        "category": {
+            "type": "object",
+            "required": ["name", "content_type"],
+            "any_of": ["books", "data", "subcategories"],
+            "content_type_key": "content_type",
+            "properties": dict({
+                "name": {"type": "string", "min_length": 1},
+                "content_type": {"type": "string", "min_length": 1},
+                "books": {"type": "map", "values": {"ref": "book"}},
+                "data": {"type": "map", "values": {"ref": "book"}},
+                "subcategories": {"type": "list", "items": {"ref": "category"}},
+            }, **_AGGREGATES),
+        },
+        "book": {
+            "type": "object",
+            "rule": _book_rule,
+            "properties": dict({
+                "pages": {"type": "number", "exclusive_minimum": 0},
+                "startPage": {"type": "integer", "minimum": 1},
+                "exclude": _EXCLUDE,
+                "first_amud": {"type": "integer", "minimum": 2},
+                "last_amud": {"type": "integer", "minimum": 2},
+                "exclude_amudim": {"type": "list", "items": {"type": "integer", "minimum": 2}},
+                "parts": {"type": "list", "min_items": 1, "items": {"ref": "part"}},
+            }, **_AGGREGATES),
+        },
+        "part": {
+            "type": "object",
+            "required": ["name", "start", "end"],
+            "rule": _part_rule,
+            "properties": dict({
+                "name": {"type": "string", "min_length": 1},
+                "start": {"type": "integer", "minimum": 1},
+                "end": {"type": "integer", "minimum": 1},
+                "exclude": _EXCLUDE,
+            }, **_AGGREGATES),
+        },
+    },
+    "root": {"ref": "category"},
+}
+
+
+# --- Compiler ---
+
+class SchemaCompiler:
+    """Compiles a schema (see ASSET_SCHEMA) into one checking function per node type."""
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.definitions = schema["definitions"]
+        self.compiled: Dict[str, Check] = {}
+        self.root = self.compile(schema["root"])
+
+    def compile(self, spec: Dict[str, Any]) -> Check:
+        if "ref" in spec:
+            return self._compile_ref(spec["ref"])
+        return getattr(self, f"_compile_{spec['type']}")(spec)
+
+    def _compile_ref(self, name: str) -> Check:
+        if name not in self.compiled:
+            # Placeholder first, so recursive references (subcategories) resolve to the final function
+            self.compiled[name] = lambda value, path, ctx: check(value, path, ctx)
+            check = self.compile(self.definitions[name])
+            self.compiled[name] = check
+        return self.compiled[name]
+
+    @staticmethod
+    def _compile_string(spec: Dict[str, Any]) -> Check:
+        min_length = spec.get("min_length", 0)
+
+        def check(value, path, ctx):
+            if not isinstance(value, str):
+                ctx.error(path, f"expected a string, got {type(value).__name__}")
+            elif len(value) < min_length:
+                ctx.error(path, "must not be empty")
+        return check
+
+    @staticmethod
+    def _compile_integer(spec: Dict[str, Any]) -> Check:
+        minimum = spec.get("minimum")
+
+        def check(value, path, ctx):
+            if not _is_int(value):
+                ctx.error(path, f"expected an integer, got {json.dumps(value, ensure_ascii=False)}")
+            elif minimum is not None and value < minimum:
+                ctx.error(path, f"{value} is below the minimum {minimum}")
+        return check
+
+    @staticmethod
+    def _compile_number(spec: Dict[str, Any]) -> Check:
+        exclusive_minimum = spec.get("exclusive_minimum")
+
+        def check(value, path, ctx):
+            if not _is_number(value):
+                ctx.error(path, f"expected a number, got {json.dumps(value, ensure_ascii=False)}")
+            elif exclusive_minimum is not None and value <= exclusive_minimum:
+                ctx.error(path, f"{value} must be greater than {exclusive_minimum}")
+        return check
+
+    def _compile_list(self, spec: Dict[str, Any]) -> Check:
+        item_check = self.compile(spec["items"])
+        min_items = spec.get("min_items", 0)
+
+        def check(value, path, ctx):
+            if not isinstance(value, list):
+                ctx.error(path, f"expected a list, got {type(value).__name__}")
+                return
+            if len(value) < min_items:
+                ctx.error(path, f"expected at least {min_items} item(s)")
+            for i, item in enumerate(value):
+                item_check(item, (path, i), ctx)
+        return check
+
+    def _compile_map(self, spec: Dict[str, Any]) -> Check:
+        value_check = self.compile(spec["values"])
+
+        def check(value, path, ctx):
+            if not isinstance(value, dict):
+                ctx.error(path, f"expected an object, got {type(value).__name__}")
+                return
+            for key, item in value.items():
+                value_check(item, (path, key), ctx)
+        return check
+
+    def _compile_object(self, spec: Dict[str, Any]) -> Check:
+        properties = [(key, self.compile(sub_spec)) for key, sub_spec in spec.get("properties", {}).items()]
+        required = spec.get("required", [])
+        any_of = spec.get("any_of", [])
+        rule = spec.get("rule")
+        content_type_key = spec.get("content_type_key")
+
+        def check(value, path, ctx):
+            if not isinstance(value, dict):
+                ctx.error(path, f"expected an object, got {type(value).__name__}")
+                return
+            for key in required:
+                if key not in value:
+                    ctx.error(path, f"missing required '{key}'")
+            if any_of and not any(key in value for key in any_of):
+                ctx.error(path, f"needs at least one of {', '.join(repr(key) for key in any_of)}")
+            if content_type_key:
+                ctx.content_types.append(value.get(content_type_key))
+            for key, property_check in properties:
+                if key in value:
+                    property_check(value[key], (path, key), ctx)
+            if rule is not None:
+                rule(value, path, ctx)
+            if content_type_key:
+                ctx.content_types.pop()
+        return check
+
+
+_VALIDATE: Optional[Check] = None
+
+
+def validate_data(data: Any, filename: str = "") -> List[Dict[str, str]]:
+    """Validates one parsed asset. Returns the errors ({file, path, message}), empty if valid."""
+    global _VALIDATE
+    if _VALIDATE is None:
+        _VALIDATE = SchemaCompiler(ASSET_SCHEMA).root # Compiled once per process
+    ctx = Context(filename)
+    _VALIDATE(data, None, ctx)
+    return ctx.errors
+
+
+def validate_file(path: str) -> List[Dict[str, str]]:
+    filename = os.path.basename(path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        return [{"file": filename, "path": "$", "message": f"cannot be read as JSON: {e}"}]
+    return validate_data(data, filename)
+
+
+# --- Batch and incremental validation ---
+
+def _file_signature(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [VALIDATOR_VERSION, stat.st_size, stat.st_mtime_ns]
+
+
+def _load_state(state_path: str) -> Dict[str, List[int]]:
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def collect_asset_files(paths: List[str]) -> List[str]:
+    """Expands directories to their *.json files (sorted); files are kept as given."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".json"))
+        else:
+            files.append(path)
+    return files
+
+
+def validate_files(files: List[str], state_path: Optional[str] = None) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Validates the files, skipping the ones unchanged since their last successful
+    validation when state_path is given (incremental mode). Returns (errors,
+    number of files checked).
+    """
+    state = _load_state(state_path) if state_path else {}
+    errors: List[Dict[str, str]] = []
+    checked = 0
+    for path in files:
+        key = os.path.abspath(path)
+        try:
+            signature = _file_signature(path)
+        except OSError as e:
+            errors.append({"file": os.path.basename(path), "path": "$", "message": f"cannot be read: {e}"})
+            continue
+        if state.get(key) == signature:
+            continue
+        checked += 1
+        file_errors = validate_file(path)
+        errors.extend(file_errors)
+        if file_errors:
+            state.pop(key, None)
+        else:
+            state[key] = signature
+    if state_path:
+        os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    return errors, checked
+
+
+def print_errors(errors: List[Dict[str, str]]):
+    for error in errors:
+        print(f"{error['file']}: {error['path']}: {error['message']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate the structure assets.")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_ASSETS_DIR], help="Asset files or directories.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only check files changed since their last successful validation.")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="State file of incremental mode.")
+    args = parser.parse_args(argv)
+
+    files = collect_asset_files(args.paths)
+    errors, checked = validate_files(files, args.state if args.incremental else None)
+    print_errors(errors)
+    print(f"Validated {checked} of {len(files)} files: {len(errors)} error(s).")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
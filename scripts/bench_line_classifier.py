@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks the per-line classification of the hierarchy pass.
+
+"before" runs the part, sub-part and division searches one after the other on
+every line, as the hierarchy pass used to. "after" runs classify_line, which
+skips body lines with a substring test and decides heading lines with one
+fused pattern. Both must return identical results for every line.
+
+Usage: python bench_line_classifier.py [--lines N] [--repeat R] [--seed S] [--level L]
+"""
+
+import time
+import random
+import argparse
+from typing import Callable, List
+
+from chaper_numbering_script import classify_line, _classify_line_sequential, DIVISION_KEYWORDS
+
+# Fraction of generated lines that are headings (Otzaria books are mostly body text)
+HEADING_RATIO = 0.03
+HEBREW_LETTERS = "אבגדהוזחטיכלמנסעפצקרשת"
+
+
+def generate_lines(count: int, seed: int) -> List[str]:
+    """Generates stripped Otzaria-style lines: body text with occasional H2/H3/H4 headings."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        if rng.random() < HEADING_RATIO:
+            level = rng.choice((2, 3, 4))
+            keyword = rng.choice(DIVISION_KEYWORDS[:3])
+            identifier = "".join(rng.choice(HEBREW_LETTERS) for _ in range(rng.randint(1, 3)))
+            lines.append(f"<h{level}>{keyword} {identifier}</h{level}>")
+        else:
+            words = ["".join(rng.choice(HEBREW_LETTERS) for _ in range(rng.randint(2, 7)))
+                     for _ in range(rng.randint(5, 60))]
+            if rng.random() < 0.3:
+                words[0] = f"<b>{words[0]}</b>" # Inline markup without headings
+            lines.append(" ".join(words))
+    return lines
+
+
+def measure(classifier: Callable, lines: List[str], level: int, repeat: int) -> float:
+    """Returns the best lines/second over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            classifier(line, level, "פרק")
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Line classifier benchmark")
+    parser.add_argument("--lines", type=int, default=200000, help="Number of generated lines.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is reported).")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the generated lines.")
+    parser.add_argument("--level", type=int, choices=(2, 3, 4), default=4,
+                        help="Dominant division level (4 = part, sub-part and division searches).")
+    args = parser.parse_args()
+
+    lines = generate_lines(args.lines, args.seed)
+    mismatches = sum(
+        1 for line in lines
+        if classify_line(line, args.level, "פרק") != _classify_line_sequential(line, args.level, "פרק")
+    )
+    if mismatches:
+        raise SystemExit(f"Classifier mismatch on {mismatches} lines.")
+
+    before = measure(_classify_line_sequential, lines, args.level, args.repeat)
+    after = measure(classify_line, lines, args.level, args.repeat)
+    print(f"Lines: {len(lines)} (heading ratio {HEADING_RATIO:.0%}), dominant H{args.level}, results identical.")
+    print(f"before (sequential searches): {before:,.0f} lines/sec")
+    print(f"after  (fused classifier):    {after:,.0f} lines/sec")
+    print(f"speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
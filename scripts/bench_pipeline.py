@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite for the analysis pipeline, run on a seeded synthetic corpus
+(corpus_generator.py).
+
+Stages:
+    analyzer:<mode>  TextAnalyzer on every file, per input mode, with per-stage timings
+                     (read, book name + dominant division pass, hierarchy pass, assembly)
+    runner           LibraryRunner over the whole corpus (process pool, Gematria checks)
+    gematria         hebrew_numeral_to_int per identifier, and numerals_to_ints per list
+    converter        converter_core.build_structure on the runner's in-memory results
+
+Every stage reports its best time over --repeat runs, lines/sec and MB/sec where
+they apply, and the peak RSS of the process so far (when the `resource` module
+is available). Results are saved as JSON (--output) and can be compared with an
+earlier run (--compare), e.g. one saved before a performance change.
+
+Logging is disabled while measuring, so the numbers show the analysis work itself.
+
+Usage: python bench_pipeline.py [--books B] [--divisions D] [--seed S] [--repeat R]
+                                [--modes lines stream mmap] [--detection full|adaptive] [--workers W]
+                                [--output FILE] [--compare FILE]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+from chaper_numbering_script import ANALYSIS_STEPS, DETECTION_MODES, INPUT_MODES, LibraryRunner, TextAnalyzer
+from converter_core import build_structure
+from corpus_generator import add_corpus_arguments, corpus_settings, generate_corpus
+from gematria import _numeral_value, hebrew_numeral_to_int, int_to_hebrew, numerals_to_ints
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(SCRIPT_DIR, "build", "bench")
+# Identifiers converted per Gematria measurement
+GEMATRIA_SAMPLE_SIZE = 200000
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, or None where `resource` is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # Bytes on macOS, KB elsewhere
+
+
+def _best_of(repeat: int, func: Callable[[], Any]) -> float:
+    """Runs func `repeat` times and returns the best wall time."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Stages ---
+
+def bench_analyzer(filepaths: List[str], input_mode: str, repeat: int, total_lines: int, total_bytes: int,
+                   detection: str = "full") -> Dict[str, Any]:
+    """
+    TextAnalyzer.analyze() on every file, with the time of each analysis step
+    (ANALYSIS_STEPS, as timed by the analyzer itself) summed over the files.
+    Memory tracing (collect_metrics) is left off, so it does not slow the steps.
+    """
+    best: Optional[Dict[str, float]] = None
+    books_found = 0
+    for _ in range(repeat):
+        stages = {step: 0.0 for step in ANALYSIS_STEPS}
+        books_found = 0
+        for filepath in filepaths:
+            analyzer = TextAnalyzer(filepath, input_mode=input_mode, detection=detection)
+            if analyzer.analyze():
+                books_found += 1
+            for step in ANALYSIS_STEPS:
+                stages[step] += analyzer.metrics["seconds"].get(step, 0.0) # Steps skipped after an early exit
+        stages["total"] = sum(stages.values())
+        if best is None or stages["total"] < best["total"]:
+            best = stages
+    return {
+        "seconds": best["total"],
+        "lines_per_sec": total_lines / best["total"],
+        "mb_per_sec": total_bytes / 1e6 / best["total"],
+        "stage_seconds": {step: best[step] for step in ANALYSIS_STEPS},
+        "books_found": books_found,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_runner(corpus_dir: str, input_mode: str, workers: int, repeat: int,
+                 total_lines: int, total_bytes: int, detection: str = "full") -> Dict[str, Any]:
+    """LibraryRunner over the corpus, in memory. Returns the stage result and the last run's analyses."""
+    analyses: List[Dict[str, Any]] = []
+
+    def run():
+        analyses[:] = LibraryRunner(corpus_dir, workers=workers, input_mode=input_mode, write_outputs=False,
+                                    detection=detection).run()
+
+    seconds = _best_of(repeat, run)
+    return {
+        "seconds": seconds,
+        "input_mode": input_mode,
+        "workers": workers,
+        "lines_per_sec": total_lines / seconds,
+        "mb_per_sec": total_bytes / 1e6 / seconds,
+        "collections": len(analyses),
+        "peak_rss_mb": peak_rss_mb(),
+        "children_peak_rss_mb": (resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+                                 if resource is not None and sys.platform != "darwin" else None),
+    }, analyses
+
+
+def bench_gematria(divisions: int, repeat: int) -> Dict[str, Any]:
+    """Converts plain and punctuated numerals; the memo is cleared before every run."""
+    numerals = [int_to_hebrew(n) for n in range(1, divisions + 1)]
+    numerals += [int_to_hebrew(n, punctuate=True) for n in range(1, divisions + 1)]
+    sample = (numerals * (GEMATRIA_SAMPLE_SIZE // len(numerals) + 1))[:GEMATRIA_SAMPLE_SIZE]
+
+    def scalar():
+        _numeral_value.cache_clear()
+        for numeral in sample:
+            hebrew_numeral_to_int(numeral)
+
+    def batch():
+        _numeral_value.cache_clear()
+        numerals_to_ints(sample)
+
+    scalar_seconds = _best_of(repeat, scalar)
+    batch_seconds = _best_of(repeat, batch)
+    return {
+        "seconds": scalar_seconds,
+        "identifiers": len(sample),
+        "scalar_per_sec": len(sample) / scalar_seconds,
+        "batch_per_sec": len(sample) / batch_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_converter(analyses: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    """Builds one generic structure per collection (progress output is discarded)."""
+    def convert():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for collection in analyses:
+                build_structure("mishna_berura", [collection])
+
+    seconds = _best_of(repeat, convert)
+    books = sum(len(collection.get("books_data", {})) for collection in analyses)
+    return {"seconds": seconds, "books": books, "books_per_sec": books / seconds if seconds else None,
+            "peak_rss_mb": peak_rss_mb()}
+
+
+# --- Reporting ---
+
+def _format_rate(stage: Dict[str, Any]) -> str:
+    for key, unit in (("lines_per_sec", "lines/s"), ("scalar_per_sec", "ids/s"), ("books_per_sec", "books/s")):
+        if stage.get(key):
+            rate = f"{stage[key]:,.0f} {unit}"
+            if "mb_per_sec" in stage:
+                rate += f", {stage['mb_per_sec']:.1f} MB/s"
+            return rate
+    return ""
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """Prints one line per stage, with the speedup against a baseline run if given."""
+    print(f"{'stage':<18} {'seconds':>9}  {'rate':<34} {'peak RSS':>9}  {'vs baseline':>11}")
+    for name, stage in results["stages"].items():
+        rss = f"{stage['peak_rss_mb']:.0f} MB" if stage.get("peak_rss_mb") is not None else "n/a"
+        comparison = ""
+        if baseline and name in baseline.get("stages", {}):
+            comparison = f"{baseline['stages'][name]['seconds'] / stage['seconds']:.2f}x"
+        print(f"{name:<18} {stage['seconds']:>9.3f}  {_format_rate(stage):<34} {rss:>9}  {comparison:>11}")
+        for step, seconds in stage.get("stage_seconds", {}).items():
+            print(f"  {step:<16} {seconds:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analysis pipeline benchmark suite")
+    add_corpus_arguments(parser)
+    parser.add_argument("--corpus-dir", help="Generate the corpus here and keep it (default: a temporary directory).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (best is reported).")
+    parser.add_argument("--modes", nargs="+", choices=INPUT_MODES, default=list(INPUT_MODES),
+                        help="TextAnalyzer input modes to measure.")
+    parser.add_argument("--detection", choices=DETECTION_MODES, default="full",
+                        help="Dominant-division detection of the analyzer and runner stages.")
+    parser.add_argument("--runner-mode", choices=INPUT_MODES, default="lines", help="Input mode of the runner stage.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the runner stage.")
+    parser.add_argument("--output", help=f"Results file (default: {DEFAULT_RESULTS_DIR}/bench_<time>.json).")
+    parser.add_argument("--compare", metavar="FILE", help="Earlier results file to compare against.")
+    args = parser.parse_args()
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="bench_corpus_")
+    logging.disable(logging.WARNING)
+    try:
+        start = time.perf_counter()
+        manifest = generate_corpus(corpus_dir, **corpus_settings(args))
+        generate_seconds = time.perf_counter() - start
+        filepaths = [os.path.join(corpus_dir, entry["path"]) for entry in manifest["files"]]
+        total_lines, total_bytes = manifest["total_lines"], manifest["total_bytes"]
+        print(f"Corpus: {len(filepaths)} books, {total_lines:,} lines, {total_bytes / 1e6:.1f} MB "
+              f"(generated in {generate_seconds:.1f}s)")
+
+        stages: Dict[str, Dict[str, Any]] = {}
+        for mode in args.modes:
+            stages[f"analyzer:{mode}"] = bench_analyzer(filepaths, mode, args.repeat, total_lines, total_bytes,
+                                                        args.detection)
+        stages["runner"], analyses = bench_runner(corpus_dir, args.runner_mode, args.workers, args.repeat,
+                                                  total_lines, total_bytes, args.detection)
+        stages["gematria"] = bench_gematria(args.divisions, args.repeat)
+        stages["converter"] = bench_converter(analyses, args.repeat)
+    finally:
+        logging.disable(logging.NOTSET)
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": dict(manifest["settings"], files=len(filepaths), total_lines=total_lines, total_bytes=total_bytes),
+        "repeat": args.repeat,
+        "detection": args.detection,
+        "stages": stages,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != results["corpus"]:
+            print("Warning: the baseline was measured on a different corpus; the comparison is not like for like.")
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
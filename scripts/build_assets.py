@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Non-interactive build of the app's structure assets (src/assets/data/*.json).
+
+Every target is built from one source directory of the library:
+
+    <library>/<source>/**/*.txt  --analyze + convert (in memory)-->  <assets>/<asset>.json
+
+The analysis results are handed to converter_core directly, without writing
+and re-parsing `_analysis.json` files; those are only written on request
+(--keep-analysis, or the `analyze` command) as debug artifacts. A target is
+only rebuilt when its source tree, the analyzer configuration or the
+converter code (ASSET_MODULES) changed since the last build (tracked in
+<build>/build_state.json), and an asset file is only rewritten when its
+content actually changed. After `all` and `convert`, every asset of the
+assets directory is validated (asset_validator.py, incrementally: only
+changed files), and the build stops on errors. Valid assets are then packed into one indexed, minified bundle
+(asset_bundle.py) for lazy per-category loading, and loaded into a
+normalized SQLite catalog (structure_catalog.py) for indexed SQL queries.
+
+Usage:
+    python build_assets.py all --library PATH       # rebuild the stale targets
+    python build_assets.py analyze --library PATH   # write the analysis files only
+    python build_assets.py convert                  # convert previously written analysis files
+    python build_assets.py validate                 # validate every asset
+    python build_assets.py bundle                   # repack the asset bundle only
+    python build_assets.py catalog                  # rebuild the SQLite catalog only
+    python build_assets.py status --library PATH    # show what is stale
+    python build_assets.py watch --library PATH     # rebuild live while the sources are edited
+
+In watch mode (library_watch.py) the targets are analyzed once, then only the
+touched books are re-analyzed and their assets patched in place.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUILD_DIR = os.path.join(SCRIPT_DIR, "build")
+DEFAULT_ASSETS_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "src", "assets", "data"))
+BUILD_STATE_FILENAME = "build_state.json"
+VALIDATION_STATE_FILENAME = "validation_state.json"
+ANALYSIS_SUFFIX = "_analysis.json"
+# Modules that shape an asset from the analysis results (the analyzer itself is covered by analyzer_config)
+ASSET_MODULES = ("converter_core.py", "asset_aggregates.py", "amud.py", "division_sequence.py", "asset_io.py")
+
+# Each target is converted with the converter_core spec of the same name.
+# source:   directory under the library root (also the analysis directory name)
+# publish:  False writes the output into the build directory instead of the app assets
+BUILD_TARGETS: Dict[str, Dict[str, Any]] = {
+    "tanach": {"source": "תנך", "asset": "tanach.json", "publish": True},
+    "mishna": {"source": "משנה", "asset": "mishna.json", "publish": True},
+    "shas": {"source": "תלמוד בבלי", "asset": "shas.json", "publish": True},
+    "rambam": {"source": "משנה תורה", "asset": "rambam.json", "publish": True},
+    "mishna_berura": {"source": "משנה ברורה", "asset": "mishna_berura_structured.json", "publish": False},
+}
+
+
+# --- Fingerprints ---
+
+def _hash_file(path: str) -> str:
+    """Returns the SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_fingerprint(source_dir: str, input_mode: str) -> Optional[str]:
+    """
+    Fingerprints a source tree by the path, size and mtime of every text file,
+    plus the analyzer configuration of the input mode. Returns None if the
+    directory is missing.
+    """
+    from chaper_numbering_script import TEXT_FILE_EXTENSIONS, analyzer_config
+    if not os.path.isdir(source_dir):
+        return None
+    entries = []
+    stack = [source_dir]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(TEXT_FILE_EXTENSIONS):
+                    stat = entry.stat()
+                    entries.append((os.path.relpath(entry.path, source_dir), stat.st_size, stat.st_mtime_ns))
+    payload = json.dumps([sorted(entries), analyzer_config(input_mode)], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _target_fingerprint(source_dir: str, input_mode: str) -> Optional[str]:
+    """Combines the source fingerprint with the code of the ASSET_MODULES, which also shape the asset."""
+    source = _source_fingerprint(source_dir, input_mode)
+    if source is None:
+        return None
+    modules = ":".join(_hash_file(os.path.join(SCRIPT_DIR, module)) for module in ASSET_MODULES)
+    return hashlib.sha256(f"{source}:{modules}".encode('ascii')).hexdigest()
+
+
+# --- Build State ---
+
+class AssetBuild:
+    """Tracks a fingerprint per target and rebuilds the stale ones."""
+
+    def __init__(self, library_dir: Optional[str], build_dir: str, assets_dir: str, targets: List[str]):
+        self.library_dir = library_dir
+        self.build_dir = build_dir
+        self.assets_dir = assets_dir
+        self.targets = targets
+        self.state_path = os.path.join(build_dir, BUILD_STATE_FILENAME)
+        self.state: Dict[str, Dict[str, Optional[str]]] = self._load_state()
+
+    def _load_state(self) -> Dict[str, Dict[str, Optional[str]]]:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(self.build_dir, exist_ok=True)
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+
+    def source_dir(self, name: str) -> Optional[str]:
+        if not self.library_dir:
+            return None
+        return os.path.join(self.library_dir, BUILD_TARGETS[name]["source"])
+
+    def analysis_dir(self, name: str) -> str:
+        return os.path.join(self.build_dir, "analysis", BUILD_TARGETS[name]["source"])
+
+    def output_path(self, name: str) -> str:
+        target = BUILD_TARGETS[name]
+        return os.path.join(self.assets_dir if target["publish"] else self.build_dir, target["asset"])
+
+    def has_source(self, name: str) -> bool:
+        source_dir = self.source_dir(name)
+        return source_dir is not None and os.path.isdir(source_dir)
+
+    def is_stale(self, name: str, input_mode: str) -> bool:
+        if not self.has_source(name):
+            return False # Nothing to build from
+        if not os.path.isfile(self.output_path(name)):
+            return True
+        return self.state.get(name, {}).get("fingerprint") != _target_fingerprint(self.source_dir(name), input_mode)
+
+    def _analyze(self, name: str, workers: int, input_mode: str, detection: str, cache,
+                 write_outputs: bool) -> List[Dict[str, Any]]:
+        """Analyzes a target's source tree; the analysis files are only written if requested."""
+        from chaper_numbering_script import LibraryRunner
+        analysis_dir = self.analysis_dir(name)
+        if write_outputs:
+            os.makedirs(analysis_dir, exist_ok=True)
+            for old_file in os.listdir(analysis_dir): # Drop outputs of removed collections
+                if old_file.endswith(ANALYSIS_SUFFIX):
+                    os.remove(os.path.join(analysis_dir, old_file))
+        print(f"Analysis [{name}]: {self.source_dir(name)}")
+        return LibraryRunner(self.source_dir(name), workers=workers, input_mode=input_mode, cache=cache,
+                             output_dir=analysis_dir, write_outputs=write_outputs, detection=detection).run()
+
+    @staticmethod
+    def _open_cache(cache_path: Optional[str], input_mode: str):
+        if not cache_path:
+            return None
+        from chaper_numbering_script import analyzer_config
+        from analysis_cache import AnalysisCache, config_fingerprint
+        return AnalysisCache(cache_path, config_fingerprint(analyzer_config(input_mode)))
+
+    # --- Commands ---
+
+    def build(self, force: bool, workers: int, input_mode: str, detection: str, cache_path: Optional[str],
+              keep_analysis: bool):
+        """Analyzes and converts every stale target, handing the results over in memory."""
+        from converter_core import write_structure
+
+        stale = [name for name in self.targets if self.has_source(name) and (force or self.is_stale(name, input_mode))]
+        for name in self.targets:
+            if not self.has_source(name):
+                print(f"[{name}]: source directory not found, skipped.")
+        if not stale:
+            print("All targets up to date.")
+            return
+        cache = self._open_cache(cache_path, input_mode)
+        fingerprints = {}
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(stale)))) as executor:
+            futures = {}
+            for name in stale:
+                fingerprints[name] = _target_fingerprint(self.source_dir(name), input_mode) # Taken before reading, so edits during the run are caught next time
+                analyses = self._analyze(name, workers, input_mode, detection, cache, keep_analysis)
+                # Converted in the background, while the next target is analyzed
+                futures[name] = executor.submit(write_structure, name, analyses, self.output_path(name))
+            for name, future in futures.items():
+                try:
+                    changed = future.result()
+                except Exception as e:
+                    print(f"Conversion [{name}]: failed: {e}")
+                    continue
+                print(f"Conversion [{name}]: {self.output_path(name)} ({'written' if changed else 'unchanged'})")
+                self.state[name] = {"fingerprint": fingerprints[name]}
+                self._save_state()
+
+    def analyze(self, workers: int, input_mode: str, detection: str, cache_path: Optional[str]):
+        """Writes the `_analysis.json` files of every target, for inspection or a later `convert`."""
+        cache = self._open_cache(cache_path, input_mode)
+        for name in self.targets:
+            if self.has_source(name):
+                self._analyze(name, workers, input_mode, detection, cache, write_outputs=True)
+            else:
+                print(f"Analysis [{name}]: source directory not found, skipped.")
+
+    def convert(self, workers: int):
+        """Converts previously written analysis files, running the targets in parallel."""
+        jobs = {name: (name, self.analysis_dir(name), self.output_path(name))
+                for name in self.targets if os.path.isdir(self.analysis_dir(name))}
+        if not jobs:
+            print("Conversion: no analysis files found.")
+            return
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as executor:
+            futures = {name: executor.submit(_run_converter, *job) for name, job in jobs.items()}
+            for name, future in futures.items():
+                try:
+                    changed = future.result()
+                except Exception as e:
+                    print(f"Conversion [{name}]: failed: {e}")
+                    continue
+                print(f"Conversion [{name}]: {self.output_path(name)} ({'written' if changed else 'unchanged'})")
+
+    def validate(self, incremental: bool) -> bool:
+        """Validates the assets (incrementally: only the files changed since they last passed). Returns True if valid."""
+        if not os.path.isdir(self.assets_dir):
+            print(f"Validation: assets directory '{self.assets_dir}' not found, skipped.")
+            return True
+        from asset_validator import collect_asset_files, print_errors, validate_files
+        files = collect_asset_files([self.assets_dir])
+        state_path = os.path.join(self.build_dir, VALIDATION_STATE_FILENAME) if incremental else None
+        errors, checked = validate_files(files, state_path)
+        print_errors(errors)
+        print(f"Validation: {checked} of {len(files)} files checked, {len(errors)} error(s).")
+        return not errors
+
+    def bundle(self, bundle_path: Optional[str] = None):
+        """Packs every asset of the assets directory into the indexed bundle (default: in the build directory)."""
+        if not os.path.isdir(self.assets_dir):
+            print(f"Bundle: assets directory '{self.assets_dir}' not found, skipped.")
+            return
+        from asset_bundle import BUNDLE_FILENAME, write_bundle
+        bundle_path = bundle_path or os.path.join(self.build_dir, BUNDLE_FILENAME)
+        changed = write_bundle(self.assets_dir, bundle_path)
+        print(f"Bundle: {bundle_path} ({'written' if changed else 'unchanged'})")
+
+    def catalog(self, catalog_path: Optional[str] = None):
+        """Loads every asset of the assets directory into the SQLite catalog (default: in the build directory)."""
+        if not os.path.isdir(self.assets_dir):
+            print(f"Catalog: assets directory '{self.assets_dir}' not found, skipped.")
+            return
+        from structure_catalog import CATALOG_FILENAME, write_catalog
+        catalog_path = catalog_path or os.path.join(self.build_dir, CATALOG_FILENAME)
+        changed = write_catalog(self.assets_dir, catalog_path)
+        print(f"Catalog: {catalog_path} ({'written' if changed else 'unchanged'})")
+
+    def status(self, input_mode: str):
+        """Prints which targets are stale."""
+        print(f"{'target':<15} {'status':<10} output")
+        for name in self.targets:
+            status = "no source" if not self.has_source(name) else "stale" if self.is_stale(name, input_mode) else "ok"
+            print(f"{name:<15} {status:<10} {self.output_path(name)}")
+
+
+def _run_converter(spec_name: str, input_path: str, output_path: str) -> bool:
+    """Process-pool entry point: converts the analysis files of one target."""
+    from converter_core import convert_files
+    return convert_files(spec_name, input_path, output_path)
+
+
+# --- Command Line ---
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--build-dir", default=DEFAULT_BUILD_DIR, help="Analysis files and build state.")
+    common.add_argument("--assets-dir", default=DEFAULT_ASSETS_DIR, help="Where published assets are written.")
+    common.add_argument("--targets", nargs="+", choices=sorted(BUILD_TARGETS), default=list(BUILD_TARGETS),
+                        help="Targets to build (default: all).")
+    common.add_argument("--bundle", metavar="PATH",
+                        help="Asset bundle path (default: structure_bundle.bin in the build directory).")
+    common.add_argument("--catalog", metavar="PATH",
+                        help="SQLite catalog path (default: structure_catalog.sqlite in the build directory).")
+    common.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel processes.")
+
+    library = argparse.ArgumentParser(add_help=False)
+    library.add_argument("--library", required=True, help="Root directory of the source text library.")
+    library.add_argument("--input-mode", default="lines", choices=("lines", "stream", "mmap"),
+                         help="TextAnalyzer input mode.")
+    library.add_argument("--detection", default="full", choices=("full", "adaptive"),
+                         help="TextAnalyzer dominant-division detection (same results, 'adaptive' reads less).")
+    library.add_argument("--cache", metavar="PATH", help="Persistent analysis cache file.")
+
+    parser = argparse.ArgumentParser(description="Build the structure assets from the source library.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("all", parents=[common, library], help="Rebuild the stale targets.")
+    build.add_argument("--force", action="store_true", help="Rebuild even if nothing changed.")
+    build.add_argument("--keep-analysis", action="store_true",
+                       help="Also write the intermediate _analysis.json files (debug artifact).")
+    commands.add_parser("analyze", parents=[common, library], help="Write the analysis files only.")
+    commands.add_parser("convert", parents=[common], help="Convert previously written analysis files.")
+    commands.add_parser("validate", parents=[common], help="Validate every asset.")
+    commands.add_parser("bundle", parents=[common], help="Repack the indexed asset bundle.")
+    commands.add_parser("catalog", parents=[common], help="Rebuild the SQLite catalog of the assets.")
+    watch = commands.add_parser("watch", parents=[common, library],
+                                help="Build, then re-analyze touched books and patch their assets as the sources change.")
+    watch.add_argument("--keep-analysis", action="store_true",
+                       help="Also write and patch the intermediate _analysis.json files.")
+    watch.add_argument("--debounce", type=float, default=0.15,
+                       help="Quiet period (seconds) that closes a batch of changes.")
+    watch.add_argument("--poll", action="store_true", help="Poll file stats instead of using inotify.")
+    status = commands.add_parser("status", parents=[common], help="Show which targets are stale.")
+    status.add_argument("--library", help="Root directory of the source text library.")
+    status.add_argument("--input-mode", default="lines", choices=("lines", "stream", "mmap"),
+                        help="Input mode the targets would be built with.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _parse_args(argv)
+    build = AssetBuild(getattr(args, "library", None), args.build_dir, args.assets_dir, args.targets)
+    if args.command == "status":
+        build.status(args.input_mode)
+    elif args.command == "validate":
+        if not build.validate(incremental=False):
+            sys.exit(1)
+    elif args.command == "analyze":
+        build.analyze(args.workers, args.input_mode, args.detection, args.cache)
+    elif args.command == "watch":
+        from library_watch import watch
+        watch(build, args.input_mode, args.detection, cache_path=args.cache, keep_analysis=args.keep_analysis, workers=args.workers,
+              debounce=args.debounce, polling=args.poll,
+              bundle_path=args.bundle, catalog_path=args.catalog)
+    else:
+        if args.command == "all":
+            build.build(args.force, args.workers, args.input_mode, args.detection, args.cache, args.keep_analysis)
+        elif args.command == "convert":
+            build.convert(args.workers)
+        if args.command in ("all", "convert") and not build.validate(incremental=True):
+            print("Invalid assets: the bundle and the catalog were not updated.")
+            sys.exit(1)
+        if args.command != "catalog":
+            build.bundle(args.bundle)
+        if args.command != "bundle":
+            build.catalog(args.catalog)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, SCRIPT_DIR) # Converters and the analyzer are sibling modules
+    main()
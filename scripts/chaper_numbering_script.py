@@ -6,16 +6,35 @@ Analyses Hebrew religious texts (HTML-like TXT files) to determine their
 hierarchical structure (Parts, Sub-Parts, Divisions) and count the divisions.
 Performs Gematria validation on the last identifier found in each section.
 If validation fails, it identifies and lists all missing division numbers.
+Daf divisions headed by single amudim ('ב.', 'ב:', 'ב ע"א') are validated
+amud by amud, with integer amud codes (see amud.py).
 Outputs the results to a structured JSON file.
 """
 
 import re
 import os
 import json
+import mmap
+import time
 import logging
+import argparse
+import itertools
+import sys
+import tracemalloc
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from datetime import datetime
 from collections import defaultdict
-from typing import List, Dict, Tuple, Optional, Any
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, Any, Sequence
+
+from analysis_cache import AnalysisCache, DEFAULT_MAX_ENTRIES, config_fingerprint, hash_file
+from gematria import hebrew_numeral_to_int
+from division_sequence import check_sequence, count_missing
+from amud import DAF_KEYWORD, FIRST_AMUD, amud_label, amud_labels, decode_amud, parse_amud
+import diagnostics
+from diagnostics import DEFAULT_DIAGNOSTICS_FILENAME
+from result_stream import ResultStreamWriter, finalize, stream_path
 
 # --- Configuration Constants ---
 # Keywords indicating a main countable unit (usually lower level headings)
@@ -34,6 +53,40 @@ DEFAULT_PART_NAME = "_default_part_"
 DEFAULT_SUBPART_NAME = "_default_subpart_"
 # Placeholder key used when sub-part analysis is not applicable (division is not H4)
 LEVEL3_DEFAULT_KEY = "_level3_default_"
+# Number of leading lines searched for an H1 book name
+BOOK_NAME_SEARCH_LINES = 20
+# How TextAnalyzer reads its input: "lines" loads the whole file and scans it twice,
+# "stream" reads it lazily in a single pass and buffers heading lines only,
+# "mmap" maps the file and finds headings with byte patterns, regardless of line breaks
+INPUT_MODES = ("lines", "stream", "mmap")
+# How pass 1 finds the dominant division: "full" counts the candidates of the whole book,
+# "adaptive" (lines mode) stops as soon as the leading pattern is certain, see dominant_is_certain.
+# Both give the same results: adaptive re-checks its decision against the whole book's counts
+# (TextAnalyzer._adaptive_decision_overturned), so the mode is not part of analyzer_config
+DETECTION_MODES = ("full", "adaptive")
+# Adaptive detection: division candidates counted before the first decision, and between decisions
+ADAPTIVE_MIN_CANDIDATES = 100
+ADAPTIVE_CHECK_INTERVAL = 32
+# Adaptive detection: required lead of the leader over the runner-up, in standard deviations
+ADAPTIVE_CONFIDENCE_Z = 4.0
+# Largest identifier value kept by DivisionStats (array('H')); larger values are not division numbers
+MAX_IDENTIFIER_NUMBER = 0xFFFF
+# Longest heading element accepted in mmap mode (bounds the scan after an unclosed tag)
+MAX_HEADING_BYTES = 4096
+# Bump whenever a change to the analysis logic alters its results (invalidates cached results)
+ANALYZER_VERSION = 5
+# Default location of the persistent result cache
+DEFAULT_CACHE_FILENAME = ".analysis_cache.json"
+# File extensions treated as source texts
+TEXT_FILE_EXTENSIONS = ('.txt', '.html', '.htm')
+# Name of the run manifest written by a recursive (multi-collection) run
+MANIFEST_FILENAME = "run_manifest.json"
+# Timed steps of TextAnalyzer.analyze, as recorded in the per-file metrics
+ANALYSIS_STEPS = ("read", "dominant", "hierarchy", "assemble")
+# Percentiles reported in the metrics summary
+METRICS_PERCENTILES = (50, 90, 99)
+# Number of slowest files listed in the metrics summary
+METRICS_SLOWEST_FILES = 10
 
 # --- Setup Logging ---
 logging.basicConfig(
@@ -45,47 +98,26 @@ logging.basicConfig(
 
 # --- Utility Functions ---
 
-def hebrew_numeral_to_int(hebrew_num: str) -> int:
-    """Converts a Hebrew numeral string (Gematria) to an integer."""
-    if not isinstance(hebrew_num, str) or not hebrew_num:
-        return 0
-    hebrew_num = hebrew_num.replace("'", "").replace('"', '').strip()
-    hebrew_num = hebrew_num.replace("תר", "ת" + "ר") # Simplistic high value handling
-
-    gematria_map = {
-        'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
-        'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
-        'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400
+def analyzer_config(input_mode: str = "lines") -> Dict[str, Any]:
+    """
+    Returns every setting that influences TextAnalyzer results (used as part of the cache key).
+    The input mode is one of them: mmap finds several headings on one line and book
+    names that do not fill their line.
+    """
+    return {
+        "analyzer_version": ANALYZER_VERSION,
+        "input_mode": input_mode,
+        "division_keywords": DIVISION_KEYWORDS,
+        "potential_part_levels": POTENTIAL_PART_LEVELS,
+        "potential_subpart_level": POTENTIAL_SUBPART_LEVEL,
+        "division_heading_levels": DIVISION_HEADING_LEVELS,
+        "min_occurrences": MIN_OCCURRENCES,
+        "default_part_name": DEFAULT_PART_NAME,
+        "default_subpart_name": DEFAULT_SUBPART_NAME,
+        "level3_default_key": LEVEL3_DEFAULT_KEY,
+        "book_name_search_lines": BOOK_NAME_SEARCH_LINES,
     }
 
-    value, base = 0, hebrew_num
-    # Check suffixes first
-    if hebrew_num.endswith('טז'): base, value = hebrew_num[:-2], 16
-    elif hebrew_num.endswith('טו'): base, value = hebrew_num[:-2], 15
-
-    try:
-        current_val = 0
-        for char in base:
-            digit_val = gematria_map.get(char)
-            if digit_val is None:
-                # Common non-numeric words
-                if any(word in hebrew_num for word in ["הקדמה", "פתיחה", "מבוא", "סוף", "תוכן"]):
-                    return 0
-                logging.debug(f"Gematria: Invalid char '{char}' in '{hebrew_num}'. Non-numeric.")
-                return 0 # Treat as non-numeric identifier
-            current_val += digit_val
-
-        total_value = current_val + value
-        # Heuristic check for long strings with low value (likely not gematria)
-        if len(base) > 3 and total_value < 10 and value == 0:
-             logging.debug(f"Gematria: Input '{hebrew_num}' heuristic suggests not numeral. Treating as non-numeric.")
-             return 0
-
-        return total_value if total_value > 0 else 0
-    except Exception as e:
-        logging.error(f"Gematria conversion error for '{hebrew_num}': {e}")
-        return 0
-
 def clean_html_content(raw_content: str) -> str:
     """Removes inner HTML tags and excessive whitespace."""
     if not raw_content:
@@ -94,51 +126,266 @@ def clean_html_content(raw_content: str) -> str:
     cleaned = re.sub(r'\s+', ' ', cleaned)     # Normalize whitespace
     return cleaned.strip()
 
+# --- Line Classification ---
+# All patterns are compiled once per process. Every pattern of interest is a heading
+# element, so lines without '<' are rejected by a plain substring test, and lines
+# without a match of the fused HEADING_REGEX cannot match any other pattern either.
+
+_DIVISION_KEYWORDS_PATTERN = "|".join(re.escape(k) for k in DIVISION_KEYWORDS)
+_ALL_HEADING_LEVELS = sorted(set(POTENTIAL_PART_LEVELS) | {POTENTIAL_SUBPART_LEVEL} | set(DIVISION_HEADING_LEVELS))
+
+# H1 book name extraction
+H1_REGEX = re.compile(r'^<h1>(.*?)</h1>$', re.IGNORECASE)
+# Potential dominant divisions (captures level, keyword, content)
+OVERALL_DIV_REGEX = re.compile(
+    rf'<h([{"".join(map(str, DIVISION_HEADING_LEVELS))}])(?: [^>]*)?>\s*?(?:כותרת\s+)?'
+    rf'(?:({_DIVISION_KEYWORDS_PATTERN})\s+(.*?))?\s*</h\1>',
+    re.IGNORECASE
+)
+# Potential part dividers (H1/H2)
+PART_HEADING_REGEX = re.compile(
+    rf'<h([{"".join(map(str, POTENTIAL_PART_LEVELS))}])(?: [^>]*)?>\s*(.*?)\s*</h\1>', re.IGNORECASE
+)
+# Potential sub-part dividers (H3)
+SUBPART_HEADING_REGEX = re.compile(
+    rf'<h{POTENTIAL_SUBPART_LEVEL}(?: [^>]*)?>\s*(.*?)\s*</h{POTENTIAL_SUBPART_LEVEL}>', re.IGNORECASE
+)
+# Fused pattern: a heading of any level with named groups for its level and content.
+# Only used on lines holding a single opening heading tag, where every pattern above
+# can only match at that one tag, so one match is enough to decide the line.
+HEADING_REGEX = re.compile(
+    rf'<h(?P<level>[{"".join(map(str, _ALL_HEADING_LEVELS))}])(?: [^>]*)?>\s*(?P<content>.*?)(?P<trail>\s*)</h(?P=level)>',
+    re.IGNORECASE
+)
+# Byte-level heading element for mmap mode. '.' and the attribute class exclude '\n',
+# so a heading never spans lines, just like in the line-based modes.
+HEADING_BYTES_REGEX = re.compile(
+    rb'<h([%s])(?: [^>\n]*)?>.{0,%d}?</h\1>' % ("".join(map(str, _ALL_HEADING_LEVELS)).encode(), MAX_HEADING_BYTES),
+    re.IGNORECASE
+)
+# Any opening heading tag, used to detect lines holding more than one heading
+OPENING_TAG_REGEX = re.compile(r'<h', re.IGNORECASE)
+# Division keyword at the start of a heading's content
+DIVISION_KEYWORD_REGEX = re.compile(rf'(?:כותרת\s+)?({_DIVISION_KEYWORDS_PATTERN})\s+', re.IGNORECASE)
+
+# Line classes returned by classify_line
+LINE_BODY = 0
+LINE_PART = 1
+LINE_SUBPART = 2
+LINE_DIVISION = 3
+
+_BODY_LINE = (LINE_BODY, 0, "")
+
+
+@lru_cache(maxsize=None)
+def _division_regex(level: int, keyword: str) -> "re.Pattern":
+    """Returns the full-line regex for one (level, keyword) division pattern."""
+    return re.compile(
+        rf'<h{level}(?: [^>]*)?>\s*?(?:כותרת\s+)?{re.escape(keyword)}\s+(.*?)\s*</h{level}>',
+        re.IGNORECASE
+    )
+
+
+@lru_cache(maxsize=None)
+def _division_content_regex(keyword: str) -> "re.Pattern":
+    """Returns the regex matching a division keyword and identifier within heading content."""
+    return re.compile(rf'(?:כותרת\s+)?{re.escape(keyword)}\s+(.*)', re.IGNORECASE)
+
+
+def _single_heading_match(line_content: str) -> Tuple[Optional["re.Match"], bool]:
+    """
+    Returns (first fused heading match, is_single) for a line containing '<'.
+    is_single is False when the line holds other opening heading tags as well.
+    """
+    match = HEADING_REGEX.search(line_content)
+    if match is None:
+        return None, True
+    start = match.start()
+    is_single = not (OPENING_TAG_REGEX.search(line_content, 0, start)
+                     or OPENING_TAG_REGEX.search(line_content, start + 1))
+    return match, is_single
+
+
+def _classify_line_sequential(line_content: str, dominant_level: int, dominant_keyword: str) -> Tuple[int, int, str]:
+    """
+    Reference classifier: the part, sub-part and division patterns are searched
+    one after the other. Used for lines holding several heading tags.
+    """
+    part_match = PART_HEADING_REGEX.search(line_content)
+    if part_match:
+        part_level = int(part_match.group(1))
+        if part_level != dominant_level: # Must be different level
+            return LINE_PART, part_level, part_match.group(2).strip()
+    if dominant_level == 4 and POTENTIAL_SUBPART_LEVEL != dominant_level:
+        subpart_match = SUBPART_HEADING_REGEX.search(line_content)
+        if subpart_match:
+            return LINE_SUBPART, POTENTIAL_SUBPART_LEVEL, subpart_match.group(1).strip()
+    division_match = _division_regex(dominant_level, dominant_keyword).search(line_content)
+    if division_match:
+        return LINE_DIVISION, dominant_level, division_match.group(1).strip()
+    return _BODY_LINE
+
+
+def classify_line(line_content: str, dominant_level: int, dominant_keyword: str) -> Tuple[int, int, str]:
+    """
+    Decides what a (stripped) line is for the hierarchy pass, given the dominant
+    division. Returns (line_class, heading_level, raw_text), where raw_text is the
+    part / sub-part name or the division identifier, before HTML cleaning.
+    """
+    if '<' not in line_content: # Most lines are plain body text
+        return _BODY_LINE
+    match, is_single = _single_heading_match(line_content)
+    if match is None:
+        return _BODY_LINE
+    if not is_single:
+        return _classify_line_sequential(line_content, dominant_level, dominant_keyword)
+
+    level = int(match.group('level'))
+    if level in POTENTIAL_PART_LEVELS and level != dominant_level:
+        return LINE_PART, level, match.group('content').strip()
+    if dominant_level == 4 and level == POTENTIAL_SUBPART_LEVEL:
+        return LINE_SUBPART, level, match.group('content').strip()
+    if level == dominant_level:
+        division_match = _division_content_regex(dominant_keyword).match(match.group('content') + match.group('trail'))
+        if division_match:
+            return LINE_DIVISION, level, division_match.group(1).strip()
+    return _BODY_LINE
+
+
+def match_division_candidate(line_content: str) -> Optional[Tuple[int, str]]:
+    """Pass 1: returns (heading_level, keyword) if the line is a keyword division heading."""
+    if '<' not in line_content:
+        return None
+    match, is_single = _single_heading_match(line_content)
+    if match is None:
+        return None
+    if not is_single:
+        match = OVERALL_DIV_REGEX.search(line_content)
+        if match and match.group(2): # Only count if a DIVISION_KEYWORD was matched
+            return int(match.group(1)), match.group(2)
+        return None
+
+    level = int(match.group('level'))
+    if level not in DIVISION_HEADING_LEVELS:
+        return None
+    keyword_match = DIVISION_KEYWORD_REGEX.match(match.group('content') + match.group('trail'))
+    if keyword_match:
+        return level, keyword_match.group(1)
+    return None
+
+def dominant_is_certain(pattern_counts: Dict[Tuple[int, str], int]) -> bool:
+    """
+    Adaptive detection: True when the counts so far already decide pass 1, i.e. the
+    lowest frequent heading level cannot change and its leading keyword is ahead of
+    the runner-up by ADAPTIVE_CONFIDENCE_Z standard deviations (sign test on the two
+    counts). A lower-level pattern seen but not yet frequent keeps the decision open.
+    The decision is still a prediction: a lower-level pattern that only appears later
+    in the book can overturn it, which the hierarchy pass detects (see
+    TextAnalyzer._adaptive_decision_overturned).
+    """
+    frequent_levels = [level for (level, _), count in pattern_counts.items() if count >= MIN_OCCURRENCES]
+    if not frequent_levels:
+        return False
+    min_level = min(frequent_levels)
+    if any(level < min_level and count > 0 for (level, _), count in pattern_counts.items()):
+        return False
+    counts = sorted((count for (level, _), count in pattern_counts.items() if level == min_level), reverse=True)
+    leader, runner_up = counts[0], counts[1] if len(counts) > 1 else 0
+    return leader - runner_up > ADAPTIVE_CONFIDENCE_Z * (leader + runner_up) ** 0.5
+
+def select_dominant_pattern(pattern_counts: Dict[Tuple[int, str], int]) -> Optional[Tuple[int, str]]:
+    """
+    Pass 1 decision: the most frequent (heading_level, keyword) pattern of the lowest
+    heading level among those with at least MIN_OCCURRENCES, or None.
+    """
+    frequent_patterns = {
+        pat: count for pat, count in pattern_counts.items()
+        if count >= MIN_OCCURRENCES
+    }
+    if not frequent_patterns:
+        return None
+
+    # Prefer lower heading level, then higher frequency
+    min_level = min(level for level, keyword in frequent_patterns.keys())
+    candidates = {
+        pat: count for pat, count in frequent_patterns.items()
+        if pat[0] == min_level
+    }
+    return max(candidates.keys(), key=lambda pat: candidates[pat])
+
+class DivisionStats:
+    """
+    The divisions found in one (part, sub-part) of a book. Identifiers are converted
+    once, as they are parsed: their Gematria values (0 = non-numeric) are kept as an
+    array('H'), and so are the amud codes of daf divisions headed by single amudim
+    (amud_codes is None once a plain daf heading shows the node is not counted by amud).
+    Only the last identifier is kept as text.
+    """
+    __slots__ = ("count", "last_identifier", "numbers", "amud_codes")
+
+    def __init__(self, track_amudim: bool = False):
+        self.count = 0
+        self.last_identifier: Optional[str] = None
+        self.numbers = array('H')
+        self.amud_codes: Optional[array] = array('H') if track_amudim else None
+
+    def add(self, identifier: str):
+        self.count += 1
+        self.last_identifier = identifier
+        number = hebrew_numeral_to_int(identifier)
+        self.numbers.append(number if 0 < number <= MAX_IDENTIFIER_NUMBER else 0)
+        if self.amud_codes is not None:
+            code = parse_amud(identifier)
+            if code is not None and code <= MAX_IDENTIFIER_NUMBER:
+                self.amud_codes.append(code)
+            elif number > 0:
+                self.amud_codes = None
+
 # --- Core Analysis Class ---
 
 class TextAnalyzer:
     """Analyzes a single text file for its hierarchical structure."""
 
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, input_mode: str = "lines", collect_metrics: bool = False,
+                 detection: str = "full"):
+        if input_mode not in INPUT_MODES:
+            raise ValueError(f"Unknown input mode '{input_mode}' (expected one of {INPUT_MODES}).")
+        if detection not in DETECTION_MODES:
+            raise ValueError(f"Unknown detection mode '{detection}' (expected one of {DETECTION_MODES}).")
         self.filepath = filepath
         self.filename = os.path.basename(filepath)
+        self.input_mode = input_mode
+        self.detection = detection
+        self.collect_metrics = collect_metrics # Also count lines and trace peak memory (see metrics)
         self.lines: List[str] = []
+        self.line_count = 0
+        # Stream/mmap modes only: (position, stripped heading text) for every heading, and
+        # the pass-1 pattern counts gathered while reading. The position is a line index
+        # in stream mode and a byte offset in mmap mode.
+        self.heading_lines: List[Tuple[int, str]] = []
+        self._book_name_limit = BOOK_NAME_SEARCH_LINES # Positions below this may hold the book name
+        self.pattern_counts: Dict[Tuple[int, str], int] = defaultdict(int)
+        # Lines mode, adaptive detection: lines[:classified_lines] were read by pass 1, and
+        # their headings are in heading_lines, so the hierarchy pass skips their body lines
+        self.classified_lines: Optional[int] = None
         self.book_name: str = os.path.splitext(self.filename)[0] # Default
         self.dominant_div_level: Optional[int] = None
         self.dominant_div_keyword: Optional[str] = None
-        # Raw hierarchical data: {part: {subpart: {count, last_id, all_ids}}}
-        self.hierarchy_data: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(
-            lambda: defaultdict(lambda: {"count": 0, "last_identifier": None, "all_identifiers": []})
-        )
-        self._compile_regexes()
-
-    def _compile_regexes(self):
-        """Pre-compiles regular expressions used in analysis."""
-        # Regex for H1 book name extraction
-        self.h1_regex = re.compile(r'^<h1>(.*?)</h1>$', re.IGNORECASE)
-
-        # Regex for finding potential dominant divisions (captures level, keyword, content)
-        div_levels_str = "".join(map(str, DIVISION_HEADING_LEVELS))
-        div_keywords_pattern = "|".join(re.escape(k) for k in DIVISION_KEYWORDS)
-        overall_div_pattern_str = rf'<h([{div_levels_str}])(?: [^>]*)?>\s*?(?:כותרת\s+)?(?:({div_keywords_pattern})\s+(.*?))?\s*</h\1>'
-        self.overall_div_regex = re.compile(overall_div_pattern_str, re.IGNORECASE)
-
-        # Regex for finding potential part dividers (H1/H2)
-        part_levels_str = "".join(map(str, POTENTIAL_PART_LEVELS))
-        any_potential_part_heading_str = rf'<h([{part_levels_str}])(?: [^>]*)?>\s*(.*?)\s*</h\1>'
-        self.part_heading_regex = re.compile(any_potential_part_heading_str, re.IGNORECASE)
-
-        # Regex for finding potential sub-part dividers (H3)
-        h3_subpart_str = rf'<h{POTENTIAL_SUBPART_LEVEL}(?: [^>]*)?>\s*(.*?)\s*</h{POTENTIAL_SUBPART_LEVEL}>'
-        self.subpart_heading_regex = re.compile(h3_subpart_str, re.IGNORECASE)
+        # Raw hierarchical data: {part: {subpart: DivisionStats}}, part and sub-part names interned
+        self.hierarchy_data: Dict[str, Dict[str, DivisionStats]] = {}
+        # Lines of each class found by the hierarchy pass
+        self.match_counts: Dict[str, int] = {"parts": 0, "subparts": 0, "divisions": 0}
+        # Per-step timings, filled by analyze(); see _build_metrics for the full record
+        self.metrics: Dict[str, Any] = {"seconds": {}}
 
     def _read_file(self) -> bool:
         """Reads file content into self.lines."""
         try:
             with open(self.filepath, 'r', encoding='utf-8') as f:
                 self.lines = f.readlines()
+            self.line_count = len(self.lines)
             if not self.lines:
-                logging.warning(f"'{self.filename}': File is empty.")
+                diagnostics.report("empty_file", self.filename, "'%s': File is empty.", self.filename)
                 return False
             return True
         except FileNotFoundError:
@@ -148,144 +395,274 @@ class TextAnalyzer:
             logging.error(f"Error reading file {self.filepath}: {e}")
             return False
 
+    def _stream_file(self) -> bool:
+        """
+        Stream mode: reads the file lazily in a single pass. Only heading lines are
+        kept (every pattern of interest is a HEADING_REGEX match), and the division
+        candidates of pass 1 are counted on the fly, so memory grows with the
+        number of headings rather than with the file size.
+        """
+        line_count = 0
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                for line_num, line in enumerate(f):
+                    line_count += 1
+                    if '<' not in line or not HEADING_REGEX.search(line):
+                        continue
+                    self._buffer_heading(line_num, line.strip())
+        except FileNotFoundError:
+            logging.error(f"File not found: {self.filepath}")
+            return False
+        except Exception as e:
+            logging.error(f"Error reading file {self.filepath}: {e}")
+            return False
+        self.line_count = line_count
+        if not line_count:
+            diagnostics.report("empty_file", self.filename, "'%s': File is empty.", self.filename)
+            return False
+        return True
+
+    def _map_file(self) -> bool:
+        """
+        Mmap mode: maps the file and runs a byte-level heading pattern over the whole
+        buffer, decoding only the matched heading elements. Body text is never copied
+        or decoded, and headings are found even when a minified book puts many of
+        them on one enormous line. The book name must start within the first
+        BOOK_NAME_SEARCH_LINES lines, but need not fill its line.
+        """
+        try:
+            if os.path.getsize(self.filepath) == 0:
+                diagnostics.report("empty_file", self.filename, "'%s': File is empty.", self.filename)
+                return False
+            with open(self.filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                limit = 0
+                for _ in range(BOOK_NAME_SEARCH_LINES):
+                    newline = mapped.find(b'\n', limit)
+                    if newline == -1:
+                        limit = len(mapped)
+                        break
+                    limit = newline + 1
+                self._book_name_limit = limit
+                if self.collect_metrics: # mmap has no count(); count newlines in slices at C speed
+                    chunk = 1 << 20
+                    newlines = sum(mapped[i:i + chunk].count(b'\n') for i in range(0, len(mapped), chunk))
+                    self.line_count = newlines + (0 if mapped[-1:] == b'\n' else 1)
+                for match in HEADING_BYTES_REGEX.finditer(mapped):
+                    self._buffer_heading(match.start(), match.group(0).decode('utf-8', errors='replace').strip())
+        except FileNotFoundError:
+            logging.error(f"File not found: {self.filepath}")
+            return False
+        except Exception as e:
+            logging.error(f"Error reading file {self.filepath}: {e}")
+            return False
+        return True
+
+    def _buffer_heading(self, position: int, heading_text: str) -> Optional[Tuple[int, str]]:
+        """Keeps a heading for the hierarchy pass and counts it for pass 1. Returns its division candidate."""
+        self.heading_lines.append((position, heading_text))
+        candidate = match_division_candidate(heading_text)
+        if candidate:
+            self.pattern_counts[candidate] += 1
+        return candidate
+
+    def _indexed_lines(self):
+        """Yields (position, line) for the lines relevant to the current input mode."""
+        if self.input_mode != "lines":
+            return iter(self.heading_lines)
+        if self.classified_lines is not None: # Headings of the sampled lines, then the rest of the book
+            return itertools.chain(self.heading_lines, itertools.islice(enumerate(self.lines), self.classified_lines, None))
+        return enumerate(self.lines)
+
+    def _position_label(self, position: int) -> str:
+        """Formats a position from _indexed_lines for log messages."""
+        return f"byte {position}" if self.input_mode == "mmap" else f"L{position + 1}"
+
     def _extract_book_name(self):
         """Extracts book name from H1 tag if present."""
-        for line in self.lines[:20]: # Check first few lines
-            match = self.h1_regex.match(line.strip())
+        for line_num, line in self._indexed_lines():
+            if line_num >= self._book_name_limit: # Check first few lines
+                break
+            match = H1_REGEX.match(line.strip())
             if match:
                 name_raw = match.group(1).strip()
                 name_clean = clean_html_content(name_raw)
                 if name_clean:
                     self.book_name = name_clean
-                    logging.info(f"'{self.filename}': Extracted book name '{self.book_name}' from H1.")
+                    logging.debug("'%s': Extracted book name '%s' from H1.", self.filename, self.book_name)
                     return # Found it
-        logging.info(f"'{self.filename}': No H1 book name found, using filename '{self.book_name}'.")
+        logging.debug("'%s': No H1 book name found, using filename '%s'.", self.filename, self.book_name)
 
 
     def _find_dominant_division(self) -> bool:
         """Pass 1: Finds the most frequent division pattern (keyword and level)."""
-        potential_patterns = defaultdict(int)
-        for line in self.lines:
-            match = self.overall_div_regex.search(line.strip())
-            if match:
-                level = int(match.group(1))
-                keyword = match.group(2) # Keyword is in group 2
-                if keyword: # Only count if a DIVISION_KEYWORD was matched
-                    potential_patterns[(level, keyword)] += 1
-
-        frequent_patterns = {
-            pat: count for pat, count in potential_patterns.items()
-            if count >= MIN_OCCURRENCES
-        }
-
-        if not frequent_patterns:
-            logging.warning(f"'{self.book_name}': No frequent division pattern (min {MIN_OCCURRENCES}) found.")
+        potential_patterns = self.pattern_counts # Already filled while streaming/mapping
+        if self.input_mode == "lines" and self.detection == "adaptive":
+            self._sample_candidates()
+        elif self.input_mode == "lines":
+            for line in self.lines:
+                candidate = match_division_candidate(line.strip())
+                if candidate:
+                    potential_patterns[candidate] += 1
+
+        dominant_pattern = select_dominant_pattern(potential_patterns)
+        if dominant_pattern is None:
+            diagnostics.report("no_dominant_division", self.book_name,
+                               "'%s': No frequent division pattern (min %d) found.", self.book_name, MIN_OCCURRENCES,
+                               file=self.filename)
             return False
 
-        # Prefer lower heading level, then higher frequency
-        min_level = min(level for level, keyword in frequent_patterns.keys())
-        candidates = {
-            pat: count for pat, count in frequent_patterns.items()
-            if pat[0] == min_level
-        }
-        dominant_pattern = max(candidates.keys(), key=lambda pat: candidates[pat])
+        self.dominant_div_level, self.dominant_div_keyword = dominant_pattern
+        logging.debug("'%s': Dominant division: H%d '%s' (%d occurrences >= %d).", self.book_name,
+                      self.dominant_div_level, self.dominant_div_keyword, potential_patterns[dominant_pattern],
+                      MIN_OCCURRENCES)
+        return True
 
+    def _adaptive_decision_overturned(self) -> bool:
+        """
+        Adaptive detection fallback, after the hierarchy pass: that pass also counted the
+        candidates of the lines pass 1 skipped, so the whole book's decision is known. If
+        it differs from the sampled one (e.g. a lower-level pattern that only becomes
+        frequent late in the book), switches to it, resets the hierarchy for a full
+        rescan and returns True.
+        """
+        if self.classified_lines is None or self.classified_lines >= len(self.lines):
+            return False
+        dominant_pattern = select_dominant_pattern(self.pattern_counts)
+        if dominant_pattern == (self.dominant_div_level, self.dominant_div_keyword):
+            return False
+        logging.debug("'%s': Adaptive decision H%d '%s' overturned by the whole book: H%d '%s'.", self.book_name,
+                      self.dominant_div_level, self.dominant_div_keyword, *dominant_pattern)
         self.dominant_div_level, self.dominant_div_keyword = dominant_pattern
-        logging.info(f"'{self.book_name}': Dominant division: H{self.dominant_div_level} '{self.dominant_div_keyword}' "
-                     f"({candidates[dominant_pattern]} occurrences >= {MIN_OCCURRENCES}).")
+        self.classified_lines = None
+        self.heading_lines = []
+        self.hierarchy_data = {}
+        self.match_counts = {"parts": 0, "subparts": 0, "divisions": 0}
         return True
 
+    def _sample_candidates(self):
+        """
+        Adaptive pass 1 (lines mode): counts candidates from the top of the book and
+        stops once dominant_is_certain, or at the end of the book. The headings read
+        are buffered like in stream mode, for the hierarchy pass.
+        """
+        self.classified_lines = len(self.lines)
+        candidates = 0
+        next_check = ADAPTIVE_MIN_CANDIDATES
+        for line_num, line in enumerate(self.lines):
+            if '<' not in line or not HEADING_REGEX.search(line):
+                continue
+            if self._buffer_heading(line_num, line.strip()):
+                candidates += 1
+                if candidates >= next_check:
+                    if dominant_is_certain(self.pattern_counts):
+                        self.classified_lines = line_num + 1
+                        logging.debug("'%s': Dominant division certain after %d of %d lines (%d candidates).",
+                                      self.book_name, self.classified_lines, len(self.lines), candidates)
+                        return
+                    next_check += ADAPTIVE_CHECK_INTERVAL
+
+    def _division_stats(self, part_name: str, subpart_name: str) -> DivisionStats:
+        """Returns the stats of a part / sub-part, creating them (in order of appearance) if needed."""
+        part = self.hierarchy_data.get(part_name)
+        if part is None:
+            part = self.hierarchy_data[part_name] = {}
+        stats = part.get(subpart_name)
+        if stats is None:
+            stats = part[subpart_name] = DivisionStats(self.dominant_div_keyword == DAF_KEYWORD)
+        return stats
+
     def _scan_and_build_hierarchy(self):
         """Pass 2: Scans lines, tracks hierarchy, and counts divisions."""
         if self.dominant_div_level is None or self.dominant_div_keyword is None:
             logging.error(f"'{self.book_name}': Cannot scan hierarchy without dominant division info.")
             return
 
-        # Compile regex for the specific dominant division only once
-        specific_div_pattern_str = (
-            rf'<h{self.dominant_div_level}(?: [^>]*)?>\s*?'
-            rf'(?:כותרת\s+)?{re.escape(self.dominant_div_keyword)}\s+(.*?)\s*'
-            rf'</h{self.dominant_div_level}>'
-        )
-        specific_div_regex = re.compile(specific_div_pattern_str, re.IGNORECASE)
-
         current_part_name = DEFAULT_PART_NAME
         current_subpart_name = DEFAULT_SUBPART_NAME
-        # Initialize default structure to ensure it exists, now with all_identifiers list
-        self.hierarchy_data[current_part_name][current_subpart_name] = {"count": 0, "last_identifier": None, "all_identifiers": []}
+        # Initialize default structure to ensure it exists
+        self._division_stats(current_part_name, current_subpart_name)
 
         unnamed_part_counter = 1
         unnamed_subpart_counter = 1
         found_explicit_part = False
+        debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG) # Checked once, not per heading
 
-        for line_num, line in enumerate(self.lines):
+        # Adaptive detection: also count the candidates of the lines pass 1 did not read
+        unread_from = self.classified_lines
+
+        for line_num, line in self._indexed_lines():
             line_content = line.strip()
-            processed_level = 0
-
-            # 1. Check for Part Divider (H1/H2)
-            part_match = self.part_heading_regex.search(line_content)
-            if part_match:
-                part_level_matched = int(part_match.group(1))
-                if part_level_matched != self.dominant_div_level: # Must be different level
-                    processed_level = part_level_matched
-                    found_explicit_part = True
-                    part_name_raw = part_match.group(2).strip()
-                    part_name_clean = clean_html_content(part_name_raw)
-
-                    if part_name_clean:
-                        current_part_name = part_name_clean
-                    else:
-                        current_part_name = f"חלק לא מוגדר {unnamed_part_counter}"
-                        unnamed_part_counter += 1
-                    logging.debug(f"'{self.book_name}': Part Divider (H{part_level_matched}): '{current_part_name}' @ L{line_num+1}")
-
-                    # Reset sub-part context
-                    current_subpart_name = DEFAULT_SUBPART_NAME
-                    unnamed_subpart_counter = 1
-                    # Ensure part/subpart exist in hierarchy data with the new structure
-                    self.hierarchy_data.setdefault(current_part_name, defaultdict(lambda: {"count": 0, "last_identifier": None, "all_identifiers": []}))
-                    self.hierarchy_data[current_part_name].setdefault(current_subpart_name, {"count": 0, "last_identifier": None, "all_identifiers": []})
-
-
-            # 2. Check for Sub-Part Divider (H3) - only if H4 is dominant division
-            if self.dominant_div_level == 4 and processed_level == 0:
-                subpart_match = self.subpart_heading_regex.search(line_content)
-                if subpart_match:
-                    # Ensure H3 isn't actually the dominant division itself
-                    if POTENTIAL_SUBPART_LEVEL != self.dominant_div_level:
-                        processed_level = POTENTIAL_SUBPART_LEVEL
-                        subpart_name_raw = subpart_match.group(1).strip()
-                        subpart_name_clean = clean_html_content(subpart_name_raw)
-
-                        if subpart_name_clean:
-                            current_subpart_name = subpart_name_clean
-                        else:
-                            current_subpart_name = f"תת-חלק לא מוגדר {unnamed_subpart_counter}"
-                            unnamed_subpart_counter += 1
-                        logging.debug(f"'{self.book_name}': Sub-Part Divider (H3): '{current_subpart_name}' in Part '{current_part_name}' @ L{line_num+1}")
-                        # Ensure subpart exists in hierarchy data for the current part with the new structure
-                        self.hierarchy_data[current_part_name].setdefault(current_subpart_name, {"count": 0, "last_identifier": None, "all_identifiers": []})
-
-
-            # 3. Check for Dominant Division
-            if processed_level == 0:
-                division_match = specific_div_regex.search(line_content)
-                if division_match:
-                    identifier_raw = division_match.group(1).strip()
-                    identifier_clean = clean_html_content(identifier_raw)
-
-                    # Determine target subpart key
-                    target_subpart_key = current_subpart_name if self.dominant_div_level == 4 else LEVEL3_DEFAULT_KEY
-
-                    # Get the data dict for the target part/subpart, ensuring defaults exist
-                    part_dict = self.hierarchy_data.setdefault(current_part_name, defaultdict(lambda: {"count": 0, "last_identifier": None, "all_identifiers": []}))
-                    division_data = part_dict.setdefault(target_subpart_key, {"count": 0, "last_identifier": None, "all_identifiers": []})
-
-                    # Update count, last identifier, and the list of all identifiers
-                    division_data["count"] += 1
-                    division_data["last_identifier"] = identifier_clean
-                    division_data["all_identifiers"].append(identifier_clean)
+            if unread_from is not None and line_num >= unread_from:
+                candidate = match_division_candidate(line_content)
+                if candidate:
+                    self.pattern_counts[candidate] += 1
+            line_class, heading_level, raw_text = classify_line(
+                line_content, self.dominant_div_level, self.dominant_div_keyword
+            )
+            if line_class == LINE_BODY:
+                continue
+
+            # 1. Part Divider (H1/H2)
+            if line_class == LINE_PART:
+                self.match_counts["parts"] += 1
+                found_explicit_part = True
+                part_name_clean = clean_html_content(raw_text)
+
+                if part_name_clean:
+                    current_part_name = sys.intern(part_name_clean)
+                else:
+                    current_part_name = f"חלק לא מוגדר {unnamed_part_counter}"
+                    unnamed_part_counter += 1
+                if debug_enabled:
+                    logging.debug("'%s': Part Divider (H%d): '%s' @ %s", self.book_name, heading_level,
+                                  current_part_name, self._position_label(line_num))
+
+                # Reset sub-part context
+                current_subpart_name = DEFAULT_SUBPART_NAME
+                unnamed_subpart_counter = 1
+                # Ensure part/subpart exist in hierarchy data
+                self._division_stats(current_part_name, current_subpart_name)
+
+            # 2. Sub-Part Divider (H3) - only produced when H4 is the dominant division
+            elif line_class == LINE_SUBPART:
+                self.match_counts["subparts"] += 1
+                subpart_name_clean = clean_html_content(raw_text)
+
+                if subpart_name_clean:
+                    current_subpart_name = sys.intern(subpart_name_clean)
+                else:
+                    current_subpart_name = f"תת-חלק לא מוגדר {unnamed_subpart_counter}"
+                    unnamed_subpart_counter += 1
+                if debug_enabled:
+                    logging.debug("'%s': Sub-Part Divider (H3): '%s' in Part '%s' @ %s", self.book_name,
+                                  current_subpart_name, current_part_name, self._position_label(line_num))
+                # Ensure subpart exists in hierarchy data for the current part
+                self._division_stats(current_part_name, current_subpart_name)
+
+            # 3. Dominant Division
+            else:
+                self.match_counts["divisions"] += 1
+                identifier_clean = clean_html_content(raw_text)
+
+                # Determine target subpart key
+                target_subpart_key = current_subpart_name if self.dominant_div_level == 4 else LEVEL3_DEFAULT_KEY
 
+                # Update count, last identifier and the identifier values of the target part/subpart
+                self._division_stats(current_part_name, target_subpart_key).add(identifier_clean)
+
+
+    def _division_node(self, stats: DivisionStats) -> Dict[str, Any]:
+        """The output node of a part / sub-part, with the identifier arrays as intermediate fields."""
+        node = {
+            "division_type": self.dominant_div_keyword,
+            "count": stats.count,
+            "heading_level": f"h{self.dominant_div_level}",
+            "last_identifier_found": stats.last_identifier,
+            "identifier_numbers": stats.numbers, # Intermediate field
+        }
+        if stats.amud_codes:
+            node["amud_codes"] = stats.amud_codes # Intermediate field
+        return node
 
     def _assemble_and_simplify_result(self) -> Dict[str, Any]:
         """Assembles the final structure and applies simplification rules."""
@@ -303,7 +680,7 @@ class TextAnalyzer:
             current_default_key = default_subpart_key_for_h4 if self.dominant_div_level == 4 else default_subpart_key_for_non_h4
 
             # Check the default/implicit subpart first
-            if current_default_key in subparts and subparts[current_default_key]["count"] > 0:
+            if current_default_key in subparts and subparts[current_default_key].count > 0:
                  # Determine appropriate label for this default content
                  if part_name == DEFAULT_PART_NAME and len(self.hierarchy_data) == 1: # Only default part exists
                      label = self.book_name # Use book name directly
@@ -317,10 +694,12 @@ class TextAnalyzer:
             if self.dominant_div_level == 4:
                 for subpart_name, subpart_data in subparts.items():
                     if subpart_name == current_default_key: continue # Already handled
-                    if subpart_data["count"] > 0:
+                    if subpart_data.count > 0:
                         valid_subparts_for_this_part[subpart_name] = subpart_data
                     else:
-                        logging.warning(f"'{self.book_name}': Sub-Part '{subpart_name}' in Part '{part_name}' identified but empty.")
+                        diagnostics.report("empty_subpart", f"{self.book_name} / {part_name} / {subpart_name}",
+                                           "'%s': Sub-Part '%s' in Part '%s' identified but empty.",
+                                           self.book_name, subpart_name, part_name)
 
 
             # --- Decide Structure for this Part ---
@@ -330,32 +709,23 @@ class TextAnalyzer:
             if num_valid_subparts == 1:
                 # Simplify: Use the details from the single valid subpart directly under the part label
                 single_subpart_details = list(valid_subparts_for_this_part.values())[0]
-                final_result_assembly[part_label_final] = {
-                    "division_type": self.dominant_div_keyword,
-                    "count": single_subpart_details["count"],
-                    "heading_level": f"h{self.dominant_div_level}",
-                    "last_identifier_found": single_subpart_details["last_identifier"],
-                    "all_identifiers_found": single_subpart_details["all_identifiers"] # Intermediate field
-                }
-                logging.debug(f"'{self.book_name}': Simplified Part '{part_label_final}' (1 sub-part).")
+                final_result_assembly[part_label_final] = self._division_node(single_subpart_details)
+                logging.debug("'%s': Simplified Part '%s' (1 sub-part).", self.book_name, part_label_final)
 
             elif num_valid_subparts > 1:
                 # Keep subpart structure: Part -> SubPart -> Details
                 part_data_nested = {}
                 for subpart_label, subpart_details in valid_subparts_for_this_part.items():
-                    part_data_nested[subpart_label] = {
-                        "division_type": self.dominant_div_keyword,
-                        "count": subpart_details["count"],
-                        "heading_level": f"h{self.dominant_div_level}",
-                        "last_identifier_found": subpart_details["last_identifier"],
-                        "all_identifiers_found": subpart_details["all_identifiers"] # Intermediate field
-                    }
+                    part_data_nested[subpart_label] = self._division_node(subpart_details)
                 final_result_assembly[part_label_final] = part_data_nested
-                logging.debug(f"'{self.book_name}': Kept Sub-Part structure for Part '{part_label_final}' ({num_valid_subparts} sub-parts).")
+                logging.debug("'%s': Kept Sub-Part structure for Part '%s' (%d sub-parts).",
+                              self.book_name, part_label_final, num_valid_subparts)
 
             # If num_valid_subparts == 0, log warning if part was explicitly named
             elif part_name != DEFAULT_PART_NAME:
-                 logging.warning(f"'{self.book_name}': Part '{part_name}' identified but contained no countable divisions.")
+                 diagnostics.report("empty_part", f"{self.book_name} / {part_name}",
+                                    "'%s': Part '%s' identified but contained no countable divisions.",
+                                    self.book_name, part_name)
 
 
         # --- Apply Final Overall Simplification ---
@@ -363,45 +733,164 @@ class TextAnalyzer:
              # Only one top-level key remains, flatten completely
              single_toplevel_key = list(final_result_assembly.keys())[0]
              final_output_structure = final_result_assembly[single_toplevel_key]
-             logging.info(f"'{self.book_name}': Simplified structure: Only one effective top-level part found ('{single_toplevel_key}'). Final structure is flat.")
+             logging.debug("'%s': Simplified structure: Only one effective top-level part found ('%s'). Final structure is flat.",
+                           self.book_name, single_toplevel_key)
         elif not final_result_assembly:
-             logging.warning(f"'{self.book_name}': No countable divisions found in any structure.")
+             diagnostics.report("no_divisions", self.book_name,
+                                "'%s': No countable divisions found in any structure.", self.book_name)
              final_output_structure = {}
         else:
              # Multiple top-level parts, keep the structure as assembled
              final_output_structure = final_result_assembly
-             logging.info(f"'{self.book_name}': Multiple effective top-level parts found ({len(final_result_assembly)}). Keeping hierarchical structure.")
+             logging.debug("'%s': Multiple effective top-level parts found (%d). Keeping hierarchical structure.",
+                           self.book_name, len(final_result_assembly))
 
         return final_output_structure
 
 
     def analyze(self) -> Dict[str, Any]:
         """Orchestrates the analysis process for the file."""
-        if not self._read_file():
+        if not self.collect_metrics:
+            return self._run_steps()
+        # Peak memory of this file only: start tracing, or restart the peak if already tracing
+        already_tracing = tracemalloc.is_tracing()
+        if already_tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+        try:
+            return self._run_steps()
+        finally:
+            self._build_metrics(tracemalloc.get_traced_memory()[1])
+            if not already_tracing:
+                tracemalloc.stop()
+
+    def _run_steps(self) -> Dict[str, Any]:
+        """Runs the analysis steps, timing each of them into self.metrics["seconds"]."""
+        timings = self.metrics["seconds"]
+        readers = {"lines": self._read_file, "stream": self._stream_file, "mmap": self._map_file}
+        started = time.perf_counter()
+        read_ok = readers[self.input_mode]()
+        timings["read"] = time.perf_counter() - started
+        if not read_ok:
             return {}
+        started = time.perf_counter()
         self._extract_book_name()
-        if not self._find_dominant_division():
+        found = self._find_dominant_division()
+        timings["dominant"] = time.perf_counter() - started
+        if not found:
             return {} # Cannot proceed without knowing what to count
 
+        started = time.perf_counter()
         self._scan_and_build_hierarchy()
-        return self._assemble_and_simplify_result()
-
-# --- Runner Class ---
+        if self._adaptive_decision_overturned():
+            self._scan_and_build_hierarchy()
+        timings["hierarchy"] = time.perf_counter() - started
+        started = time.perf_counter()
+        result = self._assemble_and_simplify_result()
+        timings["assemble"] = time.perf_counter() - started
+        return result
+
+    def _build_metrics(self, peak_memory_bytes: int):
+        """Completes self.metrics with the file's size, line and match counts and peak memory."""
+        timings = self.metrics["seconds"]
+        for step in ANALYSIS_STEPS:
+            timings.setdefault(step, 0.0) # Steps skipped after an early exit
+        timings["total"] = sum(timings[step] for step in ANALYSIS_STEPS)
+        try:
+            file_bytes = os.path.getsize(self.filepath)
+        except OSError:
+            file_bytes = 0
+        self.metrics.update({
+            "file": self.filename,
+            "book_name": self.book_name,
+            "input_mode": self.input_mode,
+            "detection": self.detection,
+            "bytes": file_bytes,
+            "lines": self.line_count,
+            "pass1_lines": self.line_count if self.classified_lines is None else self.classified_lines,
+            "matches": dict(self.match_counts, division_candidates=sum(self.pattern_counts.values())),
+            "peak_memory_bytes": peak_memory_bytes,
+        })
+
+def _analyze_file_worker(filepath: str, input_mode: str = "lines", collect_metrics: bool = False,
+                         detection: str = "full") -> Tuple:
+    """
+    Process-pool entry point: analyzes one file and returns only the compact
+    (book_name, structured_data) pair, so the raw lines never leave the worker.
+    With collect_metrics, the file's metrics are returned as a third element.
+    """
+    analyzer = TextAnalyzer(filepath, input_mode=input_mode, collect_metrics=collect_metrics, detection=detection)
+    structured_data = analyzer.analyze()
+    if collect_metrics:
+        return analyzer.book_name, structured_data, analyzer.metrics
+    return analyzer.book_name, structured_data
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100)) # ceil
+    return sorted_values[int(rank) - 1]
+
+def _scan_directory(dirpath: str) -> Tuple[List[Tuple[str, int]], List[str]]:
+    """
+    Lists a directory with a single os.scandir pass. Returns the text files as sorted
+    (filepath, size) pairs and the sorted subdirectories (hidden ones are skipped).
+    """
+    files = []
+    subdirs = []
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.name.startswith('.'):
+                        subdirs.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(TEXT_FILE_EXTENSIONS):
+                    files.append((entry.path, entry.stat().st_size))
+            except OSError as e:
+                logging.warning(f"Skipping '{entry.path}': {e}")
+    files.sort()
+    subdirs.sort()
+    return files, subdirs
+
+# --- Runner Classes ---
 
 class AnalysisRunner:
     """Manages the analysis process for a directory of files."""
 
-    def __init__(self, input_dir: str):
+    def __init__(self, input_dir: str, workers: int = 1, input_mode: str = "lines",
+                 cache: Optional[AnalysisCache] = None, output_dir: Optional[str] = None,
+                 executor: Optional[ProcessPoolExecutor] = None, write_output: bool = True,
+                 collect_metrics: bool = False, stream_output: bool = False, finalize_stream: bool = False,
+                 detection: str = "full"):
         self.input_dir = input_dir
+        self.workers = max(1, workers) # 1 = serial, in-process analysis
+        self.input_mode = input_mode
+        self.detection = detection # Pass-1 detection mode (DETECTION_MODES)
+        self.cache = cache # Optional persistent result cache
+        self.output_dir = output_dir # Defaults to the script's directory
+        self.executor = executor # Shared process pool (used instead of `workers` when given)
+        self.write_output = write_output # False keeps the results in memory only (see collection_data)
+        self.collect_metrics = collect_metrics # Record per-file metrics and write a _metrics.json sidecar
+        self.file_metrics: Dict[str, Dict[str, Any]] = {} # {filepath: metrics} of the analyzed (not cached) files
+        self.file_sizes: Dict[str, int] = {} # Sizes seen while listing, used for scheduling
         self.results: Dict[str, Any] = {} # Stores {book_name: structured_data}
+        # Streaming: append each validated book to <collection>_analysis.jsonl instead of keeping it in `results`
+        self.stream_output = stream_output and write_output
+        self.finalize_stream = finalize_stream # Also assemble the _analysis.json document from the stream
+        self.stream: Optional[ResultStreamWriter] = None
+        self.streamed_books = 0
+        self.cache_keys: Dict[str, Optional[str]] = {} # {filepath: cache key} of the files being analyzed
 
     def _get_output_path(self) -> str:
         """Determines the output JSON file path."""
-        script_dir = os.path.dirname(os.path.abspath(__file__))
+        output_dir = self.output_dir or os.path.dirname(os.path.abspath(__file__))
         input_folder_name = os.path.basename(os.path.normpath(self.input_dir))
         safe_folder_name = re.sub(r'[\\/*?:"<>|]', '_', input_folder_name) # Sanitize
         output_filename = f"{safe_folder_name}_analysis.json" # Changed name slightly
-        return os.path.join(script_dir, output_filename)
+        return os.path.join(output_dir, output_filename)
 
     def _perform_gematria_checks(self):
         """Iterates through results and adds Gematria check information."""
@@ -425,43 +914,27 @@ class AnalysisRunner:
                 self._apply_gematria_check_recursive(value, new_context)
         # else: It's not a dict or not the data node we're looking for, stop recursion
 
-    def _find_missing_divisions(self, data_node: Dict[str, Any]) -> List[int]:
+    def _check_division_sequence(self, data_node: Dict[str, Any], expected_max: int) -> Dict[str, List[Any]]:
         """
-        Identifies missing sequential division numbers based on the list of all
-        identifiers found.
+        Validates the node's identifiers against the sequence 1..expected_max in a
+        single bitmap pass: missing numbers (long gaps as [start, end] ranges),
+        duplicates, out-of-order identifiers and identifiers above expected_max.
         """
-        last_id = data_node.get('last_identifier_found')
-        all_ids = data_node.get('all_identifiers_found', [])
-        
-        if not last_id or not all_ids:
-            return [] # Cannot determine missing numbers without data
-
-        # The expected maximum number is the Gematria of the last identifier.
-        expected_max = hebrew_numeral_to_int(last_id)
-        if expected_max <= 0:
-            logging.debug(f"Cannot find missing divisions; last ID '{last_id}' is not a valid positive number.")
-            return []
-            
-        # Convert all found identifiers to their integer values.
-        # Use a set for efficient lookup and to handle duplicates.
-        found_numbers = {hebrew_numeral_to_int(id_str) for id_str in all_ids}
-        found_numbers.discard(0) # Remove non-numeric entries like 'הקדמה'
-
-        if not found_numbers:
-            return []
-
-        # Create the full expected set of numbers from 1 to the max.
-        expected_set = set(range(1, expected_max + 1))
-        
-        # The missing numbers are the difference between the sets.
-        missing_numbers = sorted(list(expected_set - found_numbers))
-        
-        return missing_numbers
+        numbers = data_node.get('identifier_numbers')
+        if not numbers:
+            return {} # Cannot validate the sequence without data
+        return check_sequence(numbers, expected_max)
 
 
     def _perform_single_gematria_check(self, data_node: Dict[str, Any], context_name: str):
         """Performs Gematria check on a single data node and updates it."""
-        logging.info(f"  -> Checking: {context_name} | Count: {data_node.get('count', 'N/A')} | Last ID: '{data_node.get('last_identifier_found', 'N/A')}'")
+        logging.debug("  -> Checking: %s | Count: %s | Last ID: '%s'", context_name,
+                      data_node.get('count', 'N/A'), data_node.get('last_identifier_found', 'N/A'))
+        amud_codes = data_node.pop("amud_codes", None)
+        if amud_codes:
+            self._perform_amud_check(data_node, context_name, amud_codes)
+            data_node.pop("identifier_numbers", None)
+            return
         last_id = data_node.get('last_identifier_found')
         count = data_node.get('count')
         check_result = "N/A"
@@ -475,33 +948,226 @@ class AnalysisRunner:
             
             if gematria_value > 0:
                 if gematria_value == count:
-                    logging.info(f"     -> Gematria ('{context_name}'): Match! ('{last_id}' = {gematria_value})")
+                    logging.debug("     -> Gematria ('%s'): Match! ('%s' = %d)", context_name, last_id, gematria_value)
                     check_result = "Match"
                 else:
-                    logging.warning(f"     -> Gematria ('{context_name}'): Mismatch! ('{last_id}' = {gematria_value}, Count = {count})")
+                    diagnostics.report("gematria_mismatch", context_name,
+                                       "     -> Gematria ('%s'): Mismatch! ('%s' = %d, Count = %d)",
+                                       context_name, last_id, gematria_value, count,
+                                       last_identifier=last_id, gematria=gematria_value, count=count)
                     check_result = f"Mismatch (ID:{gematria_value}, Count:{count})"
             else:
-                logging.warning(f"     -> Gematria ('{context_name}'): Last ID ('{last_id}') is non-numeric.")
+                diagnostics.report("non_numeric_id", context_name,
+                                   "     -> Gematria ('%s'): Last ID ('%s') is non-numeric.", context_name, last_id,
+                                   last_identifier=last_id, count=count)
                 check_result = "Non-numeric ID"
         elif count is not None and count > 0:
-             logging.warning(f"     -> Gematria ('{context_name}'): Last ID missing (Count = {count}).")
+             diagnostics.report("last_id_missing", context_name,
+                                "     -> Gematria ('%s'): Last ID missing (Count = %s).", context_name, count, count=count)
              check_result = "Last ID Missing"
         else:
             check_result = "N/A (No Count/ID)"
 
         data_node["gematria_check"] = check_result
         
-        # If the check did not result in a perfect match, find missing divisions.
-        # We also check for "N/A" to avoid running on empty sections.
-        if check_result not in ["Match", "N/A", "N/A (No Count/ID)"]:
-            missing = self._find_missing_divisions(data_node)
+        # Whenever the last identifier is numeric, validate the whole identifier sequence.
+        # A matching count can still hide a gap that is offset by a duplicate.
+        expected_max = data_node.get("last_identifier_gematria", 0)
+        if expected_max > 0:
+            report = self._check_division_sequence(data_node, expected_max)
+            missing = report.get("missing")
             if missing:
-                logging.warning(f"     -> Missing divisions found for '{context_name}': {len(missing)} items. Example: {missing[:10]}")
+                diagnostics.report("missing_divisions", context_name,
+                                   "     -> Missing divisions found for '%s': %d items. Example: %s",
+                                   context_name, count_missing(missing), missing[:10],
+                                   missing_count=count_missing(missing), missing=missing)
                 data_node["missing_divisions"] = missing
+            duplicates = report.get("duplicates")
+            if duplicates:
+                diagnostics.report("duplicate_divisions", context_name,
+                                   "     -> Duplicate divisions found for '%s': %s", context_name, duplicates[:10],
+                                   duplicates=duplicates)
+                data_node["duplicate_divisions"] = duplicates
+            out_of_order = report.get("out_of_order")
+            if out_of_order:
+                diagnostics.report("out_of_order_divisions", context_name,
+                                   "     -> Out-of-order divisions found for '%s': %s", context_name, out_of_order[:10],
+                                   out_of_order=out_of_order)
+                data_node["out_of_order_divisions"] = out_of_order
+            out_of_range = report.get("out_of_range")
+            if out_of_range:
+                diagnostics.report("out_of_range_divisions", context_name,
+                                   "     -> Divisions beyond the last one ('%s' = %d) found for '%s': %s",
+                                   data_node.get("last_identifier_found"), expected_max, context_name,
+                                   out_of_range[:10], expected_max=expected_max, out_of_range=out_of_range)
+                data_node["out_of_range_divisions"] = out_of_range
+
+        # Remove the intermediate identifier values from the final output.
+        data_node.pop("identifier_numbers", None)
+
+
+    def _perform_amud_check(self, data_node: Dict[str, Any], context_name: str, amud_codes: Sequence[int]):
+        """
+        Validates a node whose headings name single amudim ('ב.', 'ב:', 'ב ע"א').
+        The amudim are kept as integer codes (2 * daf + side, see amud.py) and checked
+        as the sequence from amud 2a (or an earlier amud found) to the last amud found.
+        first_amud / last_amud are written as codes, the missing, duplicate,
+        out-of-order and out-of-range amudim as labels ('21b', ranges as ['10a', '12b']).
+        """
+        first_amud, last_amud = min(min(amud_codes), FIRST_AMUD), amud_codes[-1]
+        data_node["first_amud"] = first_amud
+        data_node["last_amud"] = last_amud
+        data_node["last_identifier_gematria"] = decode_amud(last_amud)[0]
+
+        report = check_sequence(amud_codes, last_amud, first_amud)
+        expected = last_amud - first_amud + 1
+        count = data_node.get("count")
+        if expected == count:
+            logging.debug("     -> Amudim ('%s'): Match! (%s..%s = %d)", context_name,
+                          amud_label(first_amud), amud_label(last_amud), expected)
+            data_node["gematria_check"] = "Match"
+        else:
+            diagnostics.report("amud_mismatch", context_name,
+                               "     -> Amudim ('%s'): Mismatch! (last amud %s = %d amudim, Count = %d)",
+                               context_name, amud_label(last_amud), expected, count,
+                               last_amud=last_amud, amudim=expected, count=count)
+            data_node["gematria_check"] = f"Mismatch (Amudim:{expected}, Count:{count})"
+
+        missing = report["missing"]
+        if missing:
+            labels = amud_labels(missing)
+            diagnostics.report("missing_amudim", context_name,
+                               "     -> Missing amudim found for '%s': %d items. Example: %s",
+                               context_name, count_missing(missing), labels[:10],
+                               missing_count=count_missing(missing), missing=labels)
+            data_node["missing_amudim"] = labels
+        if report["duplicates"]:
+            labels = amud_labels(report["duplicates"])
+            diagnostics.report("duplicate_amudim", context_name,
+                               "     -> Duplicate amudim found for '%s': %s", context_name, labels[:10],
+                               duplicates=labels)
+            data_node["duplicate_amudim"] = labels
+        if report["out_of_order"]:
+            labels = amud_labels(report["out_of_order"])
+            diagnostics.report("out_of_order_amudim", context_name,
+                               "     -> Out-of-order amudim found for '%s': %s", context_name, labels[:10],
+                               out_of_order=labels)
+            data_node["out_of_order_amudim"] = labels
+        if report["out_of_range"]:
+            labels = amud_labels(report["out_of_range"])
+            diagnostics.report("out_of_range_amudim", context_name,
+                               "     -> Amudim beyond the last one (%s) found for '%s': %s",
+                               amud_label(last_amud), context_name, labels[:10],
+                               last_amud=last_amud, out_of_range=labels)
+            data_node["out_of_range_amudim"] = labels
+
+
+    def _list_input_files(self, output_path: str) -> List[str]:
+        """Returns the text files to analyze, in a fixed (sorted) order."""
+        files, _ = _scan_directory(self.input_dir)
+        # Skip the output file itself
+        files = [(filepath, size) for filepath, size in files if filepath != output_path]
+        self.file_sizes.update(files)
+        return [filepath for filepath, _ in files]
+
+    def _store_outcome(self, outcomes: Dict[str, Tuple[str, Dict[str, Any]]], filepath: str, result: Tuple):
+        """Stores a worker result as (book_name, structured_data), keeping its metrics aside."""
+        if self.collect_metrics:
+            book_name, structured_data, self.file_metrics[filepath] = result
+            result = (book_name, structured_data)
+        outcomes[filepath] = result
+        if self.stream is not None:
+            self._stream_outcome(outcomes, filepath)
+
+    def _begin_stream(self, output_path: str):
+        """Opens the collection's result stream (in streaming mode)."""
+        if self.stream_output:
+            header = self.collection_data()
+            header.pop("books_data")
+            header["analysis_timestamp"] = datetime.now().isoformat()
+            self.stream = ResultStreamWriter(stream_path(output_path), header)
+
+    def _stream_outcome(self, outcomes: Dict[str, Tuple[str, Dict[str, Any]]], filepath: str):
+        """Caches, validates and appends one book to the stream, then releases its data."""
+        book_name, structured_data = outcomes[filepath]
+        key = self.cache_keys.get(filepath)
+        if self.cache is not None and key is not None:
+            self.cache.put(key, book_name, structured_data) # Before the Gematria checks modify it
+        if structured_data:
+            self._apply_gematria_check_recursive(structured_data, book_name)
+            self.stream.write_book(os.path.basename(filepath), book_name, structured_data)
+            self.streamed_books += 1
+        outcomes[filepath] = (book_name, None) # Only the file's completion is kept
+
+    def _analyze_serial(self, filepaths: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Analyzes the files one after the other in the current process."""
+        outcomes = {}
+        for filepath in filepaths:
+            logging.debug("--- Analyzing file: '%s' ---", os.path.basename(filepath))
+            try:
+                result = _analyze_file_worker(filepath, self.input_mode, self.collect_metrics, self.detection)
+                self._store_outcome(outcomes, filepath, result)
+            except Exception as e:
+                logging.error(f"!!! Critical error analyzing file '{os.path.basename(filepath)}': {e}", exc_info=True)
+        return outcomes
+
+    def _submit(self, executor: ProcessPoolExecutor, filepaths: List[str]) -> Dict[Future, str]:
+        """
+        Submits the files to a process pool. The largest files are submitted
+        first so that a single huge book does not end up running alone at the
+        tail of the run.
+        """
+        by_size_desc = sorted(
+            filepaths, key=lambda filepath: self.file_sizes.get(filepath) or os.path.getsize(filepath), reverse=True
+        )
+        return {
+            executor.submit(_analyze_file_worker, filepath, self.input_mode, self.collect_metrics, self.detection): filepath
+            for filepath in by_size_desc
+        }
 
-        # Remove the intermediate list of all identifiers from the final output.
-        data_node.pop("all_identifiers_found", None)
-
+    def _gather(self, futures: Dict[Future, str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Collects the outcomes of submitted files as they complete."""
+        outcomes = {}
+        for future in as_completed(futures):
+            filepath = futures[future]
+            try:
+                self._store_outcome(outcomes, filepath, future.result())
+            except Exception as e:
+                logging.error(f"!!! Critical error analyzing file '{os.path.basename(filepath)}': {e}", exc_info=True)
+        return outcomes
+
+    def _analyze_parallel(self, filepaths: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Analyzes the files in the shared process pool, or in a pool of `workers` processes."""
+        if self.executor is not None:
+            return self._gather(self._submit(self.executor, filepaths))
+        logging.info(f"Analyzing {len(filepaths)} files with {self.workers} worker processes.")
+        with ProcessPoolExecutor(max_workers=self.workers, **diagnostics.executor_options()) as executor:
+            return self._gather(self._submit(executor, filepaths))
+
+    def _lookup_cache(self, filepaths: List[str]) -> Tuple[Dict[str, Tuple[str, Dict[str, Any]]], Dict[str, Optional[str]]]:
+        """
+        Splits the files into cached outcomes and files that still need analysis.
+        Returns (outcomes, pending) where pending maps each file to its cache key.
+        """
+        outcomes = {}
+        pending = {}
+        for filepath in filepaths:
+            if self.cache is None:
+                pending[filepath] = None
+                continue
+            try:
+                key = self.cache.key_for(hash_file(filepath), filepath)
+            except OSError as e:
+                logging.error(f"Error hashing file {filepath}: {e}")
+                pending[filepath] = None
+                continue
+            cached = self.cache.get(key)
+            if cached is None:
+                pending[filepath] = key
+            else:
+                outcomes[filepath] = cached
+        self.cache_keys.update(pending)
+        return outcomes, pending
 
     def run_analysis(self):
         """Runs the analysis for all files in the input directory."""
@@ -509,45 +1175,141 @@ class AnalysisRunner:
         output_path = self._get_output_path() # Determine output path early
         logging.info(f"Output will be saved to: {output_path}")
 
+        filepaths = self._list_input_files(output_path)
+        outcomes, pending = self._lookup_cache(filepaths)
+        to_analyze = list(pending)
+        if self.write_output:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        self._begin_stream(output_path)
+        if (self.executor is not None or self.workers > 1) and len(to_analyze) > 1:
+            outcomes.update(self._analyze_parallel(to_analyze))
+        else:
+            outcomes.update(self._analyze_serial(to_analyze))
+
+        self._finish_run(filepaths, outcomes, pending, output_path)
+        if self.cache is not None:
+            self.cache.save()
+            logging.info(self.cache.summary())
+
+    def _finish_run(self, filepaths: List[str], outcomes: Dict[str, Tuple[str, Dict[str, Any]]],
+                    pending: Dict[str, Optional[str]], output_path: str) -> int:
+        """Caches fresh outcomes, merges them in file order, validates and writes the output."""
+        if self.stream is not None:
+            return self._finish_stream(filepaths, outcomes, output_path)
+        if self.cache is not None:
+            # Store fresh results before the Gematria checks modify them
+            for filepath, key in pending.items():
+                if key is not None and filepath in outcomes:
+                    self.cache.put(key, *outcomes[filepath])
+
+        # Merge in the fixed file order, so serial and parallel runs produce identical output
         files_processed = 0
-        for filename in os.listdir(self.input_dir):
-            # Consider common text/markup file extensions
-            if filename.lower().endswith(('.txt', '.html', '.htm')):
-                filepath = os.path.join(self.input_dir, filename)
-                # Skip the output file itself and ensure it's a file
-                if os.path.isfile(filepath) and filepath != output_path:
-                    logging.info(f"--- Analyzing file: '{filename}' ---")
-                    try:
-                        analyzer = TextAnalyzer(filepath)
-                        structured_data = analyzer.analyze()
-                        if structured_data: # Only add if analysis yielded results
-                            self.results[analyzer.book_name] = structured_data
-                        files_processed += 1
-                    except Exception as e:
-                        logging.error(f"!!! Critical error analyzing file '{filename}': {e}", exc_info=True)
-            # else: skip non-text files silently or log debug message
+        for filepath in filepaths:
+            if filepath not in outcomes:
+                continue
+            book_name, structured_data = outcomes[filepath]
+            if structured_data: # Only add if analysis yielded results
+                self.results[book_name] = structured_data
+            files_processed += 1
 
         if not self.results:
              logging.warning("Analysis complete, but no structured data was generated for any file.")
-             return # Don't perform checks or write empty file
+             return files_processed # Don't perform checks or write empty file
 
         # Perform Gematria checks on the collected results
         self._perform_gematria_checks()
 
         # Write the final output
-        self._write_json_output(output_path)
+        if self.write_output:
+            self._write_json_output(output_path)
+            if self.collect_metrics:
+                self._write_metrics(self.metrics_path(output_path), len(filepaths))
         logging.info(f"--- Analysis complete. Processed {files_processed} files. ---")
+        return files_processed
+
+
+    def _finish_stream(self, filepaths: List[str], outcomes: Dict[str, Tuple[str, Dict[str, Any]]],
+                       output_path: str) -> int:
+        """Streams the cached outcomes too, closes the stream and optionally finalizes it."""
+        for filepath in filepaths:
+            if filepath in outcomes and outcomes[filepath][1] is not None:
+                self._stream_outcome(outcomes, filepath)
+        self.stream.close()
+        files_processed = sum(1 for filepath in filepaths if filepath in outcomes)
+        if not self.streamed_books:
+            logging.warning("Analysis complete, but no structured data was generated for any file.")
+            os.remove(self.stream.path)
+            return files_processed
+        logging.info(f"Streamed {self.streamed_books} books to: {self.stream.path}")
+        if self.finalize_stream:
+            finalize(self.stream.path, output_path)
+            logging.info(f"Successfully wrote analysis results to: {output_path}")
+        if self.collect_metrics:
+            self._write_metrics(self.metrics_path(output_path), len(filepaths))
+        logging.info(f"--- Analysis complete. Processed {files_processed} files. ---")
+        return files_processed
 
-
-    def _write_json_output(self, output_path: str):
-        """Writes the collected results to a JSON file."""
-        final_output_json = {
+    def collection_data(self) -> Dict[str, Any]:
+        """Returns the validated results in the `_analysis.json` layout, for converters working in memory."""
+        return {
             "collection_name": os.path.basename(os.path.normpath(self.input_dir)) or "Unknown Collection",
             "processed_folder": self.input_dir,
             "books_data": self.results, # Contains potentially varied structures
-            "analysis_timestamp": datetime.now().isoformat()
         }
 
+    @staticmethod
+    def metrics_path(output_path: str) -> str:
+        """The metrics sidecar of an output file: '<name>_analysis.json' -> '<name>_metrics.json'."""
+        base = output_path[:-len("_analysis.json")] if output_path.endswith("_analysis.json") else os.path.splitext(output_path)[0]
+        return f"{base}_metrics.json"
+
+    def metrics_report(self, files_total: int) -> Dict[str, Any]:
+        """
+        Summarizes the per-file metrics: total and percentile time per step,
+        the slowest files, and every file's record (slowest first).
+        """
+        records = sorted(self.file_metrics.values(), key=lambda m: m["seconds"]["total"], reverse=True)
+        percentiles = {}
+        for step in ANALYSIS_STEPS + ("total",):
+            values = sorted(m["seconds"][step] for m in records)
+            percentiles[step] = {f"p{p}": _percentile(values, p) for p in METRICS_PERCENTILES}
+            percentiles[step]["max"] = values[-1] if values else 0.0
+            percentiles[step]["sum"] = sum(values)
+        peak_memory = sorted(m["peak_memory_bytes"] for m in records)
+        return {
+            "collection_name": os.path.basename(os.path.normpath(self.input_dir)) or "Unknown Collection",
+            "input_mode": self.input_mode,
+            "detection": self.detection,
+            "summary": {
+                "files_total": files_total,
+                "files_measured": len(records),
+                "files_cached": files_total - len(records), # Served from the cache, not measured
+                "bytes": sum(m["bytes"] for m in records),
+                "lines": sum(m["lines"] for m in records),
+                "seconds": percentiles,
+                "peak_memory_bytes": {f"p{p}": _percentile(peak_memory, p) for p in METRICS_PERCENTILES},
+                "slowest_files": [
+                    {"file": m["file"], "seconds": m["seconds"]["total"], "bytes": m["bytes"], "lines": m["lines"]}
+                    for m in records[:METRICS_SLOWEST_FILES]
+                ],
+            },
+            "files": records,
+        }
+
+    def _write_metrics(self, metrics_path: str, files_total: int):
+        """Writes the metrics sidecar next to the analysis output."""
+        try:
+            with open(metrics_path, 'w', encoding='utf-8') as outfile:
+                json.dump(self.metrics_report(files_total), outfile, ensure_ascii=False, indent=4)
+            logging.info(f"Metrics written to: {metrics_path}")
+        except Exception as e:
+            logging.error(f"Error writing metrics '{metrics_path}': {e}")
+
+    def _write_json_output(self, output_path: str):
+        """Writes the collected results to a JSON file."""
+        final_output_json = self.collection_data()
+        final_output_json["analysis_timestamp"] = datetime.now().isoformat()
+
         try:
             with open(output_path, 'w', encoding='utf-8') as outfile:
                 json.dump(final_output_json, outfile, ensure_ascii=False, indent=4)
@@ -556,17 +1318,211 @@ class AnalysisRunner:
             logging.error(f"Critical error writing JSON output to '{output_path}': {e}", exc_info=True)
 
 
+class LibraryRunner:
+    """
+    Analyzes a whole library tree in one run: every directory holding text files
+    is a collection with its own `_analysis.json`. All collections share one
+    process pool and one cache, and each collection's files are submitted as
+    soon as its directory has been listed, so traversal overlaps with parsing.
+    With write_outputs=False nothing is written and the results are only kept
+    in `analyses`, ready to be handed to converter_core.
+    """
+
+    def __init__(self, root_dir: str, workers: int = 1, input_mode: str = "lines",
+                 cache: Optional[AnalysisCache] = None, output_dir: Optional[str] = None,
+                 write_outputs: bool = True, collect_metrics: bool = False, stream_output: bool = False,
+                 finalize_stream: bool = False, detection: str = "full"):
+        self.root_dir = root_dir
+        self.workers = max(1, workers)
+        self.input_mode = input_mode
+        self.detection = detection
+        self.cache = cache
+        self.output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+        self.write_outputs = write_outputs
+        self.collect_metrics = collect_metrics
+        self.stream_output = stream_output # Stream each collection to a JSONL file (see AnalysisRunner)
+        self.finalize_stream = finalize_stream
+        self.collections: List[Dict[str, Any]] = [] # Manifest entries, in traversal order
+        self.analyses: List[Dict[str, Any]] = [] # Collection results (collection_data), in traversal order
+
+    def _iter_collections(self):
+        """Walks the tree depth-first in sorted order, yielding (relative path, directory, files)."""
+        stack = [self.root_dir]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                files, subdirs = _scan_directory(dirpath)
+            except OSError as e:
+                logging.error(f"Cannot list directory '{dirpath}': {e}")
+                continue
+            stack.extend(reversed(subdirs))
+            if files:
+                yield os.path.relpath(dirpath, self.root_dir), dirpath, files
+
+    def run(self) -> List[Dict[str, Any]]:
+        """Analyzes all collections, writes their outputs plus a run manifest and returns `analyses`."""
+        started = datetime.now()
+        logging.info(f"Starting recursive analysis of library: {self.root_dir}")
+        executor = (ProcessPoolExecutor(max_workers=self.workers, **diagnostics.executor_options())
+                    if self.workers > 1 else None)
+        in_flight = []
+        try:
+            for rel_path, dirpath, files in self._iter_collections():
+                # Outputs mirror the tree: <output_dir>/<parent dirs>/<collection>_analysis.json
+                runner = AnalysisRunner(
+                    dirpath, input_mode=self.input_mode, cache=self.cache, executor=executor,
+                    write_output=self.write_outputs, collect_metrics=self.collect_metrics,
+                    stream_output=self.stream_output, finalize_stream=self.finalize_stream, detection=self.detection,
+                    output_dir=os.path.normpath(os.path.join(self.output_dir, os.path.dirname(rel_path)))
+                )
+                output_path = runner._get_output_path()
+                runner.file_sizes.update(files)
+                filepaths = [filepath for filepath, _ in files if filepath != output_path]
+                outcomes, pending = runner._lookup_cache(filepaths)
+                futures = runner._submit(executor, list(pending)) if executor is not None else None
+                in_flight.append((rel_path, runner, filepaths, outcomes, pending, futures, output_path))
+                if executor is None:
+                    self._finish_collection(*in_flight.pop())
+            for collection in in_flight:
+                self._finish_collection(*collection)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if self.cache is not None:
+            self.cache.save()
+            logging.info(self.cache.summary())
+        if self.write_outputs:
+            self._write_manifest(started)
+        logging.info(f"--- Library analysis complete. {len(self.collections)} collections. ---")
+        return self.analyses
+
+    def _finish_collection(self, rel_path: str, runner: AnalysisRunner, filepaths: List[str],
+                           outcomes: Dict[str, Tuple[str, Dict[str, Any]]], pending: Dict[str, Optional[str]],
+                           futures: Optional[Dict[Future, str]], output_path: str):
+        """Waits for a collection's files, then validates and writes its output."""
+        logging.info(f"=== Collection: '{rel_path}' ({len(filepaths)} files) ===")
+        if self.write_outputs:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        runner._begin_stream(output_path)
+        if futures is None:
+            outcomes.update(runner._analyze_serial(list(pending)))
+        else:
+            outcomes.update(runner._gather(futures))
+        files_processed = runner._finish_run(filepaths, outcomes, pending, output_path)
+        if runner.results:
+            self.analyses.append(runner.collection_data())
+        books = runner.streamed_books if runner.stream_output else len(runner.results)
+        written = bool(books) and self.write_outputs
+        self.collections.append({
+            "collection_name": os.path.basename(os.path.normpath(runner.input_dir)),
+            "relative_path": rel_path.replace(os.sep, '/'),
+            "output_file": os.path.relpath(output_path, self.output_dir).replace(os.sep, '/')
+                           if written and (self.finalize_stream or not runner.stream_output) else None,
+            "stream_file": os.path.relpath(stream_path(output_path), self.output_dir).replace(os.sep, '/')
+                           if written and runner.stream_output else None,
+            "metrics_file": os.path.relpath(runner.metrics_path(output_path), self.output_dir).replace(os.sep, '/')
+                            if written and self.collect_metrics else None,
+            "files_processed": files_processed,
+            "books": books,
+        })
+
+    def _write_manifest(self, started: datetime):
+        """Writes the run manifest listing every collection and its output file."""
+        manifest = {
+            "library_root": self.root_dir,
+            "input_mode": self.input_mode,
+            "detection": self.detection,
+            "workers": self.workers,
+            "started": started.isoformat(),
+            "finished": datetime.now().isoformat(),
+            "collections": self.collections,
+        }
+        if self.cache is not None:
+            manifest["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses, "entries": len(self.cache.entries)}
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILENAME)
+        try:
+            with open(manifest_path, 'w', encoding='utf-8') as outfile:
+                json.dump(manifest, outfile, ensure_ascii=False, indent=4)
+            logging.info(f"Run manifest written to: {manifest_path}")
+        except Exception as e:
+            logging.error(f"Error writing run manifest '{manifest_path}': {e}")
+
+
 # --- Main Execution ---
+def _parse_args() -> argparse.Namespace:
+    """Parses the command line; the input directory is prompted for if omitted."""
+    parser = argparse.ArgumentParser(description="Hebrew Text Structure Analyzer")
+    parser.add_argument("input_dir", nargs="?", help="Directory containing the text files.")
+    parser.add_argument("--recursive", action="store_true",
+                        help="Treat every subdirectory holding text files as a collection and analyze them all.")
+    parser.add_argument("--output-dir", help="Where to write the analysis files (default: next to this script).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (default: 1, serial).")
+    parser.add_argument("--input-mode", choices=INPUT_MODES, default="lines",
+                        help="'lines' loads whole files, 'stream' reads each file once with bounded memory, "
+                             "'mmap' scans mapped files for headings regardless of line breaks.")
+    parser.add_argument("--detection", choices=DETECTION_MODES, default="full",
+                        help="How the dominant division is found: 'full' counts every heading, 'adaptive' "
+                             "(lines mode) stops once the leading pattern is statistically certain.")
+    parser.add_argument("--cache", nargs="?", metavar="PATH",
+                        const=os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_CACHE_FILENAME),
+                        help="Reuse results of unchanged files from a persistent cache "
+                             f"(default path: {DEFAULT_CACHE_FILENAME} next to this script).")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Record per-file timings, line/match counts and peak memory into a "
+                             "<collection>_metrics.json sidecar (slower: traces memory allocations).")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f"Maximum number of cached books (default: {DEFAULT_MAX_ENTRIES}).")
+    parser.add_argument("--stream", action="store_true",
+                        help="Append each validated book to a <collection>_analysis.jsonl stream as soon as it is "
+                             "done, instead of keeping the whole collection in memory.")
+    parser.add_argument("--finalize", action="store_true",
+                        help="With --stream, also assemble the usual <collection>_analysis.json from the stream.")
+    parser.add_argument("--diagnostics", nargs="?", metavar="PATH", const="",
+                        help="Write every finding as a JSON line to PATH (default: "
+                             f"{DEFAULT_DIAGNOSTICS_FILENAME} in the output directory) instead of logging it, "
+                             "and print a summary table at the end.")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Log per-file and per-node details (DEBUG level).")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = _parse_args()
     print("Hebrew Text Structure Analyzer")
     print("-" * 30)
-    input_dir_raw = input("Enter the path to the directory containing text files (can include quotes): ")
+    input_dir_raw = args.input_dir
+    if input_dir_raw is None:
+        input_dir_raw = input("Enter the path to the directory containing text files (can include quotes): ")
     input_dir_clean = input_dir_raw.strip().strip('"').strip("'")
 
     if not os.path.isdir(input_dir_clean):
         logging.error(f"Error: Input path '{input_dir_clean}' is not a valid directory.")
     else:
-        runner = AnalysisRunner(input_dir_clean)
-        runner.run_analysis()
+        if args.verbose:
+            logging.getLogger().setLevel(logging.DEBUG)
+        if args.diagnostics is not None:
+            diagnostics_path = args.diagnostics or os.path.join(
+                args.output_dir or os.path.dirname(os.path.abspath(__file__)), DEFAULT_DIAGNOSTICS_FILENAME)
+            os.makedirs(os.path.dirname(os.path.abspath(diagnostics_path)), exist_ok=True)
+            diagnostics.start(diagnostics_path)
+        cache = None
+        if args.cache:
+            cache = AnalysisCache(args.cache, config_fingerprint(analyzer_config(args.input_mode)), max_entries=args.cache_size)
+        if args.recursive:
+            LibraryRunner(input_dir_clean, workers=args.workers, input_mode=args.input_mode,
+                          cache=cache, output_dir=args.output_dir, collect_metrics=args.metrics,
+                          stream_output=args.stream, finalize_stream=args.finalize, detection=args.detection).run()
+        else:
+            runner = AnalysisRunner(input_dir_clean, workers=args.workers, input_mode=args.input_mode,
+                                    cache=cache, output_dir=args.output_dir, collect_metrics=args.metrics,
+                                    stream_output=args.stream, finalize_stream=args.finalize,
+                                    detection=args.detection)
+            runner.run_analysis()
+        if diagnostics.is_active():
+            diagnostics.stop()
+            print(diagnostics.summary_table())
+            print(f"Diagnostics written to: {diagnostics_path}")
         print("-" * 30)
-        print("Processing finished. Check log messages above for details.")
\ No newline at end of file
+        print("Processing finished. Check log messages above for details.")
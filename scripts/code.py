@@ -1,6 +1,15 @@
 import json
 import os
-from datasets import Dataset, Features, Value, Sequence
+import argparse
+from array import array
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from amud import DAF_KEYWORD, FIRST_DAF, amudim_from_pages
+from asset_aggregates import annotate_category
+from structure_index import INDEX_FILENAME, StructureIndex
 
 # רשימת קבצי ה-JSON לעיבוד
 JSON_FILES = [
@@ -12,13 +21,38 @@ JSON_FILES = [
     'halakha.json'
 ]
 
-def process_data_structure(data):
+# שדות הרשומה, לפי הסדר שבו iter_blocks מחזירה אותם
+RECORD_FIELDS = (
+    'category', 'subcategory', 'book', 'part_name', 'unit_type', 'total_units', 'start_unit', 'end_unit',
+    'excluded_units', 'notes', 'unit_count', 'amud_count', 'unit_offset', 'first_amud', 'last_amud',
+)
+# עמודות עם מעט ערכים שונים, שנשמרות כמילון (dictionary encoding)
+DICTIONARY_COLUMNS = ('category', 'subcategory', 'unit_type')
+INT_COLUMNS = ('total_units', 'start_unit', 'end_unit', 'unit_count', 'amud_count', 'unit_offset', 'first_amud', 'last_amud')
+
+# The columnar schema; the dictionary columns store int32 indices into their distinct values
+ARROW_SCHEMA = pa.schema([
+    pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in DICTIONARY_COLUMNS
+             else pa.list_(pa.int64()) if name == 'excluded_units'
+             else pa.int64() if name in INT_COLUMNS
+             else pa.string())
+    for name in RECORD_FIELDS
+])
+
+DATASET_DIR = "./jewish_texts_metadata_dataset"
+PARQUET_DIR = "./jewish_texts_metadata_parquet"
+ROWS_PER_SHARD = 100000
+
+
+def iter_blocks(data):
     """
-    Processes any of the given JSON structures and converts them to a list of records.
-    Each record represents a 'block' of content (a book, a part of a book, etc.),
-    preserving all original metadata like counts, ranges, and exclusions.
+    Yields one tuple per 'block' of content (a book, a part of a book, etc.),
+    with the values of RECORD_FIELDS in order, preserving all original
+    metadata like counts, ranges, and exclusions. The precomputed aggregates
+    (unit/amud counts after exclusions and offsets within the category) are
+    added first. Daf-type books also get their integer amud range (amud.py).
     """
-    records = []
+    annotate_category(data)
     category_name = data.get('name')
 
     for subcat_obj in data.get('subcategories', []):
@@ -26,29 +60,22 @@ def process_data_structure(data):
         subcat_unit_type = subcat_obj.get('content_type')
 
         for book_name, book_info in subcat_obj.get('books', {}).items():
-            
+
             # Case 1: Complex structure with 'parts' (Rambam, Mishnah Berurah)
             if 'parts' in book_info:
                 for part_info in book_info.get('parts', []):
-                    record = {
-                        'category': category_name,
-                        'subcategory': subcat_name,
-                        'book': book_name,
-                        'part_name': part_info.get('name'),
-                        'unit_type': subcat_unit_type,
-                        'total_units': None,
-                        'start_unit': part_info.get('start'),
-                        'end_unit': part_info.get('end'),
-                        'excluded_units': part_info.get('exclude', []),
-                        'notes': None
-                    }
-                    records.append(record)
-            
+                    yield (
+                        category_name, subcat_name, book_name, part_info.get('name'), subcat_unit_type,
+                        None, part_info.get('start'), part_info.get('end'), part_info.get('exclude', []), None,
+                        part_info.get('unit_count'), part_info.get('amud_count'), part_info.get('unit_offset'),
+                        None, None,
+                    )
+
             # Case 2: Simple structure with 'pages' and optional 'exclude' (Tur, Shulchan Aruch, etc.)
             elif 'pages' in book_info:
                 pages_val = book_info['pages']
                 notes = None
-                
+
                 # Handle Talmud's half-pages
                 if isinstance(pages_val, float):
                     total_units = int(pages_val)
@@ -56,42 +83,156 @@ def process_data_structure(data):
                 else:
                     total_units = pages_val
 
-                record = {
-                    'category': category_name,
-                    'subcategory': subcat_name,
-                    'book': book_name,
-                    'part_name': None,
-                    'unit_type': subcat_unit_type,
-                    'total_units': total_units,
-                    'start_unit': None,
-                    'end_unit': None,
-                    'excluded_units': book_info.get('exclude', []),
-                    'notes': notes
-                }
-                records.append(record)
-
-    return records
+                # The exact amud range, as written by the converter or derived from the page count
+                first_amud = last_amud = None
+                if subcat_unit_type == DAF_KEYWORD:
+                    first_amud, last_amud = book_info.get('first_amud'), book_info.get('last_amud')
+                    if last_amud is None:
+                        first_amud, last_amud = amudim_from_pages(pages_val, book_info.get('startPage', FIRST_DAF))
 
-def main():
+                yield (
+                    category_name, subcat_name, book_name, None, subcat_unit_type,
+                    total_units, None, None, book_info.get('exclude', []), notes,
+                    book_info.get('unit_count'), book_info.get('amud_count'), book_info.get('unit_offset'),
+                    first_amud, last_amud,
+                )
+
+
+def process_data_structure(data):
     """
-    Main function to process all JSON files and create a Hugging Face Dataset.
+    Processes any of the given JSON structures and converts them to a list of
+    records (dicts keyed by RECORD_FIELDS), one per block of content.
     """
-    all_records = []
-    
-    print("Starting dataset creation with new structure (preserving all metadata)...")
-    
-    for filename in JSON_FILES:
+    return [dict(zip(RECORD_FIELDS, block)) for block in iter_blocks(data)]
+
+
+class ColumnBuilder:
+    """
+    Fills the columns of ARROW_SCHEMA directly from blocks, without building a
+    record per row: plain columns are appended to, dictionary columns keep an
+    index per row plus their distinct values, and the excluded units are one
+    flat int64 buffer with list offsets.
+    """
+
+    def __init__(self):
+        self.values = {name: [] for name in RECORD_FIELDS if name not in DICTIONARY_COLUMNS and name != 'excluded_units'}
+        self.dictionaries = {name: {} for name in DICTIONARY_COLUMNS} # {value: index}
+        self.indices = {name: [] for name in DICTIONARY_COLUMNS} # Index per row, None for a missing value
+        self.excluded_values = array('q')
+        self.excluded_offsets = array('i', [0])
+        self.num_rows = 0
+
+    def _dictionary_appender(self, name):
+        dictionary, indices = self.dictionaries[name], self.indices[name]
+
+        def append(value):
+            indices.append(None if value is None else dictionary.setdefault(value, len(dictionary)))
+        return append
+
+    def _append_excluded(self, units):
+        self.excluded_values.extend(units)
+        self.excluded_offsets.append(len(self.excluded_values))
+
+    def add_category(self, data):
+        """Appends every block of one category asset."""
+        appenders = [
+            self._dictionary_appender(name) if name in DICTIONARY_COLUMNS
+            else self._append_excluded if name == 'excluded_units'
+            else self.values[name].append
+            for name in RECORD_FIELDS
+        ]
+        for block in iter_blocks(data):
+            for append, value in zip(appenders, block):
+                append(value)
+            self.num_rows += 1
+
+    def to_table(self):
+        arrays = []
+        for field in ARROW_SCHEMA:
+            name = field.name
+            if name in DICTIONARY_COLUMNS:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(self.indices[name], type=pa.int32()),
+                                                             pa.array(list(self.dictionaries[name]), type=pa.string())))
+            elif name == 'excluded_units':
+                arrays.append(pa.ListArray.from_arrays(pa.array(self.excluded_offsets, type=pa.int32()),
+                                                       pa.array(self.excluded_values, type=pa.int64())))
+            else:
+                arrays.append(pa.array(self.values[name], type=field.type))
+        return pa.Table.from_arrays(arrays, schema=ARROW_SCHEMA)
+
+
+def build_table(filenames=JSON_FILES):
+    """Builds the columnar metadata table of all the asset files that exist."""
+    builder = ColumnBuilder()
+    for filename in filenames:
         if not os.path.exists(filename):
             print(f"Warning: File '{filename}' not found. Skipping.")
             continue
-            
+
         with open(filename, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        
+
         print(f"Processing {filename}...")
-        records = process_data_structure(data)
-        all_records.extend(records)
-        print(f"-> Added {len(records)} records (blocks of content).")
+        rows_before = builder.num_rows
+        builder.add_category(data)
+        print(f"-> Added {builder.num_rows - rows_before} records (blocks of content).")
+    return builder.to_table()
+
+
+def write_parquet_shards(table, output_dir=PARQUET_DIR, rows_per_shard=ROWS_PER_SHARD):
+    """
+    Writes the table as part-00000.parquet, part-00001.parquet, ... of at most
+    rows_per_shard rows each (stale shards of an earlier, larger run are removed).
+    Returns the shard paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for filename in os.listdir(output_dir):
+        if filename.startswith('part-') and filename.endswith('.parquet'):
+            os.remove(os.path.join(output_dir, filename))
+    paths = []
+    for shard, offset in enumerate(range(0, max(table.num_rows, 1), rows_per_shard)):
+        path = os.path.join(output_dir, f"part-{shard:05d}.parquet")
+        pq.write_table(table.slice(offset, rows_per_shard), path, compression='zstd',
+                       use_dictionary=list(DICTIONARY_COLUMNS))
+        paths.append(path)
+    return paths
+
+
+def find_block(table, **criteria):
+    """
+    Returns the first record matching all column == value criteria, using
+    vectorized comparisons over whole columns instead of decoding rows one by one.
+    """
+    mask = None
+    for column, value in criteria.items():
+        condition = pc.equal(table[column], value)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    matches = table.filter(mask)
+    return matches.slice(0, 1).to_pylist()[0] if matches.num_rows else None
+
+
+def print_samples(table):
+    print("\n--- Sample records demonstrating preserved metadata ---")
+
+    print("\n1. Tanach (simple structure):")
+    print(find_block(table, book='שמות'))
+
+    print("\n2. Shas (with half pages and amud range):")
+    print(find_block(table, book='ברכות', category='תלמוד בבלי'))
+
+    print("\n3. Tur (with 'exclude' list):")
+    print(find_block(table, book='טור יורה דעה'))
+
+    print("\n4. Rambam (with 'parts' structure):")
+    print(find_block(table, book='ספר המדע', part_name='הלכות דעות'))
+
+    print("\n5. Mishnah Berurah (with 'parts' and 'exclude'):")
+    print(find_block(table, book='ביאור הלכה', part_name="חלק ו'"))
+
+
+def build_dataset(table):
+    """Creates the Hugging Face Dataset from the columnar table (dictionary columns decoded to strings)."""
+    from datasets import Dataset, DatasetInfo, Features, Value, Sequence
 
     # Define the schema for the dataset
     features = Features({
@@ -105,36 +246,56 @@ def main():
         'end_unit': Value('int64'),
         'excluded_units': Sequence(Value('int64')),
         'notes': Value('string'),
+        'unit_count': Value('int64'), # Units after exclusions
+        'amud_count': Value('int64'), # Daf-type books only
+        'unit_offset': Value('int64'), # Units before this block within the category
+        'first_amud': Value('int64'), # Daf-type books only, 2 * daf + side
+        'last_amud': Value('int64'),
     })
+    return Dataset(table.cast(features.arrow_schema), info=DatasetInfo(features=features))
+
+
+def main():
+    """
+    Main function to process all JSON files into the columnar metadata table,
+    saved as a Hugging Face Dataset or as sharded Parquet files.
+    """
+    parser = argparse.ArgumentParser(description="Build the text structure metadata dataset.")
+    parser.add_argument("--format", choices=("dataset", "parquet"), default="dataset",
+                        help="'dataset' saves a Hugging Face Dataset, 'parquet' writes sharded Parquet files.")
+    parser.add_argument("--output", help=f"Output directory (default: {DATASET_DIR} / {PARQUET_DIR}).")
+    parser.add_argument("--rows-per-shard", type=int, default=ROWS_PER_SHARD, help="Rows per Parquet shard.")
+    args = parser.parse_args()
+
+    print("Starting dataset creation with new structure (preserving all metadata)...")
+    table = build_table()
 
-    # Create the Hugging Face Dataset from the list of dictionaries
-    hf_dataset = Dataset.from_list(all_records, features=features)
-    
     print("\n--- Dataset creation complete ---")
-    print(f"Total records in dataset: {len(hf_dataset)}")
-    print("Dataset features (new schema):")
-    print(hf_dataset.features)
-    
-    print("\n--- Sample records demonstrating preserved metadata ---")
-    
-    print("\n1. Tanach (simple structure):")
-    print(next(r for r in hf_dataset if r['book'] == 'שמות'))
-    
-    print("\n2. Shas (with float pages):")
-    print(next(r for r in hf_dataset if r['book'] == 'ברכות' and r['category'] == 'תלמוד בבלי'))
+    print(f"Total records in dataset: {table.num_rows}")
+    print("Dataset schema:")
+    print(table.schema)
 
-    print("\n3. Tur (with 'exclude' list):")
-    print(next(r for r in hf_dataset if r['book'] == 'טור יורה דעה'))
+    print_samples(table)
 
-    print("\n4. Rambam (with 'parts' structure):")
-    print(next(r for r in hf_dataset if r['book'] == 'ספר המדע' and r['part_name'] == 'הלכות דעות'))
-    
-    print("\n5. Mishnah Berurah (with 'parts' and 'exclude'):")
-    print(next(r for r in hf_dataset if r['book'] == 'ביאור הלכה' and r['part_name'] == "חלק ו'"))
+    # Keyed index on (category, subcategory, book, part_name), saved next to the data
+    index = StructureIndex.build(table)
+    orders = index.prefix('משנה', 'סדר נזיקין')
+    print(f"\n6. Keyed prefix query (משנה / סדר נזיקין): {orders.num_rows if orders is not None else 0} records")
+
+    if args.format == "parquet":
+        output_dir = args.output or PARQUET_DIR
+        paths = write_parquet_shards(table, output_dir, args.rows_per_shard)
+        index.save(os.path.join(output_dir, INDEX_FILENAME))
+        print(f"\nDataset saved locally to '{output_dir}' ({len(paths)} Parquet shards + {INDEX_FILENAME})")
+        return
+
+    hf_dataset = build_dataset(table)
 
     # To save the dataset locally
-    hf_dataset.save_to_disk("./jewish_texts_metadata_dataset")
-    print("\nDataset saved locally to './jewish_texts_metadata_dataset'")
+    output_dir = args.output or DATASET_DIR
+    hf_dataset.save_to_disk(output_dir)
+    index.save(os.path.join(output_dir, INDEX_FILENAME))
+    print(f"\nDataset saved locally to '{output_dir}' (+ {INDEX_FILENAME})")
 
     # --- How to push to Hub ---
     # 1. Login to your Hugging Face account in the terminal:
@@ -146,4 +307,4 @@ def main():
     # print("\nTo push to hub, uncomment the relevant line in the script.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
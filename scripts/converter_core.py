@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared core of the collection converters.
+
+Each output collection is described by one declarative spec in
+COLLECTION_SPECS (title, unit, name cleaning and canonical order), and a single
+builder turns analysis results into the app's structure format. The analysis
+results can come straight from AnalysisRunner / LibraryRunner in memory, or be
+loaded from `_analysis.json` files written earlier.
+
+Spec fields:
+    name          collection title in the app
+    content_type  unit shown in the app ('פרק', 'דף')
+    layout        "categories": every analysis collection is a subcategory of books
+                  "parts":      every analysis collection is a book made of parts
+                  "single":     one analysis collection, every book is a single part
+    order         canonical order: {category: [books]} for "categories", [books] for "parts"
+    strip_prefix  prefix removed from analyzed book names (e.g. "משנה ")
+    unit          "chapters": pages = count, "dapim": pages = amud count / 2. Books whose
+                  analysis carries integer amudim (amud.py) also get first_amud, last_amud
+                  and exclude_amudim, and their pages are derived from last_amud
+    subcategory   name of the single subcategory ("parts" and "single" layouts)
+    indent        JSON indentation of the written asset
+"""
+
+import os
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from amud import amud_codes_from_labels, pages_from_amudim
+from asset_aggregates import annotate_category
+from asset_io import write_json_if_changed
+from division_sequence import expand_missing
+
+ANALYSIS_SUFFIX = "_analysis.json"
+
+COLLECTION_SPECS: Dict[str, Dict[str, Any]] = {
+    "tanach": {
+        "name": "תנ\"ך",
+        "content_type": "פרק",
+        "layout": "categories",
+        "unit": "chapters",
+        "strip_prefix": None,
+        "indent": 2,
+        "order": {
+            "תורה": [
+                "בראשית", "שמות", "ויקרא", "במדבר", "דברים"
+            ],
+            "נביאים": [
+                "יהושע", "שופטים", "שמואל א", "שמואל ב", "מלכים א", "מלכים ב",
+                "ישעיהו", "ירמיהו", "יחזקאל", "הושע", "יואל", "עמוס", "עובדיה", "יונה", "מיכה", "נחום", "חבקוק", "צפניה", "חגי", "זכריה", "מלאכי"
+            ],
+            "כתובים": [
+                "תהילים", "משלי", "איוב", "שיר השירים", "רות", "איכה",
+                "קהלת", "אסתר", "דניאל", "עזרא", "נחמיה", "דברי הימים א", "דברי הימים ב"
+            ]
+        },
+    },
+    "mishna": {
+        "name": "משנה",
+        "content_type": "פרק",
+        "layout": "categories",
+        "unit": "chapters",
+        "strip_prefix": "משנה ", # "משנה אהלות" -> "אהלות"
+        "indent": 2,
+        "order": {
+            "סדר זרעים": [
+                "ברכות", "פאה", "דמאי", "כלאים", "שביעית", "תרומות",
+                "מעשרות", "מעשר שני", "חלה", "ערלה", "ביכורים"
+            ],
+            "סדר מועד": [
+                "שבת", "עירובין", "פסחים", "שקלים", "יומא", "סוכה",
+                "ביצה", "ראש השנה", "תענית", "מגילה", "מועד קטן", "חגיגה"
+            ],
+            "סדר נשים": [
+                "יבמות", "כתובות", "נדרים", "נזיר", "סוטה", "גיטין", "קידושין"
+            ],
+            "סדר נזיקין": [
+                "בבא קמא", "בבא מציעא", "בבא בתרא", "סנהדרין", "מכות",
+                "שבועות", "עדיות", "עבודה זרה", "אבות", "הוריות"
+            ],
+            "סדר קדשים": [
+                "זבחים", "מנחות", "חולין", "בכורות", "ערכין", "תמורה",
+                "כריתות", "מעילה", "תמיד", "מדות", "קינים"
+            ],
+            "סדר טהרות": [
+                "כלים", "אהלות", "נגעים", "פרה", "טהרות", "מקואות", "נדה",
+                "מכשירין", "זבים", "טבול יום", "ידים", "עוקצים"
+            ]
+        },
+    },
+    "shas": {
+        "name": "תלמוד בבלי",
+        "content_type": "דף",
+        "layout": "categories",
+        "unit": "dapim", # The analysis counts amudim
+        "strip_prefix": None,
+        "indent": 2,
+        "order": {
+            "סדר זרעים": ["ברכות"],
+            "סדר מועד": [
+                "שבת", "עירובין", "פסחים", "שקלים", "יומא", "סוכה",
+                "ביצה", "ראש השנה", "תענית", "מגילה", "מועד קטן", "חגיגה"
+            ],
+            "סדר נשים": [
+                "יבמות", "כתובות", "נדרים", "נזיר", "סוטה", "גיטין", "קידושין"
+            ],
+            "סדר נזיקין": [
+                "בבא קמא", "בבא מציעא", "בבא בתרא", "סנהדרין", "מכות",
+                "שבועות", "עבודה זרה", "הוריות"
+            ],
+            "סדר קדשים": [
+                "זבחים", "מנחות", "חולין", "בכורות", "ערכין", "תמורה",
+                "כריתות", "מעילה", "תמיד"
+            ],
+            "סדר טהרות": ["נדה"]
+        },
+    },
+    "rambam": {
+        "name": "רמב\"ם",
+        "content_type": "פרק",
+        "layout": "parts",
+        "unit": "chapters",
+        "strip_prefix": "משנה תורה, ",
+        "subcategory": "משנה תורה",
+        "indent": 2,
+        "order": [
+            "ספר המדע", "ספר אהבה", "ספר זמנים", "ספר נשים",
+            "ספר קדושה", "ספר הפלאה", "ספר זרעים", "ספר עבודה",
+            "ספר קרבנות", "ספר טהרה", "ספר נזיקין", "ספר קניין",
+            "ספר משפטים", "ספר שופטים"
+        ],
+    },
+    "mishna_berura": {
+        "name": None, # Taken from the analysis collection name
+        "content_type": None, # Taken from the first book's division type
+        "layout": "single",
+        "unit": "chapters",
+        "strip_prefix": None,
+        "subcategory": "ספרים", # Generic subcategory name
+        "indent": 4,
+    },
+}
+
+
+# --- Loading ---
+
+def load_analysis_files(input_path: str) -> List[Dict[str, Any]]:
+    """
+    Loads analysis results from a single `_analysis.json` file or from every
+    such file in a directory (in sorted order). Unreadable files are reported and skipped.
+    """
+    if os.path.isdir(input_path):
+        paths = [os.path.join(input_path, name) for name in sorted(os.listdir(input_path))
+                 if name.endswith(ANALYSIS_SUFFIX)]
+    else:
+        paths = [input_path]
+
+    collections = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                collections.append(json.load(f))
+        except Exception as e:
+            print(f"  [שגיאה] אירעה שגיאה בקריאת הקובץ {path}: {e}")
+    return collections
+
+
+def _clean_name(name: str, spec: Dict[str, Any]) -> str:
+    prefix = spec["strip_prefix"]
+    if prefix:
+        name = name.replace(prefix, "")
+    return name.strip()
+
+
+def _unit_pages(count: int, spec: Dict[str, Any]):
+    # Daf count from amud count, allowing halves (e.g. 62.5)
+    return count / 2 if spec["unit"] == "dapim" else count
+
+
+def _book_entry(details: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """The asset entry of a book, with its exact amud range when the analysis found amud headings."""
+    if spec["unit"] != "dapim" or "last_amud" not in details:
+        return {"pages": _unit_pages(details["count"], spec)}
+    entry = {
+        "pages": pages_from_amudim(details["last_amud"]),
+        "first_amud": details["first_amud"],
+        "last_amud": details["last_amud"],
+    }
+    missing_amudim = details.get("missing_amudim")
+    if missing_amudim:
+        entry["exclude_amudim"] = expand_missing(amud_codes_from_labels(missing_amudim))
+    return entry
+
+
+def _collect(spec: Dict[str, Any], collections: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Maps each collection name to {clean book name: analysis details}, skipping books without a count."""
+    collected: Dict[str, Dict[str, Any]] = {}
+    for data in collections:
+        collection_name = data.get("collection_name")
+        books_data = data.get("books_data")
+        if not collection_name or not books_data:
+            print(f"  [אזהרה] חסר 'collection_name' או 'books_data' עבור '{collection_name}'. מדלג.")
+            continue
+        print(f"  מעבד את: {collection_name}")
+        books = collected[collection_name] = {}
+        for book_name, details in books_data.items():
+            if details.get("count") is None:
+                print(f"    [אזהרה] לא נמצא 'count' עבור '{book_name}'.")
+                continue
+            books[_clean_name(book_name, spec)] = details
+    return collected
+
+
+# --- Layouts ---
+
+def _build_categories(spec: Dict[str, Any], collected: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    subcategories = []
+    for category_name, books_in_order in spec["order"].items():
+        if category_name not in collected:
+            print(f"  [אזהרה] לא נמצא מידע עבור '{category_name}'. מדלג.")
+            continue
+        print(f"  מרכיב את '{category_name}'...")
+        books = {}
+        for book_name in books_in_order:
+            if book_name in collected[category_name]:
+                books[book_name] = _book_entry(collected[category_name][book_name], spec)
+            else:
+                print(f"    [אזהרה] לא נמצא '{book_name}' בנתונים של '{category_name}'.")
+        subcategories.append({"name": category_name, "content_type": spec["content_type"], "books": books})
+    return {"name": spec["name"], "content_type": spec["content_type"], "subcategories": subcategories}
+
+
+def _build_parts(spec: Dict[str, Any], collected: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    books = {}
+    for book_name in spec["order"]:
+        if book_name not in collected:
+            print(f"  [אזהרה] לא נמצא מידע עבור '{book_name}'.")
+            continue
+        books[book_name] = None
+    extra_books = [name for name in collected if name not in books]
+    if extra_books:
+        print(f"  [אזהרה] נמצאו ספרים נוספים שאינם ברשימת הסדר: {', '.join(extra_books)}")
+    for book_name in list(books) + extra_books:
+        books[book_name] = {"parts": [
+            {"name": part_name, "start": 1, "end": _unit_pages(details["count"], spec)}
+            for part_name, details in collected[book_name].items()
+        ]}
+    return {
+        "name": spec["name"],
+        "content_type": spec["content_type"],
+        "subcategories": [{"name": spec["subcategory"], "content_type": spec["content_type"], "books": books}],
+    }
+
+
+def _build_single(spec: Dict[str, Any], data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    books_data = data.get("books_data", {})
+    if not books_data:
+        print("  [אזהרה] לא נמצא 'books_data' בנתוני הניתוח.")
+        return None
+    # Determine the content type from the first book, default to 'פרק'
+    content_type = spec["content_type"] or next(iter(books_data.values()), {}).get("division_type", "פרק")
+    books = {}
+    for book_name, book_info in books_data.items():
+        part = {"name": book_name, "start": 1, "end": book_info.get("last_identifier_gematria", 0)}
+        # Long gaps are stored as [start, end] ranges in the analysis, the app expects numbers
+        missing_divisions = book_info.get("missing_divisions")
+        if missing_divisions:
+            part["exclude"] = expand_missing(missing_divisions)
+        books[book_name] = {"parts": [part]}
+    return {
+        "name": spec["name"] or data.get("collection_name", "N/A"),
+        "content_type": content_type,
+        "subcategories": [{"name": spec["subcategory"], "content_type": content_type, "books": books}],
+    }
+
+
+def build_structure(spec_name: str, collections: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Builds the app structure of a collection from analysis results, with the
+    per-book aggregates of asset_aggregates embedded. Returns None if there is nothing to build.
+    """
+    spec = COLLECTION_SPECS[spec_name]
+    if spec["layout"] == "single":
+        structure = _build_single(spec, collections[0]) if collections else None
+    else:
+        print("שלב 1: איסוף המידע מתוצאות הניתוח")
+        collected = _collect(spec, collections)
+        print("\nשלב 2: מרכיב את מבנה הפלט לפי הסדר המלא.")
+        if spec["layout"] == "parts":
+            structure = _build_parts(spec, collected)
+        else:
+            structure = _build_categories(spec, collected)
+    return annotate_category(structure) if structure is not None else None
+
+
+# --- Writing ---
+
+def write_structure(spec_name: str, collections: List[Dict[str, Any]], output_file: str) -> bool:
+    """Builds a collection and writes it only if its content changed. Returns True if the file was written."""
+    structure = build_structure(spec_name, collections)
+    if structure is None:
+        return False
+    changed = write_json_if_changed(output_file, structure, indent=COLLECTION_SPECS[spec_name]["indent"])
+    if changed:
+        print(f"\nהתהליך הושלם. המידע המאוחד והמסודר נשמר בקובץ: {output_file}")
+    else:
+        print(f"\nהתהליך הושלם. הקובץ {output_file} לא השתנה ולא נכתב מחדש.")
+    return changed
+
+
+def convert_files(spec_name: str, input_path: str, output_file: str) -> bool:
+    """Converts `_analysis.json` files (a directory, or a single file) written by the analyzer."""
+    print(f"טוען את קובצי הניתוח מ: {input_path}")
+    return write_structure(spec_name, load_analysis_files(input_path), output_file)
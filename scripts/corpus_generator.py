@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Seeded generator of synthetic Otzaria-style text files, for benchmarks.
+
+Every book starts with an H1 name and counts its divisions with one keyword
+from DIVISION_KEYWORDS at H2, H3 or H4:
+
+    H2 divisions:  <h1>book</h1>, <h2>פרק א</h2>, ...
+    H3 divisions:  H2 parts holding H3 divisions
+    H4 divisions:  H2 parts holding H3 sub-parts holding H4 divisions
+
+Identifiers are Hebrew numerals; a share of them is deliberately skipped
+(gaps) or repeated (duplicates), so the sequence checks have work to do. A
+share of the books is minified, i.e. written as one single line. The same
+seed always produces the same corpus.
+
+Usage: python corpus_generator.py OUTPUT_DIR [--collections C] [--books B] [--divisions D] [--seed S] ...
+"""
+
+import os
+import json
+import random
+import argparse
+from typing import Any, Dict, List
+
+from chaper_numbering_script import DIVISION_KEYWORDS
+from gematria import int_to_hebrew
+
+HEBREW_LETTERS = "אבגדהוזחטיכלמנסעפצקרשת"
+# Name of the file describing the generated corpus (not a text file, so the analyzer skips it)
+CORPUS_MANIFEST_FILENAME = "corpus_manifest.json"
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join("".join(rng.choice(HEBREW_LETTERS) for _ in range(rng.randint(2, 7))) for _ in range(count))
+
+
+def _body(rng: random.Random, lines: int, words_per_line: int) -> List[str]:
+    body = []
+    for _ in range(lines):
+        line = _words(rng, rng.randint(max(1, words_per_line // 2), words_per_line * 2))
+        if rng.random() < 0.2:
+            line = f"<b>{line[:12]}</b>{line[12:]}" # Inline markup that is not a heading
+        body.append(line)
+    return body
+
+
+def _identifiers(rng: random.Random, count: int, gap_rate: float, duplicate_rate: float) -> List[int]:
+    """Division numbers 1..count with random gaps and duplicates."""
+    numbers = []
+    for number in range(1, count + 1):
+        if number > 1 and rng.random() < gap_rate:
+            continue
+        numbers.append(number)
+        if rng.random() < duplicate_rate:
+            numbers.append(number)
+    return numbers
+
+
+def generate_book(rng: random.Random, name: str, divisions: int, level: int, keyword: str,
+                  body_lines: int, words_per_line: int, gap_rate: float, duplicate_rate: float,
+                  parts: int = 3, subparts: int = 2) -> str:
+    """Generates the text of one book with `divisions` divisions per leaf section."""
+    lines = [f"<h1>{name}</h1>", _words(rng, 8)]
+
+    def add_divisions():
+        for number in _identifiers(rng, divisions, gap_rate, duplicate_rate):
+            lines.append(f"<h{level}>{keyword} {int_to_hebrew(number)}</h{level}>")
+            lines.extend(_body(rng, rng.randint(1, body_lines * 2), words_per_line))
+
+    if level == 2:
+        add_divisions()
+    else:
+        for part in range(1, parts + 1):
+            lines.append(f"<h2>חלק {int_to_hebrew(part)}</h2>")
+            if level == 3:
+                add_divisions()
+                continue
+            for subpart in range(1, subparts + 1):
+                lines.append(f"<h3>מדור {int_to_hebrew(subpart)}</h3>") # Not a division keyword
+                add_divisions()
+    return "\n".join(lines) + "\n"
+
+
+def minify(text: str) -> str:
+    """Joins a book onto one single line, the way some Otzaria books are stored."""
+    return text.replace("\n", " ").rstrip() + "\n"
+
+
+def generate_corpus(output_dir: str, collections: int = 2, books: int = 20, divisions: int = 60,
+                    body_lines: int = 6, words_per_line: int = 12, gap_rate: float = 0.02,
+                    duplicate_rate: float = 0.01, minified_rate: float = 0.1, seed: int = 1) -> Dict[str, Any]:
+    """
+    Writes `collections` directories of `books` books each and a corpus manifest.
+    Returns the manifest: the generator settings plus every file with its
+    division level, keyword, size and line count.
+    """
+    rng = random.Random(seed)
+    files = []
+    for collection in range(1, collections + 1):
+        collection_dir = os.path.join(output_dir, f"אוסף {int_to_hebrew(collection)}")
+        os.makedirs(collection_dir, exist_ok=True)
+        for book in range(1, books + 1):
+            level = rng.choice((2, 3, 4))
+            keyword = rng.choice(DIVISION_KEYWORDS)
+            name = f"ספר {int_to_hebrew(collection)} {int_to_hebrew(book)}"
+            text = generate_book(rng, name, divisions, level, keyword, body_lines, words_per_line,
+                                 gap_rate, duplicate_rate)
+            minified = rng.random() < minified_rate
+            if minified:
+                text = minify(text)
+            path = os.path.join(collection_dir, f"{book:04d}.txt")
+            data = text.encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(data)
+            files.append({
+                "path": os.path.relpath(path, output_dir).replace(os.sep, '/'),
+                "book_name": name, "level": level, "keyword": keyword, "minified": minified,
+                "bytes": len(data), "lines": text.count("\n"),
+            })
+
+    manifest = {
+        "settings": {
+            "collections": collections, "books": books, "divisions": divisions, "body_lines": body_lines,
+            "words_per_line": words_per_line, "gap_rate": gap_rate, "duplicate_rate": duplicate_rate,
+            "minified_rate": minified_rate, "seed": seed,
+        },
+        "total_bytes": sum(entry["bytes"] for entry in files),
+        "total_lines": sum(entry["lines"] for entry in files),
+        "files": files,
+    }
+    with open(os.path.join(output_dir, CORPUS_MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser):
+    """Adds the generator settings to a command line parser (shared with bench_pipeline.py)."""
+    parser.add_argument("--collections", type=int, default=2, help="Number of collection directories.")
+    parser.add_argument("--books", type=int, default=20, help="Books per collection.")
+    parser.add_argument("--divisions", type=int, default=60, help="Divisions per leaf section of a book.")
+    parser.add_argument("--body-lines", type=int, default=6, help="Average body lines per division.")
+    parser.add_argument("--words-per-line", type=int, default=12, help="Average words per body line.")
+    parser.add_argument("--gap-rate", type=float, default=0.02, help="Share of skipped identifiers.")
+    parser.add_argument("--duplicate-rate", type=float, default=0.01, help="Share of repeated identifiers.")
+    parser.add_argument("--minified-rate", type=float, default=0.1, help="Share of single-line books.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+
+
+def corpus_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """Extracts the generate_corpus keyword arguments from parsed arguments."""
+    return {
+        "collections": args.collections, "books": args.books, "divisions": args.divisions,
+        "body_lines": args.body_lines, "words_per_line": args.words_per_line, "gap_rate": args.gap_rate,
+        "duplicate_rate": args.duplicate_rate, "minified_rate": args.minified_rate, "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Otzaria-style corpus.")
+    parser.add_argument("output_dir", help="Directory to write the corpus into.")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.output_dir, **corpus_settings(args))
+    print(f"Wrote {len(manifest['files'])} books, {manifest['total_lines']:,} lines, "
+          f"{manifest['total_bytes'] / 1e6:.1f} MB to {args.output_dir}")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Structured diagnostics for the analyzer.
+
+Every analysis finding (Gematria mismatch, non-numeric identifier, missing
+divisions, empty part, ...) goes through report(). Without diagnostics mode it
+is an ordinary, lazily formatted logging.warning. In diagnostics mode
+(start()), the finding becomes a structured record: it is handed to a queue
+(from the main process and from pool workers alike), and a QueueListener
+thread writes it as one JSON line to a file and counts it for the summary
+table printed by stop(). Nothing is formatted or printed per finding on the
+console, so the analysis threads never wait for I/O.
+"""
+
+import json
+import logging
+import multiprocessing
+from collections import Counter
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# Logger carrying the structured records (not propagated to the console in diagnostics mode)
+DIAGNOSTICS_LOGGER_NAME = "analysis.diagnostics"
+# Default JSONL file name of diagnostics mode
+DEFAULT_DIAGNOSTICS_FILENAME = "analysis_diagnostics.jsonl"
+
+_logger = logging.getLogger(DIAGNOSTICS_LOGGER_NAME)
+_queue: Optional[Any] = None # multiprocessing.Queue while diagnostics mode is on (main process)
+_listener: Optional[QueueListener] = None
+_summary: Optional["_SummaryHandler"] = None
+_active = False
+
+
+class _JsonLinesFormatter(logging.Formatter):
+    """Formats a diagnostic record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": datetime.fromtimestamp(record.created).isoformat(), "level": record.levelname}
+        entry.update(getattr(record, "diagnostic", {}))
+        entry["message"] = record.getMessage()
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _SummaryHandler(logging.Handler):
+    """Counts records per kind, keeping the first context of each kind as an example."""
+
+    def __init__(self):
+        super().__init__()
+        self.counts: Counter = Counter()
+        self.examples: Dict[str, str] = {}
+
+    def emit(self, record: logging.LogRecord):
+        diagnostic = getattr(record, "diagnostic", {})
+        kind = diagnostic.get("kind", record.levelname.lower())
+        self.counts[kind] += 1
+        self.examples.setdefault(kind, diagnostic.get("context", ""))
+
+
+def is_active() -> bool:
+    return _active
+
+
+def report(kind: str, context: str, message: str, *args: Any, level: int = logging.WARNING, **fields: Any):
+    """
+    Reports one finding. `message` and `args` are a %-style log message that is
+    only formatted if it is actually emitted; `fields` are the structured data
+    stored in diagnostics mode (they must be JSON-serializable).
+    """
+    if _active:
+        _logger.log(level, message, *args, extra={"diagnostic": dict(fields, kind=kind, context=context)})
+    else:
+        logging.log(level, message, *args)
+
+
+def _install_queue_handler(queue: Any):
+    _logger.handlers.clear()
+    _logger.addHandler(QueueHandler(queue))
+    _logger.setLevel(logging.DEBUG)
+    _logger.propagate = False
+
+
+def start(path: str):
+    """Turns diagnostics mode on: records are written to `path` (JSONL) by a background listener."""
+    global _queue, _listener, _summary, _active
+    if _active:
+        return
+    _queue = multiprocessing.Queue(-1)
+    file_handler = logging.FileHandler(path, mode='w', encoding='utf-8')
+    file_handler.setFormatter(_JsonLinesFormatter())
+    _summary = _SummaryHandler()
+    _listener = QueueListener(_queue, file_handler, _summary)
+    _listener.start()
+    _install_queue_handler(_queue)
+    _active = True
+
+
+def init_worker(queue: Any):
+    """Process-pool initializer: sends the worker's records to the main process queue."""
+    global _active
+    _install_queue_handler(queue)
+    _active = True
+
+
+def executor_options() -> Dict[str, Any]:
+    """Extra ProcessPoolExecutor arguments that connect its workers to diagnostics mode (if on)."""
+    if not _active or _queue is None:
+        return {}
+    return {"initializer": init_worker, "initargs": (_queue,)}
+
+
+def stop() -> Counter:
+    """Flushes and closes diagnostics mode, returning the record count per kind."""
+    global _queue, _listener, _active
+    if not _active or _listener is None:
+        return Counter()
+    _listener.stop() # Processes everything still queued
+    for handler in _listener.handlers:
+        handler.close()
+    _logger.handlers.clear()
+    _logger.propagate = True
+    _queue.close()
+    _queue, _listener, _active = None, None, False
+    return _summary.counts
+
+
+def summary_table() -> str:
+    """A compact table of the findings of the last diagnostics run."""
+    if _summary is None or not _summary.counts:
+        return "Diagnostics: no findings."
+    width = max(len(kind) for kind in _summary.counts)
+    lines = [f"{'finding':<{width}}  {'count':>7}  first context", "-" * (width + 30)]
+    for kind, count in _summary.counts.most_common():
+        lines.append(f"{kind:<{width}}  {count:>7}  {_summary.examples.get(kind, '')}")
+    return "\n".join(lines)
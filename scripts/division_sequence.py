@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bitmap-based validation of division identifier sequences.
+
+A node's identifiers (already converted to integers, 0 = non-numeric) are
+checked in a single pass against a bytearray bitmap, which reports missing
+numbers, duplicates, identifiers that go backwards and identifiers outside
+the expected range. Missing numbers are
+collected with bytearray.find, so long gaps cost C-speed scans rather than
+Python-level set arithmetic.
+"""
+
+from typing import Any, Dict, Iterable, List, Union
+
+# Gaps of at least this many consecutive numbers are reported as [start, end] ranges
+MISSING_RANGE_MIN_LENGTH = 5
+
+MissingEntry = Union[int, List[int]]
+
+
+def check_sequence(numbers: Iterable[int], expected_max: int, expected_min: int = 1) -> Dict[str, List[Any]]:
+    """
+    Checks identifiers that should run expected_min..expected_max in order.
+    Returns {"missing": [...], "duplicates": [...], "out_of_order": [...],
+    "out_of_range": [...]}, where "missing" holds single numbers and [start, end]
+    ranges for long gaps, "duplicates" each repeated number once, "out_of_order"
+    every identifier lower than the one before it, and "out_of_range" every
+    identifier outside expected_min..expected_max (e.g. a stray 'רנ' in a
+    150-chapter book).
+    """
+    seen = bytearray(max(expected_max, 0) + 1)
+    repeated = bytearray(len(seen))
+    duplicates: List[int] = []
+    out_of_order: List[int] = []
+    out_of_range: List[int] = []
+    previous = 0
+
+    for number in numbers:
+        if number <= 0:
+            continue # Non-numeric identifiers (e.g. 'הקדמה')
+        if number > expected_max or number < expected_min:
+            out_of_range.append(number)
+        if number >= len(seen):
+            growth = bytes(number + 1 - len(seen))
+            seen.extend(growth)
+            repeated.extend(growth)
+        if seen[number]:
+            if not repeated[number]:
+                repeated[number] = 1
+                duplicates.append(number)
+        else:
+            seen[number] = 1
+        if number < previous:
+            out_of_order.append(number)
+        previous = number
+
+    return {
+        "missing": _missing_runs(seen, expected_max, expected_min),
+        "duplicates": duplicates,
+        "out_of_order": out_of_order,
+        "out_of_range": out_of_range,
+    }
+
+
+def _missing_runs(seen: bytearray, expected_max: int, expected_min: int = 1) -> List[MissingEntry]:
+    """Collects the unset positions expected_min..expected_max, compacting long runs into ranges."""
+    missing: List[MissingEntry] = []
+    end = expected_max + 1
+    start = seen.find(0, max(expected_min, 1), end) if end > expected_min else -1
+    while start != -1:
+        run_end = seen.find(1, start, end)
+        if run_end == -1:
+            run_end = end
+        if run_end - start >= MISSING_RANGE_MIN_LENGTH:
+            missing.append([start, run_end - 1])
+        else:
+            missing.extend(range(start, run_end))
+        start = seen.find(0, run_end, end) if run_end < end else -1
+    return missing
+
+
+def expand_missing(missing: Iterable[MissingEntry]) -> List[int]:
+    """Expands a compact missing list (numbers and [start, end] ranges) to plain numbers."""
+    numbers: List[int] = []
+    for entry in missing:
+        if isinstance(entry, list):
+            numbers.extend(range(entry[0], entry[1] + 1))
+        else:
+            numbers.append(entry)
+    return numbers
+
+
+def count_missing(missing: Iterable[MissingEntry]) -> int:
+    """Returns how many numbers a compact missing list stands for."""
+    return sum(entry[1] - entry[0] + 1 if isinstance(entry, list) else 1 for entry in missing)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Table-driven Gematria (Hebrew numeral) conversion.
+
+Every canonical numeral up to NUMERAL_TABLE_MAX (including the טו/טז forms and
+the ת-based values above 400, e.g. תרצז = 697) is precomputed once at import.
+Other inputs fall back to letter-by-letter summation, and all scalar results
+are memoized, so converting the identifiers of a whole library costs one dict
+lookup per identifier.
+
+test_gematria.py compares the converter exhaustively against the original
+implementation (`python gematria.py --self-check` runs it too).
+"""
+
+import sys
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+GEMATRIA_VALUES = {
+    'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
+    'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
+    'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400
+}
+# Identifiers that are known words rather than numerals
+NON_NUMERIC_WORDS = ("הקדמה", "פתיחה", "מבוא", "סוף", "תוכן")
+# Highest value precomputed in NUMERAL_TABLE
+NUMERAL_TABLE_MAX = 1200
+# Maximum number of distinct strings memoized by the scalar path
+GEMATRIA_CACHE_SIZE = 65536
+
+_HUNDREDS = ((300, 'ש'), (200, 'ר'), (100, 'ק'))
+_TENS_AND_UNITS = (
+    (90, 'צ'), (80, 'פ'), (70, 'ע'), (60, 'ס'), (50, 'נ'), (40, 'מ'), (30, 'ל'), (20, 'כ'), (10, 'י'),
+    (9, 'ט'), (8, 'ח'), (7, 'ז'), (6, 'ו'), (5, 'ה'), (4, 'ד'), (3, 'ג'), (2, 'ב'), (1, 'א')
+)
+
+
+def int_to_hebrew(number: int, punctuate: bool = False) -> str:
+    """
+    Converts a positive integer to its Hebrew numeral (e.g. 15 -> 'טו', 697 -> 'תרצז').
+    With punctuate=True a geresh or gershayim is added ('ג\'', 'תרצ"ז').
+    """
+    if not isinstance(number, int) or number <= 0:
+        raise ValueError(f"Only positive integers can be written as Hebrew numerals, got {number!r}.")
+    letters = []
+    remaining = number
+    while remaining >= 400:
+        letters.append('ת')
+        remaining -= 400
+    for value, letter in _HUNDREDS:
+        if remaining >= value:
+            letters.append(letter)
+            remaining -= value
+    # 15 and 16 are written טו / טז to avoid spelling the Divine Name
+    if remaining in (15, 16):
+        letters.append('טו' if remaining == 15 else 'טז')
+        remaining = 0
+    for value, letter in _TENS_AND_UNITS:
+        if remaining >= value:
+            letters.append(letter)
+            remaining -= value
+    numeral = "".join(letters)
+    if punctuate:
+        numeral = numeral + "'" if len(numeral) == 1 else numeral[:-1] + '"' + numeral[-1]
+    return numeral
+
+
+# Precomputed lookup table: canonical numeral -> value
+NUMERAL_TABLE: Dict[str, int] = {int_to_hebrew(n): n for n in range(1, NUMERAL_TABLE_MAX + 1)}
+
+
+def _sum_numeral(hebrew_num: str) -> int:
+    """Letter-by-letter evaluation for strings outside NUMERAL_TABLE (already normalized)."""
+    value, base = 0, hebrew_num
+    # Check suffixes first
+    if hebrew_num.endswith('טז'): base, value = hebrew_num[:-2], 16
+    elif hebrew_num.endswith('טו'): base, value = hebrew_num[:-2], 15
+
+    current_val = 0
+    for char in base:
+        digit_val = GEMATRIA_VALUES.get(char)
+        if digit_val is None:
+            if not any(word in hebrew_num for word in NON_NUMERIC_WORDS):
+                logging.debug("Gematria: Invalid char '%s' in '%s'. Non-numeric.", char, hebrew_num)
+            return 0 # Treat as non-numeric identifier
+        current_val += digit_val
+
+    total_value = current_val + value
+    # Heuristic check for long strings with low value (likely not gematria)
+    if len(base) > 3 and total_value < 10 and value == 0:
+        logging.debug("Gematria: Input '%s' heuristic suggests not numeral. Treating as non-numeric.", hebrew_num)
+        return 0
+    return total_value if total_value > 0 else 0
+
+
+@lru_cache(maxsize=GEMATRIA_CACHE_SIZE)
+def _numeral_value(hebrew_num: str) -> int:
+    """Memoized scalar conversion of a non-empty string."""
+    normalized = hebrew_num.replace("'", "").replace('"', '').strip()
+    value = NUMERAL_TABLE.get(normalized)
+    if value is not None:
+        return value
+    return _sum_numeral(normalized)
+
+
+def hebrew_numeral_to_int(hebrew_num: str) -> int:
+    """Converts a Hebrew numeral string (Gematria) to an integer (0 if non-numeric)."""
+    if not isinstance(hebrew_num, str) or not hebrew_num:
+        return 0
+    return _numeral_value(hebrew_num)
+
+
+def numerals_to_ints(identifiers: Iterable[str]) -> List[int]:
+    """Converts a whole identifier list at once; each distinct string is evaluated once."""
+    seen: Dict[str, int] = {}
+    values = []
+    for identifier in identifiers:
+        value = seen.get(identifier)
+        if value is None:
+            value = seen[identifier] = hebrew_numeral_to_int(identifier)
+        values.append(value)
+    return values
+
+
+if __name__ == "__main__":
+    if "--self-check" in sys.argv[1:]: # Runs test_gematria.py
+        import unittest
+        result = unittest.main(module="test_gematria", argv=sys.argv[:1], exit=False).result
+        sys.exit(0 if result.wasSuccessful() else 1)
+    for arg in sys.argv[1:]:
+        print(f"{arg} = {hebrew_numeral_to_int(arg)}")
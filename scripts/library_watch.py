@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Watch mode: keeps the structure assets up to date while the source texts are edited.
+
+Every build target (build_assets.BUILD_TARGETS) is analyzed once at startup and
+kept in memory book by book (LiveTarget / LiveCollection). After that, only the
+touched files are re-analyzed: their books are replaced in the collection's
+results, which are merged in file order exactly like a full LibraryRunner run,
+and the asset is rewritten through converter_core (only if its content
+changed). The collection's `_analysis.json` is patched too when analysis files
+are kept. Valid assets then refresh the bundle and the SQLite catalog.
+
+Changes are detected with inotify on Linux (through libc, no extra package),
+and by polling os.stat otherwise. Bursts of events (an editor saving through a
+temporary file, a git checkout) are debounced into one batch.
+
+Usage: python build_assets.py watch --library PATH [--debounce SECONDS] [--poll]
+"""
+
+import os
+import time
+import ctypes
+import select
+import struct
+import logging
+import ctypes.util
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import diagnostics
+from chaper_numbering_script import TEXT_FILE_EXTENSIONS, AnalysisRunner, LibraryRunner
+from converter_core import write_structure
+
+# Quiet period that closes a batch of changes
+DEBOUNCE_SECONDS = 0.15
+# Interval between two scans of the polling watcher
+POLL_INTERVAL = 0.25
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, name length
+
+
+def _is_text_file(path: str) -> bool:
+    return path.lower().endswith(TEXT_FILE_EXTENSIONS)
+
+
+def _walk_dirs(root: str) -> Iterable[str]:
+    """Yields root and every non-hidden directory below it."""
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        yield dirpath
+        try:
+            with os.scandir(dirpath) as entries:
+                stack.extend(entry.path for entry in entries if entry.is_dir() and not entry.name.startswith('.'))
+        except OSError:
+            continue
+
+
+# --- Watchers ---
+
+class PollingWatcher:
+    """Finds changed text files by comparing (size, mtime) snapshots of the watched trees."""
+
+    def __init__(self, roots: List[str], interval: float = POLL_INTERVAL):
+        self.roots = roots
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for root in self.roots:
+            for dirpath in _walk_dirs(root):
+                try:
+                    with os.scandir(dirpath) as entries:
+                        for entry in entries:
+                            if entry.is_file() and _is_text_file(entry.name):
+                                stat = entry.stat()
+                                snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return snapshot
+
+    def poll(self, timeout: Optional[float]) -> Set[str]:
+        """Returns the added, modified and removed files, waiting up to timeout seconds (None: until one)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {path for path, stamp in snapshot.items() if self.snapshot.get(path) != stamp}
+            changed.update(path for path in self.snapshot if path not in snapshot)
+            self.snapshot = snapshot
+            if changed:
+                return changed
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return changed
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify through libc. Every directory of the trees is watched; new
+    directories are added as they appear and reported as a whole (all their
+    files are new). A queue overflow reports the roots, i.e. everything.
+    """
+
+    def __init__(self, roots: List[str]):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.watches: Dict[int, str] = {} # {watch descriptor: directory}
+        for root in roots:
+            self._watch_tree(root)
+
+    def _watch_tree(self, root: str):
+        for dirpath in _walk_dirs(root):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                logging.warning(f"Cannot watch '{dirpath}': {os.strerror(ctypes.get_errno())}")
+                continue
+            self.watches[wd] = dirpath
+
+    def _read_events(self) -> Set[str]:
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(self.roots)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_DELETE_SELF:
+                    del self.watches[wd]
+                    changed.add(directory)
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_tree(path)
+                    changed.add(path)
+                elif _is_text_file(name):
+                    changed.add(path)
+
+    def poll(self, timeout: Optional[float]) -> Set[str]:
+        """Returns the touched files and directories, waiting up to timeout seconds (None: until one)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            changed = self._read_events() if ready else set()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_watcher(roots: List[str], polling: bool = False, interval: float = POLL_INTERVAL):
+    """inotify where available, polling otherwise (or when requested)."""
+    if not polling:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError, TypeError) as e: # No libc inotify (not Linux)
+            logging.info(f"inotify unavailable ({e}), polling every {interval}s.")
+    return PollingWatcher(roots, interval)
+
+
+def wait_for_batch(watcher, debounce: float = DEBOUNCE_SECONDS) -> Set[str]:
+    """Blocks until something changes, then collects changes until debounce seconds pass quietly."""
+    changed = watcher.poll(None)
+    while True:
+        more = watcher.poll(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+def _is_touched(path: str, changed: Set[str]) -> bool:
+    """A file is touched if it changed itself or lies in a changed directory."""
+    while path not in changed:
+        parent = os.path.dirname(path)
+        if not parent or parent == path:
+            return False
+        path = parent
+    return True
+
+
+# --- Live Analysis ---
+
+class LiveCollection:
+    """The analysis of one collection directory, kept per file so single books can be replaced."""
+
+    def __init__(self, dirpath: str, output_dir: str, input_mode: str, detection: str, cache):
+        self.runner = AnalysisRunner(dirpath, input_mode=input_mode, cache=cache, output_dir=output_dir,
+                                     write_output=False, detection=detection)
+        self.books: Dict[str, Tuple[str, Optional[Dict[str, Any]]]] = {} # {filepath: (book_name, validated data)}
+
+    def _analyze(self, filepaths: List[str], executor: Optional[ProcessPoolExecutor]):
+        runner = self.runner
+        outcomes, pending = runner._lookup_cache(filepaths)
+        if executor is not None and len(pending) > 1:
+            outcomes.update(runner._gather(runner._submit(executor, list(pending))))
+        else:
+            outcomes.update(runner._analyze_serial(list(pending)))
+        for filepath in filepaths:
+            if filepath not in outcomes:
+                self.books[filepath] = (os.path.basename(filepath), None) # Failed: retried when touched again
+                continue
+            book_name, structured_data = outcomes[filepath]
+            key = pending.get(filepath)
+            if runner.cache is not None and key is not None:
+                runner.cache.put(key, book_name, structured_data) # Before the Gematria checks modify it
+            if structured_data:
+                runner._apply_gematria_check_recursive(structured_data, book_name)
+            self.books[filepath] = (book_name, structured_data)
+
+    def sync(self, filepaths: List[str], changed: Optional[Set[str]],
+             executor: Optional[ProcessPoolExecutor] = None) -> List[str]:
+        """
+        Brings the collection up to date with its current files: new and touched
+        files (all files if changed is None) are analyzed, removed files dropped.
+        Returns the files that were re-analyzed or dropped.
+        """
+        present = set(filepaths)
+        removed = [filepath for filepath in self.books if filepath not in present]
+        stale = [filepath for filepath in filepaths
+                 if filepath not in self.books or changed is None or _is_touched(filepath, changed)]
+        for filepath in removed:
+            del self.books[filepath]
+        if stale:
+            self._analyze(stale, executor)
+        if stale or removed:
+            # Merge in file order, like AnalysisRunner._finish_run
+            results = {}
+            for filepath in filepaths:
+                book_name, structured_data = self.books[filepath]
+                if structured_data:
+                    results[book_name] = structured_data
+            self.runner.results = results
+        return stale + removed
+
+    def collection_data(self) -> Dict[str, Any]:
+        return self.runner.collection_data()
+
+    def write_analysis(self):
+        """Patches the collection's `_analysis.json` (removed when no book is left)."""
+        output_path = self.runner._get_output_path()
+        if not self.runner.results:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return
+        os.makedirs(self.runner.output_dir, exist_ok=True)
+        self.runner._write_json_output(output_path)
+
+
+class LiveTarget:
+    """One build target: its collections in library traversal order, and its asset."""
+
+    def __init__(self, name: str, source_dir: str, output_path: str, analysis_dir: Optional[str],
+                 input_mode: str, detection: str, cache):
+        self.name = name
+        self.source_dir = source_dir
+        self.output_path = output_path
+        self.analysis_dir = analysis_dir # Also patch the _analysis.json files there, if set
+        self.input_mode = input_mode
+        self.detection = detection
+        self.cache = cache
+        self.collections: Dict[str, LiveCollection] = {} # {directory: collection}, in traversal order
+
+    def owns(self, path: str) -> bool:
+        return path == self.source_dir or path.startswith(self.source_dir + os.sep)
+
+    def update(self, changed: Optional[Set[str]], executor: Optional[ProcessPoolExecutor] = None) -> Tuple[List[str], bool]:
+        """
+        Re-lists the source tree, re-analyzes the touched files (everything if
+        changed is None) and rewrites the asset if its content changed.
+        Returns (re-analyzed or removed files, asset written).
+        """
+        if changed is None and self.analysis_dir and os.path.isdir(self.analysis_dir):
+            for old_file in os.listdir(self.analysis_dir): # Drop outputs of removed collections, as build_assets does
+                if old_file.endswith("_analysis.json"):
+                    os.remove(os.path.join(self.analysis_dir, old_file))
+        collections = {}
+        touched = []
+        for rel_path, dirpath, files in LibraryRunner(self.source_dir)._iter_collections():
+            collection = self.collections.get(dirpath)
+            if collection is None:
+                output_dir = os.path.normpath(os.path.join(self.analysis_dir or self.source_dir, os.path.dirname(rel_path)))
+                collection = LiveCollection(dirpath, output_dir, self.input_mode, self.detection, self.cache)
+            collection.runner.file_sizes.update(files)
+            updated = collection.sync([filepath for filepath, _ in files], changed, executor)
+            if updated and self.analysis_dir:
+                collection.write_analysis()
+            touched.extend(updated)
+            collections[dirpath] = collection
+        for dirpath, collection in self.collections.items():
+            if dirpath not in collections: # No text files left in the collection directory
+                touched.extend(collection.books)
+                if self.analysis_dir:
+                    collection.runner.results = {}
+                    collection.write_analysis()
+        self.collections = collections
+        if not touched:
+            return touched, False
+        analyses = [collection.collection_data() for collection in collections.values() if collection.runner.results]
+        return touched, write_structure(self.name, analyses, self.output_path)
+
+
+def watch(build, input_mode: str = "lines", detection: str = "full", cache_path: Optional[str] = None,
+          keep_analysis: bool = False, workers: int = 1, debounce: float = DEBOUNCE_SECONDS,
+          polling: bool = False, bundle_path: Optional[str] = None, catalog_path: Optional[str] = None):
+    """Builds every target with a source (see AssetBuild), then keeps them up to date until interrupted."""
+    cache = build._open_cache(cache_path, input_mode)
+    targets = [
+        LiveTarget(name, build.source_dir(name), build.output_path(name),
+                   build.analysis_dir(name) if keep_analysis else None, input_mode, detection, cache)
+        for name in build.targets if build.has_source(name)
+    ]
+    if not targets:
+        print("Watch: no target has a source directory.")
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers, **diagnostics.executor_options()) if workers > 1 else None
+    try:
+        for target in targets:
+            _, changed = target.update(None, executor)
+            print(f"Watch [{target.name}]: {target.output_path} ({'written' if changed else 'unchanged'})")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if cache is not None:
+        cache.save()
+    _refresh_downstream(build, bundle_path, catalog_path)
+
+    watcher = open_watcher([target.source_dir for target in targets], polling)
+    print(f"Watching {len(targets)} source directories ({type(watcher).__name__}). Press Ctrl+C to stop.")
+    try:
+        while True:
+            changed = wait_for_batch(watcher, debounce)
+            started = time.perf_counter()
+            assets_written = False
+            for target in targets:
+                if not any(target.owns(path) for path in changed):
+                    continue
+                touched, written = target.update(changed)
+                if not touched:
+                    continue
+                assets_written = assets_written or written
+                names = ", ".join(sorted(os.path.basename(path) for path in touched)[:5])
+                print(f"Watch [{target.name}]: {len(touched)} file(s) ({names}) -> {target.output_path} "
+                      f"{'written' if written else 'unchanged'} in {time.perf_counter() - started:.2f}s")
+            if cache is not None:
+                cache.save()
+            if assets_written:
+                _refresh_downstream(build, bundle_path, catalog_path)
+    except KeyboardInterrupt:
+        print("\nWatch stopped.")
+    finally:
+        watcher.close()
+
+
+def _refresh_downstream(build, bundle_path: Optional[str], catalog_path: Optional[str]):
+    """Validates the changed assets, then repacks the bundle and the catalog if they are valid."""
+    if not build.validate(incremental=True):
+        print("Invalid assets: the bundle and the catalog were not updated.")
+        return
+    build.bundle(bundle_path)
+    build.catalog(catalog_path)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Streaming JSONL output of the analyzer, for collections too large to hold in memory.
+
+A stream file (<collection>_analysis.jsonl) starts with one header line and
+holds one line per validated book, appended (and flushed) as soon as the book
+is done:
+
+    {"collection_name": "...", "processed_folder": "...", "analysis_timestamp": "..."}
+    {"file": "0001.txt", "book_name": "...", "data": {...}}
+    ...
+
+Books arrive in completion order; finalize() assembles the usual
+`_analysis.json` document from a stream, ordering the books by file name the
+way a non-streaming run does. It keeps only a small index in memory and
+decodes one book at a time. A stream cut off by a crash can still be
+finalized: an incomplete last line is skipped.
+
+orjson is used for the compact lines when it is installed, the json module otherwise.
+
+Usage: python result_stream.py STREAM_FILE [OUTPUT_FILE]
+"""
+
+import os
+import sys
+import json
+import logging
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple
+
+try:
+    import orjson # Optional, faster serializer
+except ImportError:
+    orjson = None
+
+
+def dumps_line(obj: Any) -> bytes:
+    """Serializes obj compactly as one line of UTF-8 JSON (newline included)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def loads_line(line: bytes) -> Any:
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def stream_path(output_path: str) -> str:
+    """The stream file of an output file: '<name>_analysis.json' -> '<name>_analysis.jsonl'."""
+    return os.path.splitext(output_path)[0] + ".jsonl"
+
+
+class ResultStreamWriter:
+    """Appends validated books to a stream file, one flushed line each."""
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        self.path = path
+        self.books = 0
+        self._file: BinaryIO = open(path, 'wb')
+        self._file.write(dumps_line(header))
+        self._file.flush()
+
+    def write_book(self, filename: str, book_name: str, structured_data: Dict[str, Any]):
+        self._file.write(dumps_line({"file": filename, "book_name": book_name, "data": structured_data}))
+        self._file.flush() # A crash loses at most the book being written
+        self.books += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "ResultStreamWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _iter_lines(f: BinaryIO) -> Iterator[Tuple[int, Any]]:
+    """Yields (byte offset, decoded line), skipping a truncated or corrupt line with a warning."""
+    offset = f.tell()
+    for line in f:
+        try:
+            yield offset, loads_line(line)
+        except ValueError:
+            logging.warning(f"'{f.name}': Skipping incomplete line at byte {offset}.")
+        offset += len(line)
+
+
+def _index_stream(f: BinaryIO) -> List[Tuple[str, int]]:
+    """
+    Returns (book name, offset) per book in output order: books sorted by file
+    name, and a repeated book name keeping its first position but the last
+    file's data, as when results are merged into a dict.
+    """
+    entries = sorted(((entry["file"], entry["book_name"], offset) for offset, entry in _iter_lines(f)),
+                     key=lambda e: e[0])
+    positions: Dict[str, int] = {}
+    order: List[Tuple[str, int]] = []
+    for _, book_name, offset in entries:
+        if book_name in positions:
+            order[positions[book_name]] = (book_name, offset)
+        else:
+            positions[book_name] = len(order)
+            order.append((book_name, offset))
+    return order
+
+
+def _indented(value: Any, level: int) -> str:
+    """json.dumps(value, indent=4) for a value nested `level` levels deep in an indent=4 document."""
+    return json.dumps(value, ensure_ascii=False, indent=4).replace("\n", "\n" + "    " * level)
+
+
+def finalize(stream_file: str, output_path: str) -> int:
+    """
+    Writes the `_analysis.json` document of a stream, byte-identical to the
+    document a non-streaming run writes. Returns the number of books (0 if the
+    stream has none, in which case nothing is written).
+    """
+    with open(stream_file, 'rb') as f:
+        header = loads_line(f.readline())
+        order = _index_stream(f)
+        if not order:
+            logging.warning(f"'{stream_file}': No books to finalize.")
+            return 0
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write("{\n")
+            out.write(f'    "collection_name": {_indented(header.get("collection_name"), 1)},\n')
+            out.write(f'    "processed_folder": {_indented(header.get("processed_folder"), 1)},\n')
+            out.write('    "books_data": {')
+            for i, (book_name, offset) in enumerate(order):
+                f.seek(offset)
+                data = loads_line(f.readline())["data"]
+                out.write(f'{"," if i else ""}\n        {_indented(book_name, 2)}: {_indented(data, 2)}')
+            out.write("\n    },\n")
+            out.write(f'    "analysis_timestamp": {_indented(header.get("analysis_timestamp"), 1)}\n')
+            out.write("}")
+        os.replace(tmp_path, output_path)
+    return len(order)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    output = args[1] if len(args) > 1 else os.path.splitext(args[0])[0] + ".json"
+    books = finalize(args[0], output)
+    if books:
+        print(f"{output}: {books} books")
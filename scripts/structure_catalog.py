@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Normalized SQLite catalog of all structure assets.
+
+Every *.json of the assets directory (tanach, mishna, shas, yerushalmi,
+rambam, halakha, ...) is loaded into one database, with the per-book
+aggregates of asset_aggregates.py:
+
+    categories      (id, name, content_type, source_file, position, unit_count, amud_count)
+    subcategories   (id, category_id, name, content_type, position, unit_count, unit_offset, amud_count, amud_offset)
+    books           (id, subcategory_id, name, position, pages, start_unit, end_unit, half_daf_at_end,
+                     first_amud, last_amud, unit_count, unit_offset, amud_count, amud_offset)
+    parts           (id, book_id, name, position, start_unit, end_unit, unit_count, unit_offset, amud_count, amud_offset)
+    excluded_units  (book_id, part_id, unit)     -- part_id is NULL for a book-level 'exclude' (kept as
+                                                    written; the app and the aggregates ignore it)
+    excluded_amudim (book_id, amud)              -- integer amud codes (amud.py)
+    catalog_info    (key, value)                 -- format version and source fingerprint
+
+`position` is the 0-based order within the parent, as in the JSON. start_unit
+and end_unit are the resolved page range (daf-type books start at 2); books
+with parts have them on their parts. first_amud and last_amud are the
+integer amud range of daf-type books that carry it (NULL otherwise). Names and (parent, position) pairs are
+indexed. The rows are inserted in bulk inside one transaction into a
+temporary file, and the indexes are created after the data, so a reader
+never sees a half-built catalog. An unchanged set of assets is not rebuilt.
+
+Usage: python structure_catalog.py [ASSETS_DIR] [DATABASE]
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+from typing import Any, Dict, List, Tuple
+
+from asset_aggregates import annotate_category, book_parts
+
+CATALOG_FILENAME = "structure_catalog.sqlite"
+CATALOG_FORMAT_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE catalog_info (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE categories (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, content_type TEXT, source_file TEXT NOT NULL,
+    position INTEGER NOT NULL, unit_count INTEGER, amud_count INTEGER
+);
+CREATE TABLE subcategories (
+    id INTEGER PRIMARY KEY, category_id INTEGER NOT NULL REFERENCES categories(id), name TEXT NOT NULL,
+    content_type TEXT, position INTEGER NOT NULL,
+    unit_count INTEGER, unit_offset INTEGER, amud_count INTEGER, amud_offset INTEGER
+);
+CREATE TABLE books (
+    id INTEGER PRIMARY KEY, subcategory_id INTEGER NOT NULL REFERENCES subcategories(id), name TEXT NOT NULL,
+    position INTEGER NOT NULL, pages REAL, start_unit INTEGER, end_unit INTEGER, half_daf_at_end INTEGER NOT NULL,
+    first_amud INTEGER, last_amud INTEGER, unit_count INTEGER, unit_offset INTEGER, amud_count INTEGER, amud_offset INTEGER
+);
+CREATE TABLE parts (
+    id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL REFERENCES books(id), name TEXT, position INTEGER NOT NULL,
+    start_unit INTEGER, end_unit INTEGER, unit_count INTEGER, unit_offset INTEGER, amud_count INTEGER, amud_offset INTEGER
+);
+CREATE TABLE excluded_units (
+    book_id INTEGER NOT NULL REFERENCES books(id), part_id INTEGER REFERENCES parts(id), unit INTEGER NOT NULL
+);
+CREATE TABLE excluded_amudim (
+    book_id INTEGER NOT NULL REFERENCES books(id), amud INTEGER NOT NULL
+);
+"""
+
+# Created after the bulk insert
+INDEXES = """
+CREATE INDEX idx_categories_name ON categories(name);
+CREATE UNIQUE INDEX idx_categories_position ON categories(position);
+CREATE INDEX idx_subcategories_name ON subcategories(name);
+CREATE UNIQUE INDEX idx_subcategories_position ON subcategories(category_id, position);
+CREATE INDEX idx_books_name ON books(name);
+CREATE UNIQUE INDEX idx_books_position ON books(subcategory_id, position);
+CREATE INDEX idx_parts_name ON parts(name);
+CREATE UNIQUE INDEX idx_parts_position ON parts(book_id, position);
+CREATE INDEX idx_excluded_units_book ON excluded_units(book_id, part_id);
+CREATE INDEX idx_excluded_amudim_book ON excluded_amudim(book_id);
+"""
+
+
+def _aggregates(node: Dict[str, Any]) -> Tuple:
+    return node.get("unit_count"), node.get("unit_offset"), node.get("amud_count"), node.get("amud_offset")
+
+
+class _Rows:
+    """Row lists of every table, with ids assigned up front so no insert needs a lastrowid round trip."""
+
+    def __init__(self):
+        self.categories: List[Tuple] = []
+        self.subcategories: List[Tuple] = []
+        self.books: List[Tuple] = []
+        self.parts: List[Tuple] = []
+        self.excluded_units: List[Tuple] = []
+        self.excluded_amudim: List[Tuple] = []
+
+    def add_category(self, filename: str, data: Dict[str, Any]):
+        annotate_category(data)
+        category_id = len(self.categories) + 1
+        self.categories.append((category_id, data.get("name"), data.get("content_type"), filename,
+                                category_id - 1, data.get("unit_count"), data.get("amud_count")))
+        for sub_position, subcategory in enumerate(data.get("subcategories", [])):
+            subcategory_id = len(self.subcategories) + 1
+            content_type = subcategory.get("content_type", data.get("content_type"))
+            self.subcategories.append((subcategory_id, category_id, subcategory.get("name"), content_type,
+                                       sub_position) + _aggregates(subcategory))
+            for book_position, (book_name, book_info) in enumerate(subcategory.get("books", {}).items()):
+                self._add_book(subcategory_id, book_position, book_name, book_info, content_type)
+
+    def _add_book(self, subcategory_id: int, position: int, name: str, book_info: Dict[str, Any], content_type: str):
+        book_id = len(self.books) + 1
+        ranges = book_parts(book_info, content_type)
+        if "parts" in book_info:
+            self.books.append((book_id, subcategory_id, name, position, None, None, None, 0, None, None)
+                              + _aggregates(book_info))
+            for part_position, (part, start, end, excluded, _) in enumerate(ranges):
+                part_id = len(self.parts) + 1
+                self.parts.append((part_id, book_id, part.get("name"), part_position, start, end) + _aggregates(part))
+                self.excluded_units.extend((book_id, part_id, unit) for unit in excluded)
+            return
+        start, end, _, half_daf = ranges[0][1:] if ranges else (None, None, [], False)
+        self.books.append((book_id, subcategory_id, name, position, book_info.get("pages"), start, end, int(half_daf),
+                           book_info.get("first_amud"), book_info.get("last_amud")) + _aggregates(book_info))
+        self.excluded_units.extend((book_id, None, unit) for unit in book_info.get("exclude", []))
+        self.excluded_amudim.extend((book_id, amud) for amud in book_info.get("exclude_amudim", []))
+
+
+def _asset_files(assets_dir: str) -> List[str]:
+    return sorted(filename for filename in os.listdir(assets_dir) if filename.endswith(".json"))
+
+
+def _fingerprint(assets_dir: str, filenames: List[str]) -> str:
+    digest = hashlib.sha256(f"catalog-v{CATALOG_FORMAT_VERSION}".encode())
+    for filename in filenames:
+        digest.update(filename.encode('utf-8') + b'\0')
+        with open(os.path.join(assets_dir, filename), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _stored_fingerprint(db_path: str) -> str:
+    try:
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+            row = conn.execute("SELECT value FROM catalog_info WHERE key = 'fingerprint'").fetchone()
+        return row[0] if row else ""
+    except sqlite3.Error:
+        return ""
+
+
+def write_catalog(assets_dir: str, db_path: str) -> bool:
+    """Builds the catalog of every asset of assets_dir. Returns True if the database was (re)written."""
+    filenames = _asset_files(assets_dir)
+    fingerprint = _fingerprint(assets_dir, filenames)
+    if os.path.exists(db_path) and _stored_fingerprint(db_path) == fingerprint:
+        return False
+
+    rows = _Rows()
+    for filename in filenames:
+        with open(os.path.join(assets_dir, filename), 'r', encoding='utf-8') as f:
+            rows.add_category(filename, json.load(f))
+
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF") # A temporary file: no rollback journal needed
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+        with conn: # One transaction for all inserts
+            conn.executemany("INSERT INTO catalog_info VALUES (?, ?)",
+                             [("format_version", str(CATALOG_FORMAT_VERSION)), ("fingerprint", fingerprint)])
+            conn.executemany("INSERT INTO categories VALUES (?, ?, ?, ?, ?, ?, ?)", rows.categories)
+            conn.executemany("INSERT INTO subcategories VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows.subcategories)
+            conn.executemany("INSERT INTO books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows.books)
+            conn.executemany("INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows.parts)
+            conn.executemany("INSERT INTO excluded_units VALUES (?, ?, ?)", rows.excluded_units)
+            conn.executemany("INSERT INTO excluded_amudim VALUES (?, ?)", rows.excluded_amudim)
+        conn.executescript(INDEXES)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return True
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    args = sys.argv[1:]
+    assets_dir = args[0] if args else os.path.join(script_dir, "..", "src", "assets", "data")
+    db_path = args[1] if len(args) > 1 else os.path.join(script_dir, "build", CATALOG_FILENAME)
+    changed = write_catalog(assets_dir, db_path)
+    print(f"{db_path} ({'written' if changed else 'unchanged'})")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Structural diff and patch of analysis results (`_analysis.json`) and structure
+assets (shas.json, ...).
+
+Every document is hashed as a Merkle tree: a leaf (number, string, plain list
+such as `exclude` or `missing_divisions`) is hashed from its JSON, and an
+object from its keys and child hashes, in order. Lists of named objects
+(subcategories, parts) are treated like objects keyed by name. Two
+documents are diffed top-down, and a subtree with equal hashes on both sides
+is skipped without looking inside, so unchanged categories, books and parts
+cost one comparison each.
+
+The result is a compact changeset:
+
+    {"format": "structure-changeset", "version": 1, "base": "<root hash>", "target": "<root hash>",
+     "changes": [
+        {"op": "replace", "path": ["subcategories", "סדר מועד", "books", "שבת", "pages"], "old": 156, "value": 157},
+        {"op": "add", "path": [..., "books", "ברכות"], "after": null, "value": {...}},
+        {"op": "remove", "path": [..., "books", "X"]},
+        {"op": "reorder", "path": [..., "books"], "order": ["..."]}]}
+
+A path lists object keys and, inside named lists, item names. "after" is the
+key/name the added entry follows (null: first). apply_changeset() patches a
+document with it, checking the base hash before and the target hash after,
+so a consolidated asset can be updated without a full rebuild.
+
+The hash tree of a file can be saved next to it (<file>.hashes.json) so a
+later diff against it does not have to re-hash the old side.
+
+Usage:
+    python structure_diff.py diff OLD NEW [--output CHANGESET] [--save-hashes]
+    python structure_diff.py apply TARGET CHANGESET [--output PATH]
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from asset_io import write_json_if_changed
+
+CHANGESET_FORMAT = "structure-changeset"
+CHANGESET_FORMAT_VERSION = 1
+HASHES_SUFFIX = ".hashes.json"
+
+
+class HashNode:
+    """Digest of a subtree, with the child nodes of objects and named lists."""
+
+    __slots__ = ("digest", "children")
+
+    def __init__(self, digest: str, children: Optional[Dict[str, "HashNode"]] = None):
+        self.digest = digest
+        self.children = children
+
+    def to_json(self) -> Dict[str, Any]:
+        if self.children is None:
+            return {"h": self.digest}
+        return {"h": self.digest, "c": {key: child.to_json() for key, child in self.children.items()}}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "HashNode":
+        children = data.get("c")
+        return cls(data["h"], None if children is None else {key: cls.from_json(c) for key, c in children.items()})
+
+
+def _is_named_list(value: Any) -> bool:
+    """A list of objects that all have a distinct 'name' (subcategories, parts)."""
+    if not value or not isinstance(value, list) or not all(isinstance(item, dict) and "name" in item for item in value):
+        return False
+    return len({item["name"] for item in value}) == len(value)
+
+
+def _entries(value: Any) -> Optional[Dict[str, Any]]:
+    """The keyed children of a container (objects and named lists), or None for a leaf."""
+    if isinstance(value, dict):
+        return value
+    if _is_named_list(value):
+        return {item["name"]: item for item in value}
+    return None
+
+
+def hash_tree(value: Any) -> HashNode:
+    entries = _entries(value)
+    if entries is None:
+        encoded = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        return HashNode(hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest())
+    digest = hashlib.blake2b(b"L" if isinstance(value, list) else b"D", digest_size=16)
+    children = {}
+    for key, child in entries.items():
+        node = children[key] = hash_tree(child)
+        digest.update(json.dumps(key, ensure_ascii=False).encode('utf-8'))
+        digest.update(node.digest.encode('ascii'))
+    return HashNode(digest.hexdigest(), children)
+
+
+# --- Persisted hash trees ---
+
+def _file_stamp(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def save_hashes(path: str, tree: HashNode):
+    """Writes the hash tree of `path` next to it, stamped with the file's size and mtime."""
+    with open(path + HASHES_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump({"stamp": _file_stamp(path), "tree": tree.to_json()}, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_hashes(path: str) -> Optional[HashNode]:
+    """The saved hash tree of `path`, or None if there is none or the file changed since."""
+    try:
+        with open(path + HASHES_SUFFIX, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get("stamp") != _file_stamp(path):
+            return None
+        return HashNode.from_json(saved["tree"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# --- Diff ---
+
+def _diff(old: Any, new: Any, old_node: HashNode, new_node: HashNode, path: List[Any], changes: List[Dict[str, Any]]):
+    if old_node.digest == new_node.digest:
+        return # Identical subtree
+    old_entries, new_entries = _entries(old), _entries(new)
+    if (old_entries is None or new_entries is None or isinstance(old, list) != isinstance(new, list)
+            or old_node.children is None or new_node.children is None):
+        changes.append({"op": "replace", "path": path, "old": old, "value": new})
+        return
+    for key in old_entries:
+        if key not in new_entries:
+            changes.append({"op": "remove", "path": path + [key]})
+    previous = None
+    for key, value in new_entries.items():
+        if key not in old_entries:
+            changes.append({"op": "add", "path": path + [key], "after": previous, "value": value})
+        else:
+            _diff(old_entries[key], value, old_node.children[key], new_node.children[key], path + [key], changes)
+        previous = key
+    kept_old_order = [key for key in old_entries if key in new_entries]
+    kept_new_order = [key for key in new_entries if key in old_entries]
+    if kept_old_order != kept_new_order:
+        changes.append({"op": "reorder", "path": path, "order": list(new_entries)})
+
+
+def diff(old: Any, new: Any, old_tree: Optional[HashNode] = None, new_tree: Optional[HashNode] = None) -> Dict[str, Any]:
+    """Returns the changeset turning `old` into `new` (hash trees are computed if not given)."""
+    old_tree = old_tree or hash_tree(old)
+    new_tree = new_tree or hash_tree(new)
+    changes: List[Dict[str, Any]] = []
+    _diff(old, new, old_tree, new_tree, [], changes)
+    return {"format": CHANGESET_FORMAT, "version": CHANGESET_FORMAT_VERSION,
+            "base": old_tree.digest, "target": new_tree.digest, "changes": changes}
+
+
+# --- Apply ---
+
+def _child(container: Any, key: Any) -> Any:
+    if isinstance(container, list):
+        return next(item for item in container if item.get("name") == key)
+    return container[key]
+
+
+def _resolve(document: Any, path: List[Any]) -> Any:
+    node = document
+    for key in path:
+        node = _child(node, key)
+    return node
+
+
+def _insert_after(container: Any, key: Any, value: Any, after: Any):
+    """Inserts a dict entry or named list item right after `after` (first if None), in place."""
+    if isinstance(container, list):
+        index = 0 if after is None else next(i for i, item in enumerate(container) if item.get("name") == after) + 1
+        container.insert(index, value)
+        return
+    items = list(container.items())
+    index = 0 if after is None else next(i for i, (k, _) in enumerate(items) if k == after) + 1
+    items.insert(index, (key, value))
+    container.clear()
+    container.update(items)
+
+
+def apply_changeset(document: Any, changeset: Dict[str, Any], verify: bool = True) -> Any:
+    """
+    Applies a changeset in place (a replacement of the root is returned) and
+    returns the patched document. With verify, the document must hash to the
+    changeset's base before and to its target after, otherwise ValueError.
+    """
+    if changeset.get("format") != CHANGESET_FORMAT or changeset.get("version") != CHANGESET_FORMAT_VERSION:
+        raise ValueError(f"Not a version {CHANGESET_FORMAT_VERSION} structure changeset.")
+    if verify and hash_tree(document).digest != changeset["base"]:
+        raise ValueError("The document is not the version the changeset was made from.")
+    for change in changeset["changes"]:
+        op, path = change["op"], change["path"]
+        if op == "replace" and not path:
+            document = change["value"]
+            continue
+        parent = _resolve(document, path[:-1]) if path else None
+        if op == "replace":
+            if isinstance(parent, list):
+                index = next(i for i, item in enumerate(parent) if item.get("name") == path[-1])
+                parent[index] = change["value"]
+            else:
+                parent[path[-1]] = change["value"]
+        elif op == "add":
+            _insert_after(parent, path[-1], change["value"], change["after"])
+        elif op == "remove":
+            if isinstance(parent, list):
+                parent.remove(_child(parent, path[-1]))
+            else:
+                del parent[path[-1]]
+        elif op == "reorder":
+            container = _resolve(document, path)
+            if isinstance(container, list):
+                position = {name: i for i, name in enumerate(change["order"])}
+                container.sort(key=lambda item: position[item["name"]])
+            else:
+                items = [(key, container[key]) for key in change["order"]]
+                container.clear()
+                container.update(items)
+        else:
+            raise ValueError(f"Unknown changeset operation '{op}'.")
+    if verify and hash_tree(document).digest != changeset["target"]:
+        raise ValueError("The patched document does not match the changeset's target.")
+    return document
+
+
+# --- Reporting ---
+
+def _book_of(path: List[Any]) -> Tuple[Optional[str], List[Any]]:
+    """Splits a path into the book it belongs to ('subcategory / book' for assets) and the rest."""
+    for i, key in enumerate(path):
+        if key in ("books_data", "books") and i + 1 < len(path):
+            prefix = [path[i - 1]] if key == "books" and i >= 1 else []
+            return " / ".join(str(part) for part in prefix + [path[i + 1]]), path[i + 2:]
+    return None, path
+
+
+def summarize(changeset: Dict[str, Any]) -> str:
+    """Added, removed and changed books, with the changed fields of each changed book."""
+    added, removed, changed, other = [], [], {}, []
+    for change in changeset["changes"]:
+        book, rest = _book_of(change["path"])
+        if book is None:
+            other.append(change)
+        elif not rest and change["op"] == "add":
+            added.append(book)
+        elif not rest and change["op"] == "remove":
+            removed.append(book)
+        else:
+            changed.setdefault(book, []).append((change, rest))
+    lines = [f"{len(added)} added, {len(removed)} removed, {len(changed)} changed books."]
+    lines += [f"+ {book}" for book in added]
+    lines += [f"- {book}" for book in removed]
+    for book, book_changes in changed.items():
+        lines.append(f"~ {book}")
+        for change, rest in book_changes:
+            field = " / ".join(str(key) for key in rest) or "(book)"
+            if change["op"] == "replace":
+                old, new = (json.dumps(change[key], ensure_ascii=False) for key in ("old", "value"))
+                lines.append(f"    {field}: {old[:80]} -> {new[:80]}")
+            else:
+                lines.append(f"    {field}: {change['op']}")
+    for change in other:
+        lines.append(f"* {' / '.join(str(key) for key in change['path']) or '(root)'}: {change['op']}")
+    return "\n".join(lines)
+
+
+def _detect_indent(text: str) -> int:
+    """The indent width of a pretty-printed JSON document (2 if it is minified)."""
+    for line in text.splitlines()[1:]:
+        stripped = line.lstrip(" ")
+        if stripped and len(stripped) != len(line):
+            return len(line) - len(stripped)
+    return 2
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Structural diff and patch of analysis files and assets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    diff_parser = commands.add_parser("diff", help="Diff two versions of a file.")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    diff_parser.add_argument("--output", help="Write the changeset to this file.")
+    diff_parser.add_argument("--save-hashes", action="store_true",
+                             help=f"Save the hash tree of NEW as NEW{HASHES_SUFFIX}, for the next diff.")
+    apply_parser = commands.add_parser("apply", help="Patch a file with a changeset.")
+    apply_parser.add_argument("target")
+    apply_parser.add_argument("changeset")
+    apply_parser.add_argument("--output", help="Write the patched file here (default: in place).")
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        with open(args.old, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        new_tree = hash_tree(new)
+        changeset = diff(old, new, load_hashes(args.old), new_tree)
+        print(summarize(changeset))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(changeset, f, ensure_ascii=False, separators=(',', ':'))
+        if args.save_hashes:
+            save_hashes(args.new, new_tree)
+    else:
+        with open(args.target, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with open(args.changeset, 'r', encoding='utf-8') as f:
+            changeset = json.load(f)
+        try:
+            patched = apply_changeset(json.loads(text), changeset)
+        except ValueError as e:
+            print(f"Cannot apply '{args.changeset}': {e}")
+            sys.exit(1)
+        output = args.output or args.target
+        changed = write_json_if_changed(output, patched, indent=_detect_indent(text))
+        print(f"{output} ({'written' if changed else 'unchanged'}, {len(changeset['changes'])} changes)")
+
+
+if __name__ == "__main__":
+    main()
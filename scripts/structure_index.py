@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent keyed index over the structure metadata table built by code.py.
+
+The key of a row is (category, subcategory, book, part_name); part_name is
+None for rows describing a whole book. The index maps every key prefix of
+length 1-4 to the row ranges holding it. iter_blocks emits the rows grouped
+category by category, subcategory by subcategory and book by book, so each
+prefix is almost always one contiguous range. Point lookups and prefix
+queries are dictionary lookups that return zero-copy slices of the table, so
+no query scans it.
+
+The index is saved as JSON next to the dataset:
+
+    {"format": "structure-index", "version": 1, "rows": 282,
+     "prefixes": [[["הלכה"], [[0, 20]]], [["הלכה", "ארבע טורים"], [[0, 4]]], ...]}
+
+Usage: python structure_index.py PARQUET_DIR CATEGORY [SUBCATEGORY [BOOK [PART]]]
+"""
+
+import os
+import sys
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+INDEX_FORMAT = "structure-index"
+INDEX_FORMAT_VERSION = 1
+INDEX_FILENAME = "structure_index.json"
+KEY_COLUMNS = ('category', 'subcategory', 'book', 'part_name')
+
+Key = Tuple[Optional[str], ...]
+Ranges = List[List[int]] # [[start, stop], ...]
+
+
+class StructureIndex:
+    """Keyed access to the rows of a metadata table (see the module docstring)."""
+
+    def __init__(self, table: pa.Table, prefixes: Dict[Key, Ranges]):
+        self.table = table
+        self.prefixes = prefixes
+
+    @classmethod
+    def build(cls, table: pa.Table) -> "StructureIndex":
+        """Indexes every key prefix of the table in one pass over the key columns."""
+        prefixes: Dict[Key, Ranges] = {}
+        columns = [table.column(name).to_pylist() for name in KEY_COLUMNS]
+        for row, key in enumerate(zip(*columns)):
+            for length in range(1, len(KEY_COLUMNS) + 1):
+                ranges = prefixes.setdefault(key[:length], [])
+                if ranges and ranges[-1][1] == row:
+                    ranges[-1][1] = row + 1 # Extends the current run
+                else:
+                    ranges.append([row, row + 1])
+        return cls(table, prefixes)
+
+    @classmethod
+    def load(cls, path: str, table: pa.Table) -> "StructureIndex":
+        """Loads a saved index for `table`, refusing an index of a different table."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("format") != INDEX_FORMAT or data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not a version {INDEX_FORMAT_VERSION} structure index.")
+        if data["rows"] != table.num_rows:
+            raise ValueError(f"'{path}' indexes {data['rows']} rows, but the table has {table.num_rows}; rebuild it.")
+        return cls(table, {tuple(key): ranges for key, ranges in data["prefixes"]})
+
+    def save(self, path: str):
+        data = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_FORMAT_VERSION,
+            "rows": self.table.num_rows,
+            "prefixes": [[list(key), ranges] for key, ranges in self.prefixes.items()],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _slice(self, ranges: Ranges) -> pa.Table:
+        if len(ranges) == 1:
+            start, stop = ranges[0]
+            return self.table.slice(start, stop - start)
+        return pa.concat_tables([self.table.slice(start, stop - start) for start, stop in ranges])
+
+    def lookup(self, category: str, subcategory: str, book: str, part_name: Optional[str] = None) -> Optional[pa.Table]:
+        """The row of one book (part_name None) or book part, as a one-row slice, or None."""
+        ranges = self.prefixes.get((category, subcategory, book, part_name))
+        return self._slice(ranges) if ranges else None
+
+    def prefix(self, *components: Optional[str]) -> Optional[pa.Table]:
+        """
+        All rows under a key prefix, e.g. prefix('משנה', 'סדר נזיקין') for every
+        book of the order. Returns None for an unknown prefix.
+        """
+        if not 1 <= len(components) <= len(KEY_COLUMNS):
+            raise ValueError(f"A prefix has 1 to {len(KEY_COLUMNS)} components, got {len(components)}.")
+        ranges = self.prefixes.get(tuple(components))
+        return self._slice(ranges) if ranges else None
+
+    def lookup_many(self, keys: Iterable[Sequence[Optional[str]]]) -> List[Optional[pa.Table]]:
+        """Resolves many (category, subcategory, book[, part_name]) references."""
+        return [self.lookup(*key) for key in keys]
+
+
+def read_parquet_shards(directory: str) -> pa.Table:
+    """Reads code.py's part-*.parquet shards in shard order, i.e. in the row order the index refers to."""
+    shards = sorted(name for name in os.listdir(directory) if name.startswith('part-') and name.endswith('.parquet'))
+    return pa.concat_tables([pq.read_table(os.path.join(directory, name)) for name in shards])
+
+
+def open_parquet_index(directory: str) -> StructureIndex:
+    """Opens the shards and the saved index of a Parquet metadata directory."""
+    return StructureIndex.load(os.path.join(directory, INDEX_FILENAME), read_parquet_shards(directory))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(1)
+    index = open_parquet_index(args[0])
+    result = index.prefix(*args[1:])
+    if result is None:
+        print("No matching rows.")
+    else:
+        for record in result.to_pylist():
+            print(record)
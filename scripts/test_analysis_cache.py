@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the persistent analysis cache with the analyzer.
+
+Usage: python test_analysis_cache.py   (or: pytest test_analysis_cache.py)
+"""
+
+import os
+import logging
+import tempfile
+import unittest
+
+from analysis_cache import AnalysisCache, config_fingerprint
+from chaper_numbering_script import AnalysisRunner, analyzer_config
+
+# A book without an H1, so it is named after its file
+NAMELESS_BOOK = "".join(f"<h2>פרק {numeral}</h2>\nטקסט\n" for numeral in ("א", "ב", "ג", "ד"))
+
+
+class AnalysisCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp.name, "books")
+        os.makedirs(self.input_dir)
+        self.cache_path = os.path.join(self.tmp.name, "cache.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def _write(self, filename: str, content: str):
+        with open(os.path.join(self.input_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def _run(self) -> AnalysisRunner:
+        cache = AnalysisCache(self.cache_path, config_fingerprint(analyzer_config()))
+        runner = AnalysisRunner(self.input_dir, cache=cache, output_dir=self.tmp.name, write_output=False)
+        runner.run_analysis()
+        return runner
+
+    def test_identical_nameless_files_keep_their_names(self):
+        self._write("one.txt", NAMELESS_BOOK)
+        self._write("two.txt", NAMELESS_BOOK)
+        self.assertEqual(sorted(self._run().results), ["one", "two"])
+
+        os.rename(os.path.join(self.input_dir, "two.txt"), os.path.join(self.input_dir, "three.txt"))
+        runner = self._run()
+        self.assertEqual(sorted(runner.results), ["one", "three"])
+        self.assertEqual(runner.cache.hits, 1) # one.txt only
+
+    def test_unchanged_file_is_a_hit(self):
+        self._write("one.txt", NAMELESS_BOOK)
+        first = self._run().results
+        runner = self._run()
+        self.assertEqual(runner.cache.hits, 1)
+        self.assertEqual(runner.results, first)
+
+
+if __name__ == "__main__":
+    unittest.main()
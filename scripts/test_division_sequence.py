@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the bitmap sequence check of division identifiers.
+
+Usage: python test_division_sequence.py   (or: pytest test_division_sequence.py)
+"""
+
+import unittest
+
+from division_sequence import check_sequence, count_missing, expand_missing
+from gematria import hebrew_numeral_to_int
+
+
+class CheckSequenceTest(unittest.TestCase):
+
+    def test_complete_sequence(self):
+        report = check_sequence(range(1, 151), 150)
+        self.assertEqual(report, {"missing": [], "duplicates": [], "out_of_order": [], "out_of_range": []})
+
+    def test_missing_duplicates_and_order(self):
+        report = check_sequence([1, 2, 2, 4, 3, 0, 11], 11)
+        self.assertEqual(report["missing"], [[5, 10]])
+        self.assertEqual(report["duplicates"], [2])
+        self.assertEqual(report["out_of_order"], [3])
+        self.assertEqual(report["out_of_range"], [])
+        self.assertEqual(count_missing(report["missing"]), 6)
+        self.assertEqual(expand_missing(report["missing"]), [5, 6, 7, 8, 9, 10])
+
+    def test_stray_identifier_above_the_last_is_reported(self):
+        stray = hebrew_numeral_to_int("רנ")
+        numbers = list(range(1, 76)) + [stray] + list(range(76, 151))
+        report = check_sequence(numbers, 150)
+        self.assertEqual(report["out_of_range"], [250])
+        self.assertEqual(report["missing"], [])
+        self.assertEqual(report["duplicates"], [])
+
+    def test_identifier_below_the_first_is_reported(self):
+        report = check_sequence([3, 4, 5, 6], 6, expected_min=4)
+        self.assertEqual(report["out_of_range"], [3])
+        self.assertEqual(report["missing"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Exhaustive equivalence test of gematria.py against the original converter.
+
+baseline_hebrew_numeral_to_int is hebrew_numeral_to_int exactly as it stood in
+chaper_numbering_script.py before the table-driven module replaced it.
+
+Usage: python test_gematria.py   (or: pytest test_gematria.py)
+"""
+
+import itertools
+import logging
+import unittest
+
+from gematria import (GEMATRIA_VALUES, NON_NUMERIC_WORDS, NUMERAL_TABLE, NUMERAL_TABLE_MAX,
+                      hebrew_numeral_to_int, int_to_hebrew, numerals_to_ints)
+
+
+def baseline_hebrew_numeral_to_int(hebrew_num: str) -> int:
+    """Converts a Hebrew numeral string (Gematria) to an integer."""
+    if not isinstance(hebrew_num, str) or not hebrew_num:
+        return 0
+    hebrew_num = hebrew_num.replace("'", "").replace('"', '').strip()
+    hebrew_num = hebrew_num.replace("תר", "ת" + "ר") # Simplistic high value handling
+
+    gematria_map = {
+        'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
+        'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
+        'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400
+    }
+
+    value, base = 0, hebrew_num
+    # Check suffixes first
+    if hebrew_num.endswith('טז'): base, value = hebrew_num[:-2], 16
+    elif hebrew_num.endswith('טו'): base, value = hebrew_num[:-2], 15
+
+    try:
+        current_val = 0
+        for char in base:
+            digit_val = gematria_map.get(char)
+            if digit_val is None:
+                # Common non-numeric words
+                if any(word in hebrew_num for word in ["הקדמה", "פתיחה", "מבוא", "סוף", "תוכן"]):
+                    return 0
+                logging.debug(f"Gematria: Invalid char '{char}' in '{hebrew_num}'. Non-numeric.")
+                return 0 # Treat as non-numeric identifier
+            current_val += digit_val
+
+        total_value = current_val + value
+        # Heuristic check for long strings with low value (likely not gematria)
+        if len(base) > 3 and total_value < 10 and value == 0:
+             logging.debug(f"Gematria: Input '{hebrew_num}' heuristic suggests not numeral. Treating as non-numeric.")
+             return 0
+
+        return total_value if total_value > 0 else 0
+    except Exception as e:
+        logging.error(f"Gematria conversion error for '{hebrew_num}': {e}")
+        return 0
+
+
+def candidate_strings() -> list:
+    """Every table numeral (plain and punctuated), every string of up to three letters,
+    quotes and spaces, known non-numeric words and a few malformed inputs."""
+    alphabet = "".join(GEMATRIA_VALUES) + "'\" "
+    candidates = set(NUMERAL_TABLE)
+    candidates.update(int_to_hebrew(n, punctuate=True) for n in range(1, NUMERAL_TABLE_MAX + 1))
+    for length in range(1, 4):
+        candidates.update("".join(chars) for chars in itertools.product(alphabet, repeat=length))
+    candidates.update(NON_NUMERIC_WORDS)
+    candidates.update(f"{word} {int_to_hebrew(n)}" for word in NON_NUMERIC_WORDS for n in (1, 15, 697))
+    candidates.update(["", " טו ", " טז", "אאאא", "בבבבב", "אאאטו", "תתתק", "abc", "פרק א", "ב.", "ב:", "1"])
+    return sorted(candidates)
+
+
+class GematriaEquivalenceTest(unittest.TestCase):
+
+    def test_table_matches_baseline(self):
+        for numeral, value in NUMERAL_TABLE.items():
+            self.assertEqual(baseline_hebrew_numeral_to_int(numeral), value, numeral)
+
+    def test_scalar_matches_baseline(self):
+        for candidate in candidate_strings():
+            self.assertEqual(hebrew_numeral_to_int(candidate), baseline_hebrew_numeral_to_int(candidate), repr(candidate))
+
+    def test_batch_matches_baseline(self):
+        candidates = candidate_strings()
+        expected = [baseline_hebrew_numeral_to_int(candidate) for candidate in candidates]
+        self.assertEqual(numerals_to_ints(candidates), expected)
+        self.assertEqual(numerals_to_ints(candidates + candidates), expected + expected) # Repeated identifiers
+
+    def test_non_string_inputs(self):
+        for value in (None, 5, b"\xd7\x90", ["א"]):
+            self.assertEqual(hebrew_numeral_to_int(value), baseline_hebrew_numeral_to_int(value))
+
+    def test_round_trip(self):
+        for n in range(1, NUMERAL_TABLE_MAX + 1):
+            self.assertEqual(hebrew_numeral_to_int(int_to_hebrew(n)), n)
+            self.assertEqual(hebrew_numeral_to_int(int_to_hebrew(n, punctuate=True)), n)
+        self.assertEqual(int_to_hebrew(15), "טו")
+        self.assertEqual(int_to_hebrew(697), "תרצז")
+        self.assertEqual(int_to_hebrew(697, punctuate=True), 'תרצ"ז')
+
+    def test_int_to_hebrew_rejects_non_positive(self):
+        for value in (0, -1, 1.5):
+            with self.assertRaises(ValueError):
+                int_to_hebrew(value)
+
+
+if __name__ == "__main__":
+    unittest.main()